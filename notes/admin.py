@@ -1,5 +1,42 @@
 from django.contrib import admin
+from django.db.models import Q
 
 from .models import Note
+from .pagination import CachedCountPaginator
+from .search import match_q
 
-admin.site.register(Note)
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    """Админка заметок, рассчитанная на большую таблицу.
+
+    Поиск идёт по уникальным индексам slug и имени автора и по
+    полнотекстовому индексу заголовка и текста; фильтр — по индексу
+    modified. Общее число строк кэшируется, а второй COUNT(*) для
+    «показать все» не выполняется.
+    """
+    list_display = ('title', 'author', 'preview', 'word_count', 'modified')
+    list_select_related = ('author',)
+    list_filter = ('modified',)
+    search_fields = ('=slug', '=author__username')
+    ordering = ('-id',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('author',)
+
+    def get_queryset(self, request):
+        """Списку хватает превью; полный текст читает только форма."""
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('text')
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            match_q(search_term)
+            | Q(slug=search_term)
+            | Q(author__username=search_term)
+        ), False
@@ -0,0 +1,188 @@
+import json
+from http import HTTPStatus
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, HttpResponseGone, JsonResponse,
+    StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views import generic
+from django.views.decorators.csrf import csrf_protect
+
+from .forms import NoteForm
+from .sync import SyncTokenExpired, changes_since
+from .views import NoteBase
+
+FIELDS = ('id', 'title', 'text', 'slug', 'modified')
+STREAM_CHUNK_SIZE = 500
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def note_response(note, status=HTTPStatus.OK):
+    return HttpResponse(
+        dumps({field: getattr(note, field) for field in FIELDS}),
+        status=status, content_type='application/json'
+    )
+
+
+# Вход в API — по сессии сайта, поэтому POST без CSRF-токена (заголовок
+# X-CSRFToken) отклоняется, даже если CsrfViewMiddleware уберут.
+@method_decorator(csrf_protect, name='dispatch')
+class ApiBase(NoteBase):
+    """Базовый класс JSON API: без входа — 403 вместо редиректа."""
+    raise_exception = True
+
+    def read_form(self, instance=None):
+        """Форма NoteForm по JSON из тела запроса."""
+        try:
+            data = json.loads(self.request.body)  # type: ignore
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            data = {}
+        return NoteForm(data=data, instance=instance)
+
+    def save_form(self, form, status=HTTPStatus.OK):
+        note = None
+        if form.is_valid():
+            note = form.save_unique()
+        if note is None:
+            return JsonResponse(
+                {'errors': form.errors}, status=HTTPStatus.BAD_REQUEST
+            )
+        return note_response(note, status)
+
+
+class ConditionalMixin:
+    """Условный GET по ETag/If-None-Match и Last-Modified/If-Modified-Since.
+
+    Наследник возвращает версию ресурса из get_version: метку и время
+    последнего изменения, а тело ответа — из get_content_response.
+    На совпадение версии клиент получает 304 без тела.
+    """
+
+    def get_version(self):
+        raise NotImplementedError
+
+    def get_content_response(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        tag, last_modified = self.get_version()
+        etag = quote_etag(tag)
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = self.get_content_response()
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class NoteListApi(ApiBase, ConditionalMixin, generic.View):
+    """Все заметки пользователя одним потоковым JSON-массивом."""
+
+    def get_version(self):
+        # Число заметок в метке ловит удаления, которые не меняют modified.
+        summary = self.get_queryset().aggregate(
+            count=Count('id'), last_modified=Max('modified')
+        )
+        last_modified = summary['last_modified']
+        stamp = last_modified.timestamp() if last_modified else 0
+        return f'{summary["count"]}-{stamp}', last_modified
+
+    def stream(self):
+        yield '['
+        notes = self.get_queryset().order_by('id').values(*FIELDS)
+        for number, note in enumerate(
+            notes.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        ):
+            yield (',' if number else '') + dumps(note)
+        yield ']'
+
+    def get_content_response(self):
+        return StreamingHttpResponse(
+            self.stream(), content_type='application/json'
+        )
+
+
+class NoteDetailApi(ApiBase, ConditionalMixin, generic.View):
+    """Одна заметка пользователя."""
+
+    def get_version(self):
+        last_modified = get_object_or_404(
+            self.get_queryset().values_list('modified', flat=True),
+            slug=self.kwargs['slug']
+        )
+        tag = f'{self.kwargs["slug"]}-{last_modified.timestamp()}'
+        return tag, last_modified
+
+    def get_content_response(self):
+        return note_response(get_object_or_404(
+            self.get_queryset(), slug=self.kwargs['slug']
+        ))
+
+
+class NoteCreateApi(ApiBase, generic.View):
+    """Добавление заметки."""
+
+    def post(self, request, *args, **kwargs):
+        form = self.read_form()
+        form.instance.author = request.user
+        return self.save_form(form, status=HTTPStatus.CREATED)
+
+
+class NoteUpdateApi(ApiBase, generic.View):
+    """Редактирование заметки с версией в истории, как на странице."""
+
+    def post(self, request, *args, **kwargs):
+        note = get_object_or_404(self.get_queryset(), slug=kwargs['slug'])
+        return self.save_form(self.read_form(instance=note))
+
+
+class NoteDeleteApi(ApiBase, generic.View):
+    """Удаление заметки."""
+
+    def post(self, request, *args, **kwargs):
+        get_object_or_404(self.get_queryset(), slug=kwargs['slug']).delete()
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+
+class NoteSyncApi(ApiBase, generic.View):
+    """Изменения заметок пользователя после токена синхронизации.
+
+    На слишком старый токен — 410: клиент загружает заметки заново
+    без since.
+    """
+    token_kwarg = 'since'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            token = int(request.GET.get(self.token_kwarg, 0))
+        except ValueError:
+            return HttpResponseBadRequest('Неверный токен синхронизации.')
+        try:
+            token, changed, deleted, more = changes_since(
+                request.user.pk, token
+            )
+        except SyncTokenExpired:
+            return HttpResponseGone(
+                'Токен синхронизации устарел: загрузите заметки заново.'
+            )
+        return HttpResponse(dumps({
+            'token': token,
+            'changed': changed,
+            'deleted': deleted,
+            'more': more,
+        }), content_type='application/json')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        # Обработчики фоновых заданий и проверки регистрируются
+        # при импорте.
+        from . import checks, markup, search, signals  # noqa: F401
@@ -0,0 +1,65 @@
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from . import views
+from .profiling import render_response
+
+
+def run_in_thread(func):
+    """Выполняет синхронную работу в пуле потоков, не блокируя цикл событий.
+
+    thread_sensitive=False: запросы не выстраиваются в очередь к одному
+    потоку, каждый поток пула держит своё соединение с БД.
+    """
+    def call(*args, **kwargs):
+        # Как на request_started: закрыть соединение потока, если устарело.
+        close_old_connections()
+        return func(*args, **kwargs)
+    return sync_to_async(call, thread_sensitive=False)
+
+
+class AsyncViewMixin:
+    """Асинхронный вариант CBV для ASGI-сервера.
+
+    ORM и шаблоны Django 3.2 синхронные, поэтому проверка пользователя,
+    запросы к БД и рендеринг выполняются в пуле потоков, а сам
+    обработчик — корутина, которую ASGI-сервер вызывает напрямую.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        sync_view = super().as_view(**initkwargs)  # type: ignore
+
+        def handle(request, *args, **kwargs):
+            response = sync_view(request, *args, **kwargs)
+            if not getattr(response, 'is_rendered', True):
+                render_response(response)
+            return response
+
+        async def view(request, *args, **kwargs):
+            return await run_in_thread(handle)(request, *args, **kwargs)
+
+        update_wrapper(view, sync_view)
+        return view
+
+
+class Home(AsyncViewMixin, views.Home):
+    """Домашняя страница."""
+
+
+class NotesList(AsyncViewMixin, views.NotesList):
+    """Список всех заметок пользователя."""
+
+
+class NoteDetail(AsyncViewMixin, views.NoteDetail):
+    """Заметка подробно."""
+
+
+class NotesByTag(AsyncViewMixin, views.NotesByTag):
+    """Заметки пользователя с одним тегом."""
+
+
+class TagCloud(AsyncViewMixin, views.TagCloud):
+    """Облако тегов пользователя."""
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+
+
+class UserCache:
+    """Проверенные пользователи сессий в общем кэше NOTES_USER_CACHE.
+
+    Запись помнит бэкенд и хэш пароля из сессии, с которыми
+    пользователь был проверен: сессия с другим хэшем (после смены
+    пароля) из кэша не берётся и проверяется по базе заново. Кэш
+    общий для процессов, поэтому сброс записи видят все воркеры.
+    """
+
+    def key(self, user_id):
+        return f'notes:user:{user_id}'
+
+    def get(self, user_id, backend, session_hash):
+        entry = get_user_cache().get(self.key(user_id))
+        if entry is None:
+            return None
+        cached_backend, cached_hash, user = entry
+        if (cached_backend, cached_hash) != (backend, session_hash):
+            return None
+        return user
+
+    def set(self, user_id, backend, session_hash, user):
+        # Кэш хранит сериализованную копию: запросы не делят объект
+        # пользователя, его кэши прав и атрибуты.
+        get_user_cache().set(
+            self.key(user_id), (backend, session_hash, user),
+            settings.NOTES_USER_CACHE_TTL
+        )
+
+    def invalidate(self, user_id):
+        get_user_cache().delete(self.key(user_id))
+
+
+def get_user_cache():
+    return caches[settings.NOTES_USER_CACHE]
+
+
+user_cache = UserCache()
+
+
+def invalidate_user(user_id):
+    """Сбрасывает пользователя из кэша после записи или выхода."""
+    user_cache.invalidate(str(user_id))
+
+
+def get_cached_user(request):
+    """auth.get_user с кэшем проверенных пользователей.
+
+    Выход очищает сессию, и id пользователя в ней больше нет; смена
+    пароля сохраняет пользователя и сбрасывает его запись.
+    """
+    if not settings.NOTES_USER_CACHE_TTL:
+        return auth.get_user(request)
+    session = request.session
+    try:
+        user_id = str(session[auth.SESSION_KEY])
+        backend = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    user = user_cache.get(user_id, backend, session_hash)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            user_cache.set(user_id, backend, session_hash, user)
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, который берёт request.user из UserCache."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,119 @@
+import secrets
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+# Счётчики попаданий и промахов в пределах процесса.
+page_cache_stats = Counter()
+
+
+def get_page_cache():
+    """Кэш отрендеренных страниц, по умолчанию — LRU в памяти процесса."""
+    return caches[settings.NOTES_PAGE_CACHE]
+
+
+def _generation_key(user_id):
+    return f'notes:pages:{user_id}:generation'
+
+
+def get_generation(user_id):
+    """Поколение страниц пользователя: меняется при любой записи.
+
+    Вытесненное поколение заводится заново случайным числом, а не с 1:
+    иначе оно могло бы повторить старое, и страницы из ещё живых
+    ключей того поколения отдались бы устаревшими.
+    """
+    return get_page_cache().get_or_set(
+        _generation_key(user_id), lambda: secrets.randbits(62), None
+    )
+
+
+def page_key(user_id, *parts):
+    """Ключ страницы: (id пользователя, slug) или (id пользователя, курсор)."""
+    generation = get_generation(user_id)
+    suffix = ':'.join(str(part) for part in parts)
+    return f'notes:pages:{user_id}:{generation}:{suffix}'
+
+
+def _bump_generation(user_id):
+    cache = get_page_cache()
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        # Поколения ещё нет в кэше — значит, нет и страниц.
+        pass
+
+
+def invalidate_user_pages(user_id):
+    """Сбрасывает все страницы пользователя.
+
+    Сброс делается сразу и ещё раз после коммита, чтобы параллельный
+    запрос не успел положить в кэш данные до фиксации транзакции.
+    """
+    _bump_generation(user_id)
+    transaction.on_commit(lambda: _bump_generation(user_id))
+
+
+class PageCacheMixin:
+    """Отдаёт GET-ответ CBV из кэша страниц пользователя."""
+
+    def get_page_cache_parts(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        key = page_key(request.user.pk, *self.get_page_cache_parts())
+        cache = get_page_cache()
+        content = cache.get(key)
+        if content is not None:
+            page_cache_stats['hits'] += 1
+            return HttpResponse(content)
+        page_cache_stats['misses'] += 1
+        response = super().get(request, *args, **kwargs)  # type: ignore
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda response: cache.set(key, response.content)
+            )
+        return response
+
+
+# Страницы RenderOnceMixin: (класс, имя пользователя) -> байты.
+rendered_pages = OrderedDict()
+rendered_pages_lock = threading.Lock()
+
+
+class RenderOnceMixin:
+    """GET-ответ страницы, которая зависит только от имени пользователя.
+
+    Страница рендерится один раз на имя и дальше отдаётся из памяти
+    процесса, без шаблонов и бэкенда кэша.
+    """
+    rendered_pages_size = 1000
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        key = (
+            type(self).__name__,
+            user.username if user.is_authenticated else None,
+        )
+        with rendered_pages_lock:
+            content = rendered_pages.get(key)
+            if content is not None:
+                rendered_pages.move_to_end(key)
+        if content is not None:
+            page_cache_stats['rendered_hits'] += 1
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)  # type: ignore
+        response.add_post_render_callback(
+            lambda response: self.remember_page(key, response.content)
+        )
+        return response
+
+    def remember_page(self, key, content):
+        with rendered_pages_lock:
+            rendered_pages[key] = content
+            while len(rendered_pages) > self.rendered_pages_size:
+                rendered_pages.popitem(last=False)
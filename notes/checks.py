@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .sharding import ID_STRIDE
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def shared_cache_aliases():
+    """Алиасы CACHES, сброс которых должны видеть все процессы."""
+    aliases = {'NOTES_PAGE_CACHE': settings.NOTES_PAGE_CACHE}
+    if settings.SESSION_ENGINE in (
+        'django.contrib.sessions.backends.cache',
+        'django.contrib.sessions.backends.cached_db',
+    ):
+        aliases['SESSION_CACHE_ALIAS'] = settings.SESSION_CACHE_ALIAS
+    if settings.NOTES_USER_CACHE_TTL:
+        aliases['NOTES_USER_CACHE'] = settings.NOTES_USER_CACHE
+    return aliases
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Кэш в памяти процесса при нескольких воркерах отдаёт устаревшее."""
+    if settings.NOTES_WORKERS <= 1:
+        return []
+    return [
+        Error(
+            f'{setting} = {alias!r}: кэш в памяти процесса, а воркеров '
+            f'{settings.NOTES_WORKERS}.',
+            hint='Нужен общий кэш (memcached, Redis) или NOTES_WORKERS = 1.',
+            id='notes.E001',
+        )
+        for setting, alias in shared_cache_aliases().items()
+        if settings.CACHES[alias]['BACKEND'] in LOCAL_CACHE_BACKENDS
+    ]
+
+
+@register()
+def check_shard_count(app_configs, **kwargs):
+    """Номер шарда хранится в остатке id от деления на ID_STRIDE."""
+    if len(settings.NOTES_SHARDS) <= ID_STRIDE:
+        return []
+    return [
+        Error(
+            f'NOTES_SHARDS: шардов {len(settings.NOTES_SHARDS)}, а id '
+            f'различают не больше {ID_STRIDE}.',
+            id='notes.E002',
+        )
+    ]
@@ -0,0 +1,47 @@
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Brotli необязателен: без него ответы сжимает gzip.
+    brotli = None
+
+ACCEPTS_BROTLI_RE = re.compile(r'\bbr\b')
+# Меньше этого сжимать невыгодно: заголовки и словарь съедят выигрыш.
+MIN_LENGTH = 200
+BROTLI_QUALITY = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Сжимает ответы Brotli, если клиент его принимает, иначе gzip.
+
+    Brotli включается, только если установлен пакет brotli, и только
+    для обычных ответов; потоковые сжимает gzip.
+    """
+
+    def process_response(self, request, response):
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < MIN_LENGTH
+            or not ACCEPTS_BROTLI_RE.search(
+                request.META.get('HTTP_ACCEPT_ENCODING', '')
+            )
+        ):
+            return super().process_response(request, response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(
+            response.content, quality=BROTLI_QUALITY
+        )
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'br'
+        return response
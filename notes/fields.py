@@ -0,0 +1,66 @@
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен: без него сжимает zlib.
+    zstandard = None
+
+# Первый байт сжатого значения — кодек, которым оно сжато.
+ZLIB = b'z'
+ZSTD = b's'
+
+
+def compress_text(text):
+    """Сжимает text, если он не короче NOTES_COMPRESS_MIN_BYTES.
+
+    Короткий текст возвращается строкой как есть, длинный — байтами
+    с меткой кодека: zstd, если установлен zstandard, иначе zlib.
+    """
+    threshold = settings.NOTES_COMPRESS_MIN_BYTES
+    if threshold is None:
+        return text
+    data = text.encode()
+    if len(data) < threshold:
+        return text
+    if zstandard is not None:
+        return ZSTD + zstandard.ZstdCompressor().compress(data)
+    return ZLIB + zlib.compress(data)
+
+
+def decompress_text(data):
+    data = bytes(data)
+    codec, payload = data[:1], data[1:]
+    if codec == ZLIB:
+        return zlib.decompress(payload).decode()
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError(
+                'Текст сжат zstd: установите пакет zstandard.'
+            )
+        return zstandard.ZstdDecompressor().decompress(payload).decode()
+    raise ValueError(f'Неизвестный кодек сжатого текста: {codec!r}.')
+
+
+class CompressedTextField(models.TextField):
+    """TextField, который хранит длинные тексты сжатыми.
+
+    Сжатое значение пишется в ту же колонку BLOB-ом: SQLite хранит
+    тип значения, а не колонки, поэтому короткие тексты остаются
+    строками и видны SQL как есть. В других СУБД текст не сжимается.
+    Модель, формы и шаблоны всегда видят строку; распаковка идёт
+    только для загруженных значений, а списки text не загружают.
+    """
+
+    def get_db_prep_save(self, value, connection):
+        value = super().get_db_prep_save(value, connection)
+        if connection.vendor == 'sqlite' and isinstance(value, str):
+            return compress_text(value)
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress_text(value)
+        return value
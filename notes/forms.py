@@ -1,29 +1,85 @@
-from pytils.translit import slugify
-
 from django import forms
-from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
 
 from .models import Note
+from .revisions import record_revision
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tags = forms.CharField(
+        label='Теги',
+        required=False,
+        help_text='Через запятую, например: работа, идеи',
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
-    def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
-            raise ValidationError(slug + WARNING)
-        return slug
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Прежние теги нужны только для показа формы: при записи
+        # их читает Note.set_tags.
+        if self.instance.pk is not None and not self.is_bound:
+            self.initial.setdefault('tags', ', '.join(
+                tag.name for tag in self.instance.tags.order_by('slug')
+            ))
+
+    def clean_tags(self):
+        """Список названий тегов из строки через запятую."""
+        return [
+            name for name in self.cleaned_data['tags'].split(',')
+            if name.strip()
+        ]
+
+    def save(self, commit=True):
+        """Теги пишутся вместе с заметкой, в той же транзакции.
+
+        Если тегов в данных нет (JSON API без поля tags), прежние
+        теги заметки не трогаются.
+        """
+        created = self.instance._state.adding
+        note = super().save(commit)
+        if commit and 'tags' in self.data:
+            note.set_tags(self.cleaned_data['tags'], created=created)
+        return note
+
+    def validate_unique(self):
+        """Уникальность slug проверяет индекс БД при сохранении.
+
+        Отдельный запрос на существование slug не делается: ошибку
+        уникальности превращает в ошибку формы save_unique,
+        а пустой slug подбирает Note.save.
+        """
+        exclude = self._get_validation_exclusions()
+        exclude.append('slug')
+        self.instance.validate_unique(exclude=exclude)
+
+    def save_unique(self):
+        """Сохраняет заметку или, если slug занят, добавляет ошибку.
+
+        Изменённая заметка сохраняется вместе с версией в истории,
+        в одной транзакции: так пишут и страница правки, и JSON API.
+        Возвращает сохранённую заметку или None. Прочие ошибки
+        целостности (например, гонка за связь заметки с тегом) не
+        выдаются за занятый slug и пробрасываются дальше.
+        """
+        using = router.db_for_write(Note, instance=self.instance)
+        editing = not self.instance._state.adding
+        try:
+            with transaction.atomic(using=using):
+                note = self.save()
+                # Теги в историю не входят: версия — это заголовок и текст.
+                if editing and set(self.changed_data) - {'tags'}:
+                    record_revision(
+                        note, self.initial['title'], self.initial['text']
+                    )
+                return note
+        except IntegrityError:
+            if not self.instance.slug_is_taken():
+                raise
+            self.add_error('slug', self.instance.slug + WARNING)
+            return None
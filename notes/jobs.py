@@ -0,0 +1,161 @@
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .sharding import note_shards
+
+logger = logging.getLogger(__name__)
+
+# Обработчики по видам заданий: функция получает список payload-ов.
+handlers = {}
+# Виды заданий, которые ставятся на каждую запись и удаление заметки.
+note_hooks = []
+
+
+def handler(kind):
+    """Регистрирует обработчик пачки заданий kind.
+
+    Обработчик должен быть идемпотентным: после сбоя воркера или
+    ошибки в пачке задание выполнится ещё раз.
+    """
+    def register(func):
+        handlers[kind] = func
+        return func
+    return register
+
+
+def note_hook(kind):
+    """Обработчик kind, который ставится на каждую запись заметки.
+
+    payload — {'using': алиас базы, 'note_id': id}. Заметки к моменту
+    обработки может уже не быть.
+    """
+    def register(func):
+        handler(kind)(func)
+        note_hooks.append(kind)
+        return func
+    return register
+
+
+def enqueue_many(jobs, using=DEFAULT_DB_ALIAS):
+    """Ставит задания (kind, key, payload) одним запросом в базу using.
+
+    Задание с тем же kind и key, которое ещё ждёт, не дублируется.
+    При NOTES_JOBS_SYNC задания выполняются сразу, без очереди.
+    """
+    if settings.NOTES_JOBS_SYNC:
+        by_kind = {}
+        for kind, key, payload in jobs:
+            by_kind.setdefault(kind, {})[key] = payload
+        for kind, payloads in by_kind.items():
+            handlers[kind](list(payloads.values()))
+        return
+    Job.objects.using(using).bulk_create(
+        [Job(kind=kind, key=key, payload=payload)
+         for kind, key, payload in jobs],
+        ignore_conflicts=True
+    )
+
+
+def enqueue(kind, key, payload):
+    enqueue_many([(kind, key, payload)])
+
+
+def enqueue_note_hooks(note, using):
+    """Ставит все note_hooks для заметки из базы using.
+
+    Очередь — в той же базе: задание пишется в транзакции заметки, и
+    запись заметки на шард не ждёт блокировки default.
+    """
+    payload = {'using': using, 'note_id': note.pk}
+    enqueue_many(
+        [(kind, f'{using}:{note.pk}', payload) for kind in note_hooks],
+        using
+    )
+
+
+def claim(batch_size, using=DEFAULT_DB_ALIAS):
+    """Забирает до batch_size готовых заданий базы using одним UPDATE.
+
+    Подзапрос выбирает задания без блокировки или с истёкшей
+    блокировкой упавшего воркера, поэтому два воркера не возьмут
+    одно задание, а SQLite не переходит от чтения к записи.
+    """
+    now = timezone.now()
+    worker = uuid.uuid4().hex
+    queue = Job.objects.using(using)
+    due = queue.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        failed=False, run_after__lte=now,
+    ).order_by('run_after', 'id').values('id')[:batch_size]
+    queue.filter(id__in=due).update(
+        worker=worker,
+        locked_until=now + timedelta(seconds=settings.NOTES_JOB_LEASE_SECONDS),
+        attempts=F('attempts') + 1,
+    )
+    return list(queue.filter(worker=worker).order_by('id'))
+
+
+def owned(jobs, using=DEFAULT_DB_ALIAS):
+    """Задания jobs из одного claim, которые всё ещё за этим воркером.
+
+    Если блокировка истекла и задание забрал другой воркер, у строки
+    уже его worker: прежний воркер её не удалит и не отложит.
+    """
+    return Job.objects.using(using).filter(
+        id__in=[job.id for job in jobs], worker=jobs[0].worker
+    )
+
+
+def retry(jobs, error, using=DEFAULT_DB_ALIAS):
+    """Откладывает задания с экспоненциальной паузой или бросает их.
+
+    Если за время попытки то же задание поставили снова, неудачное
+    удаляется: его работу сделает новое. Задания, которые уже забрал
+    другой воркер, не трогаются.
+    """
+    queue = Job.objects.using(using)
+    with transaction.atomic(using=using):
+        owned(jobs, using).filter(
+            key__in=queue.filter(
+                kind=jobs[0].kind, locked_until__isnull=True, failed=False
+            ).values('key'),
+        ).delete()
+        attempts = jobs[0].attempts
+        owned(jobs, using).update(
+            locked_until=None, worker='', last_error=error,
+            failed=attempts >= settings.NOTES_JOB_MAX_ATTEMPTS,
+            run_after=timezone.now() + timedelta(seconds=2 ** attempts),
+        )
+
+
+def run_pending(batch_size=None):
+    """Выполняет по пачке заданий каждой базы и возвращает их число.
+
+    Задания одного вида идут в обработчик одним вызовом. Ошибка
+    обработчика откладывает всю его пачку.
+    """
+    batch_size = batch_size or settings.NOTES_JOB_BATCH_SIZE
+    done = 0
+    for using in note_shards():
+        jobs = claim(batch_size, using)
+        by_kind = {}
+        for job in jobs:
+            by_kind.setdefault((job.kind, job.attempts), []).append(job)
+        for (kind, _), kind_jobs in by_kind.items():
+            try:
+                handlers[kind]([job.payload for job in kind_jobs])
+            except Exception:
+                logger.exception('Задания %s не выполнены.', kind)
+                retry(kind_jobs, traceback.format_exc(), using)
+            else:
+                owned(kind_jobs, using).delete()
+        done += len(jobs)
+    return done
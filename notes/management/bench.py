@@ -0,0 +1,81 @@
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import override_settings
+
+
+@contextmanager
+def use_database(path, **overrides):
+    """Переключает default на файл path на время бенчмарка."""
+    settings_dict = connections['default'].settings_dict
+    original_name = settings_dict['NAME']
+    settings_dict['NAME'] = path
+    try:
+        with override_settings(**overrides):
+            connections.close_all()
+            yield path
+    finally:
+        connections.close_all()
+        settings_dict['NAME'] = original_name
+
+
+@contextmanager
+def scratch_database(**overrides):
+    """Временная БД со схемой проекта, чтобы не трогать db.sqlite3."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'bench.sqlite3'
+        with use_database(path, **overrides):
+            call_command('migrate', verbosity=0)
+            yield path
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу; values должен быть отсортирован."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+# Словарь для правдоподобных заголовков: все буквы, которые
+# транслитерирует pytils, включая «ё», «й», «щ», «ъ» и «ы».
+VERBS = (
+    'Купить', 'Позвонить', 'Написать', 'Прочитать', 'Обсудить', 'Починить',
+    'Съездить', 'Подъехать', 'Заплатить', 'Выучить', 'Отправить', 'Найти',
+)
+ADJECTIVES = (
+    'новый', 'срочный', 'важный', 'семейный', 'рабочий', 'ёмкий',
+    'подробный', 'общий', 'личный', 'щедрый', 'вечерний', 'утренний',
+)
+NOUNS = (
+    'отчёт', 'план', 'список', 'подарок', 'билет', 'журнал', 'счёт',
+    'объявление', 'чертёж', 'подъезд', 'щенок', 'ужин', 'договор', 'ремонт',
+)
+TITLE_TEMPLATES = (
+    '{verb} {noun}',
+    '{verb} {adjective} {noun}',
+    '{Adjective} {noun}',
+    '{verb} {noun} до {day} числа',
+    'Идеи: {adjective} {noun}',
+)
+
+
+def russian_title(rnd):
+    """Заголовок заметки на русском; некоторые повторяются, как в жизни."""
+    adjective = rnd.choice(ADJECTIVES)
+    return rnd.choice(TITLE_TEMPLATES).format(
+        verb=rnd.choice(VERBS),
+        noun=rnd.choice(NOUNS),
+        adjective=adjective,
+        Adjective=adjective.capitalize(),
+        day=rnd.randint(1, 28),
+    )
+
+
+def russian_text(rnd, words=60):
+    """Текст заметки из словаря заголовков."""
+    vocabulary = VERBS + ADJECTIVES + NOUNS
+    return ' '.join(rnd.choice(vocabulary) for _ in range(words)).capitalize()
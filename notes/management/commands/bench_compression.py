@@ -0,0 +1,63 @@
+import os
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notes.management.bench import percentile, russian_text, scratch_database
+from notes.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает на временной БД размер файла и время чтения '
+            'текста заметки без сжатия и со сжатием больших текстов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=200)
+        parser.add_argument('--kilobytes', type=int, default=100)
+        parser.add_argument('--reads', type=int, default=1000)
+        parser.add_argument('--threshold', type=int, default=16 * 1024)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for name, threshold in (
+            ('без сжатия', None), ('сжатие', options['threshold'])
+        ):
+            with scratch_database(NOTES_COMPRESS_MIN_BYTES=threshold) as path:
+                size, read_ms = self.run(path, options)
+            read_ms.sort()
+            self.stdout.write(
+                f'{name:>10}: файл {size / 2 ** 20:7.1f} МиБ, чтение '
+                f'p50 {percentile(read_ms, 0.5):.2f} мс, '
+                f'p95 {percentile(read_ms, 0.95):.2f} мс'
+            )
+
+    def run(self, path, options):
+        rnd = random.Random(options['seed'])
+        author = User.objects.create(username='bench-compression')
+        # Слов в тексте: в среднем около 16 байт UTF-8 на слово с пробелом.
+        words = options['kilobytes'] * 1024 // 16
+        notes = []
+        for number in range(options['notes']):
+            note = Note(
+                title=f'Заметка {number}', slug=f'bench-{number}',
+                text=russian_text(rnd, words), author=author
+            )
+            note.update_text_stats()
+            notes.append(note)
+        Note.objects.bulk_create(notes, batch_size=50)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            cursor.execute('VACUUM')
+        size = os.path.getsize(path)
+        ids = list(Note.objects.values_list('id', flat=True))
+        read_ms = []
+        for _ in range(options['reads']):
+            started = time.perf_counter()
+            len(Note.objects.get(pk=rnd.choice(ids)).text)
+            read_ms.append((time.perf_counter() - started) * 1000)
+        return size, read_ms
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+
+from notes.management.bench import percentile, scratch_database, use_database
+from notes.models import Note
+
+User = get_user_model()
+
+# Профиль и модуль его настроек. Запросы идут через Client и AsyncClient
+# прямо в обработчик Django, без сервера и сети: команда сравнивает
+# синхронные и асинхронные страницы, а не WSGI- и ASGI-серверы.
+PROFILES = {
+    'wsgi': 'yanote.settings',
+    'asgi': 'yanote.settings_asgi',
+}
+USERNAME = 'bench'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает p50 и p99 страниц заметок через тестовые '
+            'клиенты WSGI- и ASGI-профилей при высокой конкурентности '
+            '(без настоящего сервера).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        # Служебные: запуск одного профиля в отдельном процессе.
+        parser.add_argument('--run', choices=PROFILES, help='Служебный.')
+        parser.add_argument('--database', help='Служебный.')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            with use_database(options['database']):
+                result = self.run_load(options)
+            self.stdout.write(json.dumps(result))
+            return
+        with scratch_database() as path:
+            self.seed(options['notes'])
+            for profile, settings_module in PROFILES.items():
+                output = subprocess.run(
+                    [
+                        sys.executable, str(settings.BASE_DIR / 'manage.py'),
+                        'bench_handlers', '--run', profile,
+                        '--database', str(path),
+                        '--settings', settings_module,
+                        '--requests', str(options['requests']),
+                        '--concurrency', str(options['concurrency']),
+                    ],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output)
+                self.stdout.write(
+                    f'{profile}: {result["rps"]:8.1f} запросов/с '
+                    f'в процессе, '
+                    f'p50 {result["p50_ms"]:7.1f} мс, '
+                    f'p99 {result["p99_ms"]:7.1f} мс'
+                )
+
+    def seed(self, count):
+        author = User.objects.create(username=USERNAME)
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {i}', text='Текст заметки. ' * 50,
+                 slug=f'bench-{i}', author=author)
+            for i in range(count)
+        )
+
+    def get_urls(self, count):
+        slugs = list(Note.objects.values_list('slug', flat=True))
+        urls = ['/', '/notes/'] + [f'/note/{slug}/' for slug in slugs]
+        return [urls[i % len(urls)] for i in range(count)]
+
+    def run_load(self, options):
+        author = User.objects.get(username=USERNAME)
+        urls = self.get_urls(options['requests'])
+        started = time.perf_counter()
+        if options['run'] == 'asgi':
+            latencies = asyncio.run(
+                self.run_asgi(author, urls, options['concurrency'])
+            )
+        else:
+            latencies = self.run_wsgi(author, urls, options['concurrency'])
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+
+    def run_wsgi(self, author, urls, concurrency):
+        client = Client()
+        client.force_login(author)
+
+        def fetch(url):
+            started = time.perf_counter()
+            client.get(url)
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(fetch, urls))
+
+    async def run_asgi(self, author, urls, concurrency):
+        client = AsyncClient()
+        await asyncio.get_running_loop().run_in_executor(
+            None, client.force_login, author
+        )
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                started = time.perf_counter()
+                await client.get(url)
+                return time.perf_counter() - started
+
+        return list(await asyncio.gather(*(fetch(url) for url in urls)))
@@ -0,0 +1,75 @@
+import random
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from notes import jobs
+from notes.management.bench import (
+    percentile, russian_text, russian_title, scratch_database
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет на временной БД время от отправки заметки до '
+            'редиректа с hooks обработчиками записи: сразу и в очереди.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument(
+            '--hooks', type=int, nargs='+', default=[1, 4, 8],
+            help='Сколько обработчиков повесить на запись заметки.'
+        )
+        parser.add_argument(
+            '--hook-ms', type=float, default=2.0,
+            help='Сколько миллисекунд работает один обработчик.'
+        )
+
+    def handle(self, *args, **options):
+        for hooks in options['hooks']:
+            for sync in (True, False):
+                with scratch_database(NOTES_JOBS_SYNC=sync):
+                    latencies, drain = self.run(hooks, options)
+                mode = 'сразу' if sync else 'очередь'
+                line = (
+                    f'обработчиков {hooks}, {mode:>7}: редирект '
+                    f'p50 {percentile(latencies, 0.5):6.1f} мс, '
+                    f'p95 {percentile(latencies, 0.95):6.1f} мс'
+                )
+                if not sync:
+                    line += f'; воркер разобрал очередь за {drain:.2f} с'
+                self.stdout.write(line)
+
+    def run(self, hooks, options):
+        rnd = random.Random(0)
+        delay = options['hook_ms'] / 1000
+
+        def work(payloads):
+            # Обработчик пачки: время на каждую заметку.
+            time.sleep(delay * len(payloads))
+
+        kinds = [f'bench-{i}' for i in range(hooks)]
+        with mock.patch.dict(jobs.handlers, dict.fromkeys(kinds, work)), \
+                mock.patch.object(jobs, 'note_hooks', jobs.note_hooks + kinds):
+            author = User.objects.create(username='bench-jobs')
+            client = Client()
+            client.force_login(author)
+            url = reverse('notes:add')
+            latencies = []
+            for _ in range(options['posts']):
+                data = {'title': russian_title(rnd), 'text': russian_text(rnd)}
+                started = time.perf_counter()
+                client.post(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            with override_settings(NOTES_JOB_BATCH_SIZE=500):
+                while jobs.run_pending():
+                    pass
+            drain = time.perf_counter() - started
+        return sorted(latencies), drain
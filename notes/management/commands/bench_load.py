@@ -0,0 +1,246 @@
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import (
+    HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+)
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from notes.management.bench import (
+    percentile, russian_text, russian_title, scratch_database
+)
+from notes.management.commands.seed_notes import PASSWORD
+from notes.models import Note
+
+User = get_user_model()
+OPERATIONS = ('list', 'detail', 'add', 'edit', 'delete')
+DEFAULT_MIX = 'list=40,detail=40,add=10,edit=7,delete=3'
+
+
+class InProcessClient:
+    """Запросы к приложению в том же процессе, как в тестах."""
+
+    def __init__(self, username):
+        self.client = Client()
+        self.client.force_login(User.objects.get(username=username))
+
+    def request(self, path, data=None):
+        if data is None:
+            return self.client.get(path).status_code
+        return self.client.post(path, data).status_code
+
+
+class NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Запросы к запущенному локальному серверу с входом через форму."""
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(
+            HTTPCookieProcessor(self.cookies), NoRedirect
+        )
+        login_url = reverse('users:login')
+        self.request(login_url)
+        status = self.request(
+            login_url, {'username': username, 'password': PASSWORD}
+        )
+        if status != HTTPStatus.FOUND:
+            raise CommandError(f'Не удалось войти как {username}.')
+
+    def request(self, path, data=None):
+        headers = {}
+        body = None
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['X-CSRFToken'] = next(
+                (cookie.value for cookie in self.cookies
+                 if cookie.name == settings.CSRF_COOKIE_NAME), ''
+            )
+        request = Request(self.base_url + path, data=body, headers=headers)
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise CommandError(f'Неизвестная операция {name}.')
+        weights[name] = float(weight)
+    return weights
+
+
+def summarize(samples, elapsed=None):
+    latencies = sorted(latency * 1000 for _, latency, _ in samples)
+    summary = {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 400),
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0,
+        'p50_ms': percentile(latencies, 0.50),
+        'p90_ms': percentile(latencies, 0.90),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': latencies[-1] if latencies else 0,
+    }
+    if elapsed is not None:
+        summary['rps'] = len(samples) / elapsed
+    return {name: round(value, 3) for name, value in summary.items()}
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class VirtualUser:
+    """Один пользователь нагрузки: своё соединение и свои заметки."""
+
+    def __init__(self, client, slugs, weights, seed):
+        self.client = client
+        self.slugs = slugs
+        self.rnd = random.Random(seed)
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+
+    def form(self, slug=''):
+        return {
+            'title': russian_title(self.rnd),
+            'text': russian_text(self.rnd),
+            'slug': slug,
+        }
+
+    def step(self):
+        operation = self.rnd.choices(self.operations, self.weights)[0]
+        if operation in ('detail', 'edit', 'delete') and not self.slugs:
+            operation = 'list'
+        if operation == 'list':
+            path, data = reverse('notes:list'), None
+        elif operation == 'add':
+            # Пустой slug: заголовок пройдёт через slugify pytils.
+            path, data = reverse('notes:add'), self.form()
+        else:
+            slug = self.rnd.choice(self.slugs)
+            path = reverse(f'notes:{operation}', args=(slug,))
+            data = {'detail': None, 'edit': self.form(slug), 'delete': {}}[
+                operation
+            ]
+            if operation == 'delete':
+                self.slugs.remove(slug)
+        started = time.perf_counter()
+        status = self.client.request(path, data)
+        return operation, time.perf_counter() - started, status
+
+    def run(self, count):
+        return [self.step() for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц заметок: список, заметка, '
+            'добавление, редактирование и удаление. Результат — JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Адрес локального сервера; без него — в этом процессе '
+                 'на временной БД.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Число параллельных пользователей.'
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--notes-per-user', type=int, default=200)
+        parser.add_argument('--mix', default=DEFAULT_MIX)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Не создавать данные: bench-N уже есть в БД сервера.'
+        )
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        if options['url']:
+            report = self.run(options)
+        else:
+            with scratch_database():
+                report = self.run(options)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        weights = parse_mix(options['mix'])
+        usernames = [f'bench-{i}' for i in range(options['concurrency'])]
+        if not options['no_seed']:
+            call_command(
+                'seed_notes', users=len(usernames),
+                notes_per_user=options['notes_per_user'],
+                seed=options['seed'], stderr=self.stderr,
+            )
+        virtual_users = []
+        for number, username in enumerate(usernames):
+            client = (
+                HttpClient(options['url'], username) if options['url']
+                else InProcessClient(username)
+            )
+            slugs = list(
+                Note.objects.filter(author__username=username)
+                .values_list('slug', flat=True)
+            )
+            virtual_users.append(VirtualUser(
+                client, slugs, weights, options['seed'] + number
+            ))
+        per_user = options['requests'] // len(virtual_users)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(len(virtual_users)) as pool:
+            results = list(pool.map(
+                lambda user: user.run(per_user), virtual_users
+            ))
+        elapsed = time.perf_counter() - started
+        samples = [sample for result in results for sample in result]
+        return {
+            'commit': current_commit(),
+            'mode': 'http' if options['url'] else 'in-process',
+            'config': {
+                name: options[name] for name in (
+                    'url', 'concurrency', 'requests', 'notes_per_user',
+                    'mix', 'seed',
+                )
+            },
+            'total': summarize(samples, elapsed),
+            'operations': {
+                operation: summarize([
+                    sample for sample in samples if sample[0] == operation
+                ])
+                for operation in weights
+            },
+        }
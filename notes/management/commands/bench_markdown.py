@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from notes.management.bench import (
+    percentile, russian_text, russian_title, scratch_database
+)
+from notes.markup import get_markdown_cache
+from notes.models import Note
+
+User = get_user_model()
+
+
+def markdown_note(rnd, size):
+    """Текст заметки в Markdown примерно из size символов."""
+    blocks = []
+    length = 0
+    while length < size:
+        block = rnd.choice((
+            lambda: f'## {russian_title(rnd)}',
+            lambda: f'{russian_text(rnd, 40)} **{russian_title(rnd)}**, '
+                    f'*{russian_title(rnd)}* и `код`.',
+            lambda: '\n'.join(
+                f'- {russian_title(rnd)}' for _ in range(5)
+            ),
+            lambda: f'> {russian_text(rnd, 20)}',
+            lambda: f'[{russian_title(rnd)}](https://example.com/'
+                    f'{rnd.randint(1, 1000)})',
+        ))()
+        blocks.append(block)
+        length += len(block) + 2
+    return '\n\n'.join(blocks)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет на временной БД страницу большой заметки: рендер '
+            'Markdown на каждый запрос и готовый фрагмент из кэша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10_000, 100_000],
+            help='Размеры заметок в символах.'
+        )
+
+    def handle(self, *args, **options):
+        # Без кэша страниц: каждый запрос доходит до шаблона.
+        caches = {
+            **settings.CACHES,
+            'bench-pages': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+            'bench-none': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+        }
+        with scratch_database(
+            CACHES=caches, NOTES_PAGE_CACHE='bench-pages',
+            NOTES_JOBS_SYNC=True
+        ):
+            rnd = random.Random(0)
+            author = User.objects.create(username='bench-markdown')
+            client = Client()
+            client.force_login(author)
+            for size in options['sizes']:
+                note = Note.objects.create(
+                    title=russian_title(rnd), text=markdown_note(rnd, size),
+                    author=author
+                )
+                url = reverse('notes:detail', args=(note.slug,))
+                with override_settings(NOTES_MARKDOWN_CACHE='bench-none'):
+                    every = self.measure(client, url, options)
+                get_markdown_cache().clear()
+                cached = self.measure(client, url, options)
+                self.stdout.write(
+                    f'{size:>7} символов: рендер на запрос p50 '
+                    f'{percentile(every, 0.5):6.2f} мс, из кэша p50 '
+                    f'{percentile(cached, 0.5):6.2f} мс'
+                )
+
+    def measure(self, client, url, options):
+        client.get(url)
+        latencies = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return sorted(latencies)
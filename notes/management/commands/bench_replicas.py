@@ -0,0 +1,140 @@
+import multiprocessing
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from notes.management.bench import (
+    russian_text, russian_title, scratch_database
+)
+from notes.management.commands.sync_replica import copy_to_replica
+from notes.models import Note
+
+User = get_user_model()
+REPLICA = 'replica'
+PROFILES = {
+    'одна база': [],
+    'с репликой': [REPLICA],
+}
+
+
+def run_worker(worker_id, seconds, write_ratio):
+    """Цикл клиента: список и заметки, с долей write_ratio новых заметок.
+
+    Пишущий клиент закрепляется за основной базой, поэтому читатели
+    и писатели — разные клиенты.
+    """
+    rnd = random.Random(worker_id)
+    client = Client()
+    user = User.objects.get(username=f'bench-{worker_id}')
+    client.force_login(user)
+    slugs = list(
+        Note.objects.filter(author=user).values_list('slug', flat=True)
+    )
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if rnd.random() < write_ratio:
+            status = client.post(reverse('notes:add'), {
+                'title': russian_title(rnd), 'text': russian_text(rnd),
+            }).status_code
+            writes += 1
+        else:
+            url = rnd.choice((
+                reverse('notes:list'),
+                reverse('notes:detail', args=(rnd.choice(slugs),)),
+            ))
+            status = client.get(url).status_code
+            reads += 1
+        errors += status >= 400
+    connections.close_all()
+    return reads, writes, errors
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает на временной БД пропускную способность смеси '
+            'чтений и записей с одной базой и с репликой для чтения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=3)
+        parser.add_argument('--writers', type=int, default=1)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--notes', type=int, default=200)
+        parser.add_argument('--sync-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        # Без кэша страниц: каждое чтение должно дойти до базы.
+        caches = {
+            **settings.CACHES,
+            'bench-pages': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+        }
+        with scratch_database(
+            CACHES=caches, NOTES_PAGE_CACHE='bench-pages'
+        ) as path:
+            self.seed(options)
+            connections.databases[REPLICA] = {
+                **connections.databases[DEFAULT_DB_ALIAS],
+                'NAME': path.with_name('replica.sqlite3'),
+            }
+            try:
+                for name, replicas in PROFILES.items():
+                    with override_settings(NOTES_READ_REPLICAS=replicas):
+                        reads, writes, errors = self.run_profile(
+                            replicas, options
+                        )
+                    seconds = options['seconds']
+                    self.stdout.write(
+                        f'{name:>10}: чтений {reads / seconds:8.1f}/с, '
+                        f'записей {writes / seconds:7.1f}/с, '
+                        f'ошибок {errors}'
+                    )
+            finally:
+                connections[REPLICA].close()
+                del connections.databases[REPLICA]
+
+    def seed(self, options):
+        rnd = random.Random(0)
+        for worker_id in range(options['readers'] + options['writers']):
+            user = User.objects.create(username=f'bench-{worker_id}')
+            Note.objects.bulk_create(
+                Note(title=russian_title(rnd), text=russian_text(rnd),
+                     slug=f'bench-{worker_id}-{i}', author=user)
+                for i in range(options['notes'])
+            )
+
+    def run_profile(self, replicas, options):
+        stop = threading.Event()
+        syncer = None
+        if replicas:
+            copy_to_replica(REPLICA)
+
+            def sync():
+                while not stop.wait(options['sync_interval']):
+                    copy_to_replica(REPLICA)
+                connections.close_all()
+
+            syncer = threading.Thread(target=sync)
+        # Дочерние процессы должны открыть свои соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['readers'] + options['writers']) as pool:
+            if syncer:
+                syncer.start()
+            results = pool.starmap(run_worker, [
+                (worker_id, options['seconds'],
+                 0.0 if worker_id < options['readers'] else 1.0)
+                for worker_id in range(options['readers'] + options['writers'])
+            ])
+        stop.set()
+        if syncer:
+            syncer.join()
+        return tuple(map(sum, zip(*results)))
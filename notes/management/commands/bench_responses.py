@@ -0,0 +1,71 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from notes.cache import get_page_cache, rendered_pages
+from notes.management.bench import (
+    russian_text, russian_title, scratch_database
+)
+from notes.models import Note
+
+User = get_user_model()
+PAGES = ('notes:home', 'notes:success', 'notes:list', 'notes:detail')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет на временной БД байты и процессорное время ответа '
+            'с gzip и без, с рендером страницы каждый раз и из памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--notes', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options)
+
+    def run(self, options):
+        rnd = random.Random(0)
+        author = User.objects.create(username='bench-responses')
+        for _ in range(options['notes']):
+            Note.objects.create(
+                title=russian_title(rnd), text=russian_text(rnd),
+                author=author
+            )
+        slug = Note.objects.values_list('slug', flat=True).first()
+        client = Client()
+        client.force_login(author)
+        for name in PAGES:
+            args = (slug,) if name == 'notes:detail' else ()
+            url = reverse(name, args=args)
+            plain_bytes, plain_ms = self.measure(client, url, options, {})
+            gzip_bytes, gzip_ms = self.measure(
+                client, url, options, {'HTTP_ACCEPT_ENCODING': 'gzip'}
+            )
+            cached_bytes, cached_ms = self.measure(
+                client, url, options, {}, cached=True
+            )
+            self.stdout.write(
+                f'{name:>14}: байт {plain_bytes} -> gzip {gzip_bytes}; '
+                f'CPU мс: рендер {plain_ms:.3f}, с gzip {gzip_ms:.3f}, '
+                f'из кэша {cached_ms:.3f}'
+            )
+
+    def measure(self, client, url, options, headers, cached=False):
+        """Средние байты тела и процессорное время одного запроса."""
+        client.get(url, **headers)
+        total = 0.0
+        size = 0
+        for _ in range(options['requests']):
+            if not cached:
+                rendered_pages.clear()
+                get_page_cache().clear()
+            started = time.process_time()
+            response = client.get(url, **headers)
+            total += time.process_time() - started
+            size = len(response.content)
+        return size, total * 1000 / options['requests']
@@ -0,0 +1,100 @@
+import random
+import time
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from notes.management.bench import percentile, russian_text, scratch_database
+from notes.models import Note, NoteRevision
+from notes.revisions import (
+    SNAPSHOT_INTERVAL, record_revision, revision_content
+)
+
+User = get_user_model()
+
+
+def edit_lines(rnd, lines, changes):
+    """Правит несколько случайных строк: заменяет, вставляет, удаляет."""
+    for _ in range(changes):
+        position = rnd.randrange(len(lines) + 1)
+        action = rnd.random()
+        if action < 0.5 and position < len(lines):
+            lines[position] = russian_text(rnd, 12) + '\n'
+        elif action < 0.8 or len(lines) < 2:
+            lines.insert(position, russian_text(rnd, 12) + '\n')
+        else:
+            del lines[min(position, len(lines) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет историю заметок на временной БД: объём версии '
+            'в сравнении с полной копией и время восстановления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=5)
+        parser.add_argument('--edits', type=int, default=300)
+        parser.add_argument('--lines', type=int, default=200)
+        parser.add_argument('--changes-per-edit', type=int, default=3)
+        parser.add_argument('--reads', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options)
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        author = User.objects.create(username='bench-revisions')
+        full_bytes = compressed_bytes = 0
+        record_ms = []
+        notes = []
+        for number in range(options['notes']):
+            lines = [
+                russian_text(rnd, 12) + '\n' for _ in range(options['lines'])
+            ]
+            note = Note.objects.create(
+                title=f'Заметка {number}', text=''.join(lines),
+                slug=f'bench-{number}', author=author
+            )
+            notes.append(note)
+            for _ in range(options['edits']):
+                edit_lines(rnd, lines, options['changes_per_edit'])
+                previous_text = note.text
+                note.text = ''.join(lines)
+                started = time.perf_counter()
+                with transaction.atomic():
+                    note.save()
+                    record_revision(note, note.title, previous_text)
+                record_ms.append((time.perf_counter() - started) * 1000)
+                encoded = note.text.encode()
+                full_bytes += len(encoded)
+                compressed_bytes += len(zlib.compress(encoded))
+        revisions = NoteRevision.objects.count()
+        stored = NoteRevision.objects.aggregate(
+            total=Sum(Length('data'))
+        )['total']
+        read_ms = []
+        for _ in range(options['reads']):
+            note = rnd.choice(notes)
+            number = rnd.randint(1, options['edits'] + 1)
+            started = time.perf_counter()
+            revision_content(note, number)
+            read_ms.append((time.perf_counter() - started) * 1000)
+        read_ms.sort()
+        record_ms.sort()
+        edits = options['notes'] * options['edits']
+        self.stdout.write(
+            f'Версий: {revisions}, снимок раз в {SNAPSHOT_INTERVAL}.\n'
+            f'Байт на версию: история {stored / revisions:.0f}, '
+            f'полная копия {full_bytes / edits:.0f}, '
+            f'сжатая копия {compressed_bytes / edits:.0f}.\n'
+            f'Запись версии, мс: p50 {percentile(record_ms, 0.5):.2f}, '
+            f'p95 {percentile(record_ms, 0.95):.2f}.\n'
+            f'Восстановление, мс: p50 {percentile(read_ms, 0.5):.2f}, '
+            f'p95 {percentile(read_ms, 0.95):.2f}, '
+            f'максимум {read_ms[-1]:.2f}.'
+        )
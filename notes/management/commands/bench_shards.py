@@ -0,0 +1,125 @@
+import multiprocessing
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from django.test.utils import override_settings
+
+from notes.management.bench import (
+    russian_text, russian_title, scratch_database
+)
+from notes.models import AuthorShard, Note
+from notes.sharding import forget_author_shard
+
+User = get_user_model()
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def run_writer(worker_id, seconds):
+    """Цикл автора: создаёт заметки, пока не выйдет время.
+
+    Считает и запросы, которые пишут в default: запись в общую базу
+    упирается в её единственную блокировку, сколько бы ни было шардов.
+    """
+    rnd = random.Random(worker_id)
+    author = User.objects.get(username=f'bench-{worker_id}')
+    writes = conflicts = default_writes = 0
+
+    def count_default_writes(execute, sql, params, many, context):
+        nonlocal default_writes
+        if sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            default_writes += 1
+        return execute(sql, params, many, context)
+
+    deadline = time.perf_counter() + seconds
+    with connections[DEFAULT_DB_ALIAS].execute_wrapper(count_default_writes):
+        while time.perf_counter() < deadline:
+            try:
+                Note.objects.create(
+                    title=russian_title(rnd), text=russian_text(rnd),
+                    author=author
+                )
+                writes += 1
+            except IntegrityError:
+                # Одинаковый заголовок у двух авторов шарда в один
+                # момент: форма в этом случае просит выбрать другой slug.
+                conflicts += 1
+    connections.close_all()
+    return writes, conflicts, default_writes
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает на временных БД пропускную способность записи '
+            'заметок с разным числом шардов-файлов SQLite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shards', type=int, nargs='+', default=[1, 2, 4]
+        )
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--synchronous', default=settings.SQLITE_PRAGMAS['synchronous'],
+            help='PRAGMA synchronous: full — fsync на каждый коммит.'
+        )
+
+    def handle(self, *args, **options):
+        pragmas = {
+            **settings.SQLITE_PRAGMAS, 'synchronous': options['synchronous']
+        }
+        for count in options['shards']:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                writes, conflicts, default_writes = self.run_profile(
+                    count, options
+                )
+            self.stdout.write(
+                f'шардов {count}: записей '
+                f'{writes / options["seconds"]:7.1f}/с, '
+                f'запросов записи в default на заметку '
+                f'{default_writes / max(writes, 1):.1f}, '
+                f'конфликтов slug {conflicts}'
+            )
+
+    def run_profile(self, count, options):
+        aliases = [DEFAULT_DB_ALIAS] + [f'shard{i}' for i in range(1, count)]
+        with scratch_database(NOTES_SHARDS=[]) as path:
+            for alias in aliases[1:]:
+                connections.databases[alias] = {
+                    **connections.databases[DEFAULT_DB_ALIAS],
+                    'NAME': path.with_name(f'{alias}.sqlite3'),
+                }
+            try:
+                with override_settings(NOTES_SHARDS=aliases):
+                    for alias in aliases[1:]:
+                        call_command(
+                            'migrate', database=alias, verbosity=0
+                        )
+                    # Авторы поровну на шардах, независимо от их id.
+                    for worker_id in range(options['writers']):
+                        user = User.objects.create(
+                            username=f'bench-{worker_id}'
+                        )
+                        AuthorShard.objects.create(
+                            author_id=user.pk,
+                            shard=aliases[worker_id % count]
+                        )
+                    forget_author_shard()
+                    # Дочерние процессы должны открыть свои соединения.
+                    connections.close_all()
+                    context = multiprocessing.get_context('fork')
+                    with context.Pool(options['writers']) as pool:
+                        results = pool.starmap(run_writer, [
+                            (worker_id, options['seconds'])
+                            for worker_id in range(options['writers'])
+                        ])
+            finally:
+                for alias in aliases[1:]:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.databases[alias]
+        return tuple(map(sum, zip(*results)))
@@ -0,0 +1,85 @@
+import multiprocessing
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from notes.management.bench import scratch_database
+from notes.models import Note
+
+User = get_user_model()
+
+PROFILES = {
+    # Как было: журнал отката и новое соединение на каждый запрос.
+    'default': {'pragmas': {}, 'persistent': False},
+    'tuned': {'pragmas': settings.SQLITE_PRAGMAS, 'persistent': True},
+}
+
+
+def run_worker(worker_id, user_id, seconds, write_ratio, persistent):
+    """Цикл одного процесса-воркера: чтения списка и записи заметок."""
+    rnd = random.Random(worker_id)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rnd.random() < write_ratio:
+                Note.objects.create(
+                    title='Заметка',
+                    text='Текст заметки. ' * 20,
+                    slug=f'bench-{worker_id}-{writes}',
+                    author_id=user_id,
+                )
+                writes += 1
+            else:
+                list(
+                    Note.objects.filter(author_id=user_id)
+                    .only('id', 'slug', 'title').order_by('id')[:50]
+                )
+                reads += 1
+        except OperationalError:
+            errors += 1
+        if not persistent:
+            # Так соединение закрывается в конце запроса при CONN_MAX_AGE=0.
+            connections['default'].close()
+    connections.close_all()
+    return reads, writes, errors
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест SQLite: параллельные процессы-воркеры '
+            'с профилем по умолчанию и с SQLITE_PRAGMAS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        for name, profile in PROFILES.items():
+            with scratch_database(SQLITE_PRAGMAS=profile['pragmas']):
+                reads, writes, errors = self.run_profile(profile, options)
+            seconds = options['seconds']
+            self.stdout.write(
+                f'{name:>8}: чтений {reads / seconds:9.1f}/с, '
+                f'записей {writes / seconds:8.1f}/с, ошибок {errors}'
+            )
+
+    def run_profile(self, profile, options):
+        user_ids = [
+            User.objects.create(username=f'bench-{i}').id
+            for i in range(options['workers'])
+        ]
+        # Дочерние процессы должны открыть свои соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['workers']) as pool:
+            results = pool.starmap(run_worker, [
+                (i, user_id, options['seconds'], options['write_ratio'],
+                 profile['persistent'])
+                for i, user_id in enumerate(user_ids)
+            ])
+        return tuple(map(sum, zip(*results)))
@@ -0,0 +1,123 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.management.bench import (
+    percentile, russian_text, russian_title, scratch_database
+)
+from notes.models import Note, NoteTag, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет на временной БД облако тегов из счётчиков и с '
+            'COUNT ... GROUP BY, страницы тегов и запросы списка.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=20_000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument(
+            '--tags-per-note', type=int, nargs='+', default=[1, 10],
+            help='Сколько тегов у каждой заметки.'
+        )
+        parser.add_argument('--requests', type=int, default=100)
+
+    def handle(self, *args, **options):
+        for per_note in options['tags_per_note']:
+            # Без кэша страниц: каждый запрос доходит до БД.
+            caches = {
+                **settings.CACHES,
+                'bench-pages': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                },
+            }
+            with scratch_database(
+                CACHES=caches, NOTES_PAGE_CACHE='bench-pages',
+                NOTES_JOBS_SYNC=True
+            ):
+                self.run(per_note, options)
+
+    def run(self, per_note, options):
+        rnd = random.Random(0)
+        author = User.objects.create(username='bench-tags')
+        Note.objects.bulk_create(
+            (Note(title=russian_title(rnd), text=russian_text(rnd),
+                  slug=f'note-{i}', author=author)
+             for i in range(options['notes'])),
+            batch_size=1000
+        )
+        note_ids = list(Note.objects.values_list('id', flat=True))
+        # Частоты тегов по Ципфу: есть частые и редкие теги.
+        weights = [1 / rank for rank in range(1, options['tags'] + 1)]
+        Tag.objects.bulk_create(
+            Tag(author=author, name=f'тег {i}', slug=f'teg-{i}')
+            for i in range(options['tags'])
+        )
+        tags = list(Tag.objects.order_by('id'))
+        links = {
+            (note_id, tag.id)
+            for note_id in note_ids
+            for tag in rnd.choices(tags, weights, k=per_note)
+        }
+        NoteTag.objects.bulk_create(
+            (NoteTag(note_id=note_id, tag_id=tag_id)
+             for note_id, tag_id in links),
+            batch_size=1000
+        )
+        for tag_id, count in (
+            NoteTag.objects.values('tag').annotate(count=Count('id'))
+            .values_list('tag', 'count')
+        ):
+            Tag.objects.filter(id=tag_id).update(note_count=count)
+        stored = self.measure(options, lambda: list(
+            Tag.objects.for_author(author).filter(note_count__gt=0)
+            .order_by('slug')
+        ))
+        grouped = self.measure(options, lambda: list(
+            Tag.objects.for_author(author).annotate(count=Count('notes'))
+            .filter(count__gt=0).order_by('slug')
+        ))
+        client = Client()
+        client.force_login(author)
+        pages = {
+            name: self.measure(
+                options, lambda url=url: client.get(url)
+            )
+            for name, url in (
+                ('облако', reverse('notes:tags')),
+                ('частый тег', reverse('notes:tag', args=(tags[0].slug,))),
+                ('редкий тег', reverse('notes:tag', args=(tags[-1].slug,))),
+                ('список', reverse('notes:list')),
+            )
+        }
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('notes:list'))
+        self.stdout.write(
+            f'тегов у заметки {per_note}: облако из счётчиков p50 '
+            f'{percentile(stored, 0.5):6.2f} мс, с GROUP BY p50 '
+            f'{percentile(grouped, 0.5):6.2f} мс; запросов на список '
+            f'{len(queries)}'
+        )
+        for name, latencies in pages.items():
+            self.stdout.write(
+                f'  страница «{name}»: p50 '
+                f'{percentile(latencies, 0.5):6.2f} мс'
+            )
+
+    def measure(self, options, run):
+        run()
+        latencies = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            run()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return sorted(latencies)
@@ -0,0 +1,73 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from notes.models import Note
+from notes.sharding import note_shards
+
+User = get_user_model()
+# Имя автора берётся из default отдельно: заметки могут быть на шарде.
+FIELDS = ('author_id', 'title', 'text', 'slug')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки пользователя или всего сайта в JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Имя пользователя.')
+        parser.add_argument(
+            '--output', default='-', help='Файл или «-» для stdout.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                author = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Нет пользователя {options["user"]}.')
+            querysets = [Note.objects.for_author(author)]
+        else:
+            querysets = [Note.objects.using(using) for using in note_shards()]
+        self.usernames = {}
+        output = (
+            sys.stdout if options['output'] == '-'
+            else open(options['output'], 'w', encoding='utf-8')
+        )
+        started = time.perf_counter()
+        count = 0
+        try:
+            rows = (
+                row
+                for notes in querysets
+                for row in notes.order_by('id').values_list(*FIELDS)
+                .iterator(chunk_size=options['chunk_size'])
+            )
+            for author_id, title, text, slug in rows:
+                output.write(json.dumps({
+                    'author': self.get_username(author_id),
+                    'title': title,
+                    'text': text,
+                    'slug': slug,
+                }, ensure_ascii=False) + '\n')
+                count += 1
+                if count % options['chunk_size'] == 0:
+                    self.report(count, started)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.report(count, started)
+
+    def get_username(self, author_id):
+        if author_id not in self.usernames:
+            self.usernames[author_id] = User.objects.values_list(
+                'username', flat=True
+            ).get(pk=author_id)
+        return self.usernames[author_id]
+
+    def report(self, count, started):
+        rate = count / max(time.perf_counter() - started, 1e-9)
+        self.stderr.write(f'Выгружено {count} заметок, {rate:.0f} в секунду.')
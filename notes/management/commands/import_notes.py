@@ -0,0 +1,149 @@
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes.cache import invalidate_user_pages
+from notes.models import Note, SyncCounter, pick_free_slug, slug_family_q
+from notes.search import index_queryset
+from notes.sharding import assign_ids, shard_for_author
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Загружает заметки из JSON Lines пачками через bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл или «-» для stdin.')
+        parser.add_argument(
+            '--user',
+            help='Назначить все заметки этому пользователю вместо author.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.authors = {}
+        self.default_author = None
+        if options['user']:
+            self.default_author = self.get_author_ids(
+                [options['user']]
+            )[options['user']]
+        source = (
+            sys.stdin if options['input'] == '-'
+            else open(options['input'], encoding='utf-8')
+        )
+        started = time.perf_counter()
+        count = 0
+        try:
+            records = (json.loads(line) for line in source if line.strip())
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                count += len(batch)
+                rate = count / max(time.perf_counter() - started, 1e-9)
+                self.stderr.write(
+                    f'Загружено {count} заметок, {rate:.0f} в секунду.'
+                )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    def get_author_ids(self, usernames):
+        """id авторов по именам, с кэшем на всё время загрузки."""
+        missing = set(usernames) - set(self.authors)
+        if missing:
+            self.authors.update(
+                User.objects.filter(username__in=missing)
+                .values_list('username', 'id')
+            )
+        unknown = set(usernames) - set(self.authors)
+        if unknown:
+            raise CommandError(
+                'Нет пользователей: ' + ', '.join(sorted(unknown))
+            )
+        return self.authors
+
+    def assign_slugs(self, notes, using):
+        """Подбирает свободные slug-и заметкам шарда using одним запросом."""
+        counts = Counter(note.slug for note in notes)
+        owners = Note.objects.using(using)
+        taken = set(
+            owners.filter(slug__in=counts)
+            .values_list('slug', flat=True)
+        )
+        colliding = taken | {
+            slug for slug, count in counts.items() if count > 1
+        }
+        if not colliding:
+            return
+        taken |= set(
+            owners.filter(slug_family_q(colliding))
+            .values_list('slug', flat=True)
+        )
+        for note in notes:
+            note.slug = pick_free_slug(note.slug, taken)
+            taken.add(note.slug)
+
+    def get_batch_author_ids(self, records):
+        if self.default_author is not None:
+            return [self.default_author] * len(records)
+        authors = self.get_author_ids(
+            {record['author'] for record in records}
+        )
+        return [authors[record['author']] for record in records]
+
+    def assign_change_seqs(self, notes):
+        """Выдаёт номера изменений блоком на каждого автора пачки."""
+        by_author = {}
+        for note in notes:
+            by_author.setdefault(note.author_id, []).append(note)
+        for author_id, author_notes in by_author.items():
+            last_seq = SyncCounter.next_value(author_id, len(author_notes))
+            first_seq = last_seq - len(author_notes) + 1
+            for seq, note in enumerate(author_notes, start=first_seq):
+                note.change_seq = seq
+
+    def import_batch(self, records):
+        default_slugs = Note.slugs_from_titles(
+            [record['title'] for record in records]
+        )
+        notes = [
+            Note(
+                title=record['title'],
+                text=record['text'],
+                slug=record.get('slug') or default_slug,
+                author_id=author_id,
+            )
+            for record, default_slug, author_id in zip(
+                records, default_slugs, self.get_batch_author_ids(records)
+            )
+        ]
+        for note in notes:
+            # bulk_create не вызывает save(): превью считаем здесь.
+            note.update_text_stats()
+        by_shard = {}
+        for note in notes:
+            by_shard.setdefault(
+                shard_for_author(note.author_id), []
+            ).append(note)
+        for using, shard_notes in by_shard.items():
+            with transaction.atomic(using=using):
+                # Счётчик первым: транзакция сразу берёт блокировку записи.
+                self.assign_change_seqs(shard_notes)
+                self.assign_slugs(shard_notes, using)
+                assign_ids(shard_notes, using)
+                Note.objects.using(using).bulk_create(shard_notes)
+                # bulk_create не шлёт сигналов: индекс обновляем сами.
+                index_queryset(Note.objects.using(using).filter(
+                    slug__in=[note.slug for note in shard_notes]
+                ))
+        for author_id in {note.author_id for note in notes}:
+            invalidate_user_pages(author_id)
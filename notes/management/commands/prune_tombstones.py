@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes.sharding import note_shards
+from notes.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = ('Удаляет записи об удалённых заметках старше '
+            'NOTES_TOMBSTONE_DAYS дней на всех шардах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.NOTES_TOMBSTONE_DAYS,
+            help='Сколько дней хранить записи об удалениях.'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        for using in note_shards():
+            pruned = prune_tombstones(before, using)
+            self.stderr.write(f'{using}: удалено записей: {pruned}.')
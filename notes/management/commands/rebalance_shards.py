@@ -0,0 +1,470 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from notes.cache import invalidate_user_pages
+from notes.models import (
+    AuthorShard, Note, NoteRevision, NoteTag, NoteTombstone, SyncCounter,
+    Tag, pick_free_slug, slug_family_q,
+)
+from notes.search import index_queryset, unindex_notes
+from notes.sharding import (
+    forget_author_shard, note_shards, shard_for_author, sharding_enabled,
+)
+
+# Поля, которые bulk_create заполнил бы текущим временем.
+AUTO_NOW_FIELDS = {Note: ('modified',), NoteRevision: ('created',)}
+
+
+def author_loads():
+    """Число заметок каждого автора на каждом шарде."""
+    return {
+        using: dict(
+            Note.objects.using(using).order_by().values('author_id')
+            .annotate(count=Count('id')).values_list('author_id', 'count')
+        )
+        for using in note_shards()
+    }
+
+
+def plan_moves(loads):
+    """Переносы авторов, жадно выравнивающие число заметок на шардах.
+
+    С самого загруженного шарда на самый свободный переносится самый
+    крупный автор, который не превратит свободный шард в самый
+    загруженный. Возвращает список (автор, откуда, куда).
+    """
+    loads = {using: dict(authors) for using, authors in loads.items()}
+    totals = {using: sum(authors.values()) for using, authors in loads.items()}
+    origins = {}
+    targets = {}
+    while True:
+        heavy = max(totals, key=totals.get)
+        light = min(totals, key=totals.get)
+        gap = totals[heavy] - totals[light]
+        candidates = [
+            (count, author_id)
+            for author_id, count in loads[heavy].items() if count < gap
+        ]
+        if not candidates:
+            break
+        count, author_id = max(candidates)
+        loads[light][author_id] = loads[heavy].pop(author_id)
+        totals[heavy] -= count
+        totals[light] += count
+        origins.setdefault(author_id, heavy)
+        targets[author_id] = light
+    return [
+        (author_id, origins[author_id], target)
+        for author_id, target in targets.items()
+        if target != origins[author_id]
+    ]
+
+
+def recount_tags(using, author_id):
+    """Пересчитывает note_count тегов автора по связям NoteTag.
+
+    Нужен только после переноса, где связи пишутся в обход
+    Note.set_tags; страницы читают готовые счётчики.
+    """
+    links = NoteTag.objects.filter(tag=OuterRef('pk')).order_by().values(
+        'tag'
+    ).annotate(count=Count('id')).values('count')
+    Tag.objects.using(using).filter(author_id=author_id).update(
+        note_count=Coalesce(Subquery(links), 0)
+    )
+
+
+def delete_notes_sql(using, where, params):
+    """Удаляет заметки, их версии, теги и строки индекса без сигналов.
+
+    Сигналы удаления записали бы удаление для синхронизации и
+    поставили бы задания — а заметка не удаляется, а переезжает.
+    """
+    notes = Note._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT id FROM {notes} WHERE {where}', params)
+        note_ids = [row[0] for row in cursor.fetchall()]
+        for model in (NoteRevision, NoteTag):
+            cursor.execute(
+                f'DELETE FROM {model._meta.db_table} WHERE note_id IN '
+                f'(SELECT id FROM {notes} WHERE {where})',
+                params
+            )
+        cursor.execute(f'DELETE FROM {notes} WHERE {where}', params)
+    unindex_notes(note_ids, using=using)
+
+
+class Command(BaseCommand):
+    help = ('Выравнивает шарды, перенося авторов вместе с заметками, '
+            'версиями, тегами и историей синхронизации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, каких авторов куда перенести.'
+        )
+        parser.add_argument(
+            '--author', type=int, help='Перенести одного автора по id.'
+        )
+        parser.add_argument('--to', help='Шард для --author.')
+        parser.add_argument(
+            '--wait', type=float,
+            help=('Секунды между переключением шарда и дозагрузкой '
+                  'изменений; по умолчанию NOTES_SHARD_MAP_TTL.')
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError('NOTES_SHARDS пуст: шардирование выключено.')
+        self.batch_size = options['batch_size']
+        wait = options['wait']
+        if wait is None:
+            wait = settings.NOTES_SHARD_MAP_TTL
+        if options['author'] is not None:
+            if options['to'] not in note_shards():
+                raise CommandError('--to: укажите шард из NOTES_SHARDS.')
+            source = shard_for_author(options['author'])
+            moves = [(options['author'], source, options['to'])]
+            if source == options['to']:
+                moves = []
+        else:
+            moves = plan_moves(author_loads())
+        for author_id, source, target in moves:
+            self.stdout.write(f'Автор {author_id}: {source} → {target}')
+            if not options['dry_run']:
+                self.move_author(author_id, source, target, wait)
+        if not moves:
+            self.stdout.write('Переносить некого.')
+
+    def move_author(self, author_id, source, target, wait):
+        """Переносит автора, не останавливая запись его заметок.
+
+        Заметки копируются на target, пока автор пишет в source. Затем
+        AuthorShard переключается на target; остальные процессы видят
+        это не позже чем через NOTES_SHARD_MAP_TTL, и всё записанное за
+        это время в source дозагружается с новыми номерами изменений.
+        """
+        started = time.perf_counter()
+        copied_seq, last_revision_id, renamed = self.copy_author(
+            author_id, source, target
+        )
+        with transaction.atomic(using=target, savepoint=False):
+            flip_seq = self.copy_counter(author_id, source, target)
+            AuthorShard.objects.update_or_create(
+                author_id=author_id, defaults={'shard': target}
+            )
+        forget_author_shard(author_id)
+        time.sleep(wait)
+        with transaction.atomic(using=target, savepoint=False):
+            self.catch_up(
+                author_id, source, target, copied_seq, flip_seq,
+                last_revision_id, renamed
+            )
+            recount_tags(target, author_id)
+        with transaction.atomic(using=source, savepoint=False):
+            self.check_moved(author_id, source, target)
+            delete_notes_sql(source, 'author_id = %s', (author_id,))
+            Tag.objects.using(source).filter(author_id=author_id).delete()
+            NoteTombstone.objects.using(source).filter(
+                author_id=author_id
+            ).delete()
+            SyncCounter.objects.using(source).filter(
+                author_id=author_id
+            ).delete()
+        invalidate_user_pages(author_id)
+        self.stderr.write(
+            f'Автор {author_id} перенесён за '
+            f'{time.perf_counter() - started:.1f} с.'
+        )
+
+    def batches(self, queryset):
+        """Строки queryset пачками по batch_size в порядке pk."""
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(
+                pk__gt=last_pk
+            )
+            batch = list(page[:self.batch_size])
+            if not batch:
+                return
+            # insert(keep_pk=False) сбрасывает pk строк пачки.
+            last_pk = batch[-1].pk
+            yield batch
+
+    def check_moved(self, author_id, source, target):
+        """Проверяет, что на target есть все заметки автора из source.
+
+        Заметка может отсутствовать, только если её удалили на target
+        после переключения. Иначе перенос прерывается до удаления
+        source, и заметки не теряются.
+        """
+        missing = set(
+            Note.objects.using(source).filter(author_id=author_id)
+            .values_list('id', flat=True)
+        )
+        missing -= set(
+            Note.objects.using(target).filter(author_id=author_id)
+            .values_list('id', flat=True)
+        )
+        missing -= set(
+            NoteTombstone.objects.using(target).filter(author_id=author_id)
+            .values_list('note_id', flat=True)
+        )
+        if missing:
+            raise CommandError(
+                f'Автор {author_id}: на {target} нет {len(missing)} '
+                f'заметок из {source}; в {source} они оставлены.'
+            )
+
+    def free_slugs(self, notes, target):
+        """Меняет slug-и notes, которые на target заняты другими заметками.
+
+        slug уникален в пределах шарда, и у переезжающего автора он
+        может совпасть с чужим. Такая заметка получает свободный slug
+        того же вида. Возвращает id переименованных заметок.
+        """
+        others = Note.objects.using(target).exclude(
+            id__in=[note.id for note in notes]
+        )
+        clashing = set(
+            others.filter(slug__in=[note.slug for note in notes])
+            .values_list('slug', flat=True)
+        )
+        if not clashing:
+            return []
+        taken = set(
+            others.filter(slug_family_q(clashing))
+            .values_list('slug', flat=True)
+        )
+        taken |= {note.slug for note in notes}
+        renamed = []
+        for note in notes:
+            if note.slug in clashing:
+                slug = pick_free_slug(note.slug, taken)
+                self.stderr.write(
+                    f'Заметка {note.id}: slug {note.slug} занят на '
+                    f'{target}, новый — {slug}.'
+                )
+                note.slug = slug
+                taken.add(slug)
+                renamed.append(note.id)
+        return renamed
+
+    def insert(self, objs, target, keep_pk=True):
+        """Вставляет копии строк в target, сохраняя даты изменения.
+
+        Конфликтов не пропускает: занятый id или slug на target дают
+        IntegrityError, и перенос откатывается, а не теряет строку.
+        Возвращает число вставленных строк.
+        """
+        if not objs:
+            return 0
+        model = type(objs[0])
+        auto_fields = AUTO_NOW_FIELDS.get(model, ())
+        saved = [[getattr(obj, name) for name in auto_fields] for obj in objs]
+        if not keep_pk:
+            for obj in objs:
+                obj.pk = None
+        model.objects.using(target).bulk_create(objs)
+        if auto_fields:
+            # bulk_create проставил текущее время: возвращаем прежнее.
+            for obj, values in zip(objs, saved):
+                for name, value in zip(auto_fields, values):
+                    setattr(obj, name, value)
+            model.objects.using(target).bulk_update(objs, auto_fields)
+        return len(objs)
+
+    def copy_author(self, author_id, source, target):
+        """Копирует заметки, теги и историю автора; id сохраняются.
+
+        Возвращает номер последнего скопированного изменения, id
+        последней скопированной версии в source и id заметок, которым
+        пришлось сменить slug.
+        """
+        notes = Note.objects.using(source).filter(author_id=author_id)
+        revisions = NoteRevision.objects.using(source).filter(
+            note__author_id=author_id
+        )
+        copied = notes.aggregate(seq=Max('change_seq'))['seq'] or 0
+        tombstones = NoteTombstone.objects.using(source).filter(
+            author_id=author_id
+        )
+        copied = max(
+            copied, tombstones.aggregate(seq=Max('change_seq'))['seq'] or 0
+        )
+        last_revision_id = revisions.aggregate(id=Max('id'))['id'] or 0
+        tags = Tag.objects.using(source).filter(author_id=author_id)
+        copied_rows = Counter()
+        renamed = []
+        with transaction.atomic(using=target, savepoint=False):
+            # Остатки прерванного переноса: автор всё ещё на source.
+            delete_notes_sql(target, 'author_id = %s', (author_id,))
+            for model in (Tag, NoteTombstone):
+                model.objects.using(target).filter(
+                    author_id=author_id
+                ).delete()
+            for model, queryset in (
+                (Note, notes.filter(change_seq__lte=copied)),
+                (NoteRevision, revisions.filter(id__lte=last_revision_id)),
+                (Tag, tags),
+            ):
+                for batch in self.batches(queryset):
+                    if model is Note:
+                        renamed += self.free_slugs(batch, target)
+                    copied_rows[model] += self.insert(batch, target)
+            for model, copies in (
+                (Note, Note.objects.filter(author_id=author_id)),
+                (NoteRevision, NoteRevision.objects.filter(
+                    note__author_id=author_id
+                )),
+                (Tag, Tag.objects.filter(author_id=author_id)),
+            ):
+                if copies.using(target).count() != copied_rows[model]:
+                    raise CommandError(
+                        f'Автор {author_id}: на {target} не сошлось число '
+                        f'строк {model._meta.label}; перенос отменён.'
+                    )
+            # Связь однозначна по (note, tag): её id выдаёт target.
+            for batch in self.batches(NoteTag.objects.using(source).filter(
+                note__author_id=author_id, note__change_seq__lte=copied
+            )):
+                self.insert(batch, target, keep_pk=False)
+            # id записей об удалениях нигде не видны: их выдаёт target.
+            for batch in self.batches(
+                tombstones.filter(change_seq__lte=copied)
+            ):
+                self.insert(batch, target, keep_pk=False)
+            index_queryset(
+                Note.objects.using(target).filter(author_id=author_id)
+            )
+        return copied, last_revision_id, renamed
+
+    def copy_counter(self, author_id, source, target):
+        """Переносит счётчик изменений автора и возвращает его значение."""
+        counter = SyncCounter.objects.using(source).filter(
+            author_id=author_id
+        ).values('value', 'pruned_seq').first() or {
+            'value': 0, 'pruned_seq': 0
+        }
+        SyncCounter.objects.using(target).update_or_create(
+            author_id=author_id, defaults=counter
+        )
+        return counter['value']
+
+    def catch_up(self, author_id, source, target, copied_seq, flip_seq,
+                 last_revision_id, renamed):
+        """Дозагружает то, что записали в source после копирования.
+
+        Изменение получает новый номер на target, чтобы клиенты
+        синхронизации его увидели; так же и смена slug-а при
+        копировании (renamed). Если заметку после переключения уже
+        меняли на target, остаётся версия target.
+        """
+        changed = list(
+            Note.objects.using(source)
+            .filter(author_id=author_id, change_seq__gt=copied_seq)
+            .order_by('change_seq')
+        )
+        deleted = list(
+            NoteTombstone.objects.using(source)
+            .filter(author_id=author_id, change_seq__gt=copied_seq)
+            .order_by('change_seq')
+        )
+        newer = set(
+            Note.objects.using(target)
+            .filter(author_id=author_id, change_seq__gt=flip_seq)
+            .values_list('id', flat=True)
+        )
+        changed = [note for note in changed if note.id not in newer]
+        deleted = [
+            tombstone for tombstone in deleted
+            if tombstone.note_id not in newer
+        ]
+        if deleted:
+            ids = [tombstone.note_id for tombstone in deleted]
+            delete_notes_sql(
+                target, f'id IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+        renamed = sorted(
+            set(renamed) - newer - {note.id for note in changed}
+            - {tombstone.note_id for tombstone in deleted}
+        )
+        events = len(changed) + len(deleted) + len(renamed)
+        if not events:
+            return
+        last_seq = SyncCounter.next_value(author_id, events)
+        seqs = iter(range(last_seq - events + 1, last_seq + 1))
+        for note in changed:
+            note.change_seq = next(seqs)
+        for tombstone in deleted:
+            tombstone.change_seq = next(seqs)
+        for note_id in renamed:
+            Note.objects.using(target).filter(id=note_id).update(
+                change_seq=next(seqs)
+            )
+        self.free_slugs(changed, target)
+        existing = set(
+            Note.objects.using(target)
+            .filter(id__in=[note.id for note in changed])
+            .values_list('id', flat=True)
+        )
+        # Скопированные заметки обновляются на месте: их версии целы.
+        Note.objects.using(target).bulk_update(
+            [note for note in changed if note.id in existing],
+            [field.name for field in Note._meta.concrete_fields
+             if not field.primary_key]
+        )
+        self.insert(
+            [note for note in changed if note.id not in existing], target
+        )
+        self.insert(deleted, target, keep_pk=False)
+        # Версии заметок, созданных или изменённых после копирования.
+        self.insert(
+            list(
+                NoteRevision.objects.using(source)
+                .filter(note__author_id=author_id, id__gt=last_revision_id)
+                .order_by('id')
+            ),
+            target
+        )
+        self.copy_note_tags(author_id, source, target, changed)
+        if changed:
+            index_queryset(Note.objects.using(target).filter(
+                id__in=[note.id for note in changed]
+            ))
+
+    def copy_note_tags(self, author_id, source, target, notes):
+        """Заменяет на target теги заметок notes тегами из source.
+
+        Тег, созданный в source после копирования, добавляется; если
+        такой тег уже завели на target, связь ведёт к нему по slug.
+        """
+        note_ids = [note.id for note in notes]
+        links = list(
+            NoteTag.objects.using(source).filter(note_id__in=note_ids)
+            .values_list('note_id', 'tag__slug')
+        )
+        tag_ids = dict(
+            Tag.objects.using(target).filter(author_id=author_id)
+            .values_list('slug', 'id')
+        )
+        new_tags = list(Tag.objects.using(source).filter(
+            author_id=author_id,
+            slug__in={slug for _, slug in links} - set(tag_ids)
+        ))
+        self.insert(new_tags, target)
+        tag_ids.update((tag.slug, tag.id) for tag in new_tags)
+        NoteTag.objects.using(target).filter(note_id__in=note_ids).delete()
+        self.insert(
+            [NoteTag(note_id=note_id, tag_id=tag_ids[slug])
+             for note_id, slug in links],
+            target, keep_pk=False
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задания notes.jobs пачками: до опустения '
+            'очереди или постоянно, опрашивая её с интервалом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых заданий не останется.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Секунды между опросами пустой очереди.'
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            count = run_pending(options['batch_size'])
+            done += count
+            if count:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stderr.write(f'Выполнено заданий: {done}.')
@@ -0,0 +1,51 @@
+import json
+import random
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from notes.management.bench import russian_text, russian_title
+
+User = get_user_model()
+PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    help = ('Создаёт пользователей bench-N с паролем bench-password '
+            'и заметки с русскими заголовками для нагрузочных тестов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--notes-per-user', type=int, default=100)
+        parser.add_argument('--text-words', type=int, default=60)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        usernames = [f'bench-{i}' for i in range(options['users'])]
+        existing = set(
+            User.objects.filter(username__in=usernames)
+            .values_list('username', flat=True)
+        )
+        # Один хэш на всех: PBKDF2 на каждого занял бы минуты.
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(username=username, password=password)
+            for username in usernames if username not in existing
+        )
+        # Слаги, коллизии и индексы — той же дорогой, что и при импорте.
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', encoding='utf-8'
+        ) as dump:
+            for username in usernames:
+                for _ in range(options['notes_per_user']):
+                    dump.write(json.dumps({
+                        'author': username,
+                        'title': russian_title(rnd),
+                        'text': russian_text(rnd, options['text_words']),
+                    }, ensure_ascii=False) + '\n')
+            dump.flush()
+            call_command('import_notes', dump.name, stderr=self.stderr)
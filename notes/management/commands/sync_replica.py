@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_to_replica(alias):
+    """Копирует основную базу SQLite в файл реплики alias."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    target = sqlite3.connect(connections.databases[alias]['NAME'])
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = ('Обновляет реплики SQLite из NOTES_READ_REPLICAS копией '
+            'основной базы: один раз или с интервалом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Секунды между копиями; 0 — скопировать один раз.'
+        )
+
+    def handle(self, *args, **options):
+        replicas = settings.NOTES_READ_REPLICAS
+        if not replicas:
+            raise CommandError('NOTES_READ_REPLICAS пуст.')
+        for alias in replicas:
+            if connections.databases[alias]['ENGINE'] != (
+                'django.db.backends.sqlite3'
+            ):
+                raise CommandError(f'{alias}: копировать умеем только SQLite.')
+        while True:
+            started = time.perf_counter()
+            for alias in replicas:
+                copy_to_replica(alias)
+            self.stderr.write(
+                f'Реплики обновлены за '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс.'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
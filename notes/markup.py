@@ -0,0 +1,310 @@
+import re
+from hashlib import blake2b
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .jobs import note_hook
+from .models import Note
+
+# Меняется вместе с разметкой: старые фрагменты в кэше не подойдут.
+RENDERER_VERSION = 3
+# Глубже цитаты не вкладываются: лишние '>' остаются текстом.
+MAX_QUOTE_DEPTH = 16
+
+FENCE_RE = re.compile(r'^(```|~~~)\s*([\w+-]*)\s*$')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE_RE = re.compile(r'^ {0,3}([-*_])(\s*\1){2,}\s*$')
+QUOTE_RE = re.compile(r'^ {0,3}>\s?(.*)$')
+BULLET_RE = re.compile(r'^ {0,3}[-*+]\s+(.*)$')
+NUMBERED_RE = re.compile(r'^ {0,3}\d{1,9}[.)]\s+(.*)$')
+
+BACKTICKS_RE = re.compile(r'`+')
+LINK_URL_RE = re.compile(r'\(([^()\s]+)\)')
+DELIMITER_RE = re.compile(r'\*\*|__|~~|\*|_')
+EMPHASIS_TAGS = {
+    '**': 'strong', '__': 'strong', '*': 'em', '_': 'em', '~~': 'del',
+}
+HARD_BREAK_RE = re.compile(r'(?: {2,}|\\)\n')
+# Ссылки только на http(s), почту и адреса без схемы: javascript:
+# и data: в href не попадут.
+SAFE_URL_RE = re.compile(r'^(?:https?://|mailto:|[^:/?#]*(?:[/?#]|$))', re.I)
+NEWLINE = '\n'
+# Заменители кода и ссылок на время разбора выделения.
+PLACEHOLDER = '\x00{}\x00'
+PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+
+
+def render_inline(text):
+    """Строчная разметка: код, ссылки, жирный, курсив, зачёркнутый.
+
+    Текст экранируется до разбора, поэтому HTML пользователя
+    выводится как текст, а теги ставит только сам рендерер.
+    """
+    stash = []
+
+    def keep(html):
+        stash.append(html)
+        return PLACEHOLDER.format(len(stash) - 1)
+
+    def link(label, url, source):
+        if not SAFE_URL_RE.match(url):
+            return escape(source)
+        return keep(
+            f'<a href="{escape(url)}" rel="nofollow noopener">'
+            f'{emphasis(escape(label))}</a>'
+        )
+
+    text = NEWLINE.join(
+        code_spans(line, keep)
+        for line in text.replace('\x00', '').split(NEWLINE)
+    )
+    parts = []
+    last = 0
+    for start, end, label, url in find_links(text):
+        parts.append(escape(text[last:start]))
+        parts.append(link(label, url, text[start:end]))
+        last = end
+    parts.append(escape(text[last:]))
+    html = HARD_BREAK_RE.sub('<br>\n', emphasis(''.join(parts)))
+
+    def restore(match):
+        # В подписи ссылки может быть свой заменитель кода.
+        return PLACEHOLDER_RE.sub(restore, stash[int(match[1])])
+
+    return PLACEHOLDER_RE.sub(restore, html)
+
+
+def code_spans(line, keep):
+    """Код в обратных кавычках: от серии `-ов до следующей той же длины.
+
+    Серии одной длины собраны в списки, и для каждой длины указатель
+    только идёт вперёд, поэтому разбор линейный: нежадная регулярка
+    с обратной ссылкой на длинных сериях `-ов работала кубическое время.
+    """
+    runs = list(BACKTICKS_RE.finditer(line))
+    if len(runs) < 2:
+        return line
+    by_length = {}
+    for index, run in enumerate(runs):
+        by_length.setdefault(len(run[0]), []).append(index)
+    pointers = dict.fromkeys(by_length, 0)
+    parts = []
+    last = 0
+    index = 0
+    while index < len(runs):
+        run = runs[index]
+        same = by_length[len(run[0])]
+        pointer = pointers[len(run[0])]
+        while pointer < len(same) and same[pointer] <= index:
+            pointer += 1
+        pointers[len(run[0])] = pointer
+        if pointer == len(same):
+            # Закрывающей серии нет: `-ы остаются текстом.
+            index += 1
+            continue
+        closing = runs[same[pointer]]
+        code = line[run.end():closing.start()].strip()
+        parts.append(line[last:run.start()])
+        parts.append(keep(f'<code>{escape(code)}</code>'))
+        last = closing.end()
+        index = same[pointer] + 1
+    parts.append(line[last:])
+    return ''.join(parts)
+
+
+def find_links(text):
+    """Ссылки [подпись](адрес): (начало, конец, подпись, адрес).
+
+    Каждой ']' пара — ближайшая '[' перед ней в той же строке, адрес —
+    в скобках сразу за ']'. Поиск только идёт вперёд, поэтому разбор
+    линейный даже на тысячах незакрытых '['.
+    """
+    position = 0
+    while True:
+        close = text.find(']', position)
+        if close < 0:
+            return
+        start = text.rfind('[', position, close)
+        url = LINK_URL_RE.match(text, close + 1)
+        if (
+            start < 0 or start + 1 == close or url is None
+            or NEWLINE in text[start + 1:close]
+        ):
+            position = close + 1
+            continue
+        yield start, url.end(), text[start + 1:close], url[1]
+        position = url.end()
+
+
+def emphasis(html):
+    """Жирный, курсив и зачёркнутый за один проход по разделителям.
+
+    Открывающий разделитель стоит перед непробельным символом,
+    закрывающий — после него; '_' ещё и не внутри слова. Закрывающий
+    парный ближайшему открытому того же вида, открытые между ними
+    остаются текстом. Каждый разделитель кладётся в стек и снимается
+    не больше раза, поэтому незакрытые '*' не дают квадратичного
+    перебора, как нежадные регулярные выражения.
+    """
+    return NEWLINE.join(emphasis_line(line) for line in html.split(NEWLINE))
+
+
+def emphasis_line(line):
+    parts = []
+    openers = []
+    open_kinds = {}
+    last = 0
+    for match in DELIMITER_RE.finditer(line):
+        kind = match[0]
+        before = line[match.start() - 1:match.start()]
+        after = line[match.end():match.end() + 1]
+        can_open = bool(after.strip())
+        can_close = bool(before.strip())
+        if kind == '_':
+            can_open = can_open and not (before.isalnum() or before == '_')
+            can_close = can_close and not (after.isalnum() or after == '_')
+        parts.append(line[last:match.start()])
+        last = match.end()
+        if can_close and open_kinds.get(kind):
+            while True:
+                opener_kind, index = openers.pop()
+                open_kinds[opener_kind] -= 1
+                if opener_kind == kind:
+                    break
+            tag = EMPHASIS_TAGS[kind]
+            parts[index] = f'<{tag}>'
+            parts.append(f'</{tag}>')
+        elif can_open:
+            openers.append((kind, len(parts)))
+            open_kinds[kind] = open_kinds.get(kind, 0) + 1
+            parts.append(kind)
+        else:
+            parts.append(kind)
+    parts.append(line[last:])
+    return ''.join(parts)
+
+
+def is_block_start(line, depth=0):
+    return bool(
+        FENCE_RE.match(line) or HEADING_RE.match(line)
+        or RULE_RE.match(line)
+        or (QUOTE_RE.match(line) and depth < MAX_QUOTE_DEPTH)
+        or BULLET_RE.match(line) or NUMBERED_RE.match(line)
+    )
+
+
+def render_blocks(lines, depth=0):
+    """Блочная разметка: абзацы, заголовки, списки, цитаты, код.
+
+    depth — вложенность цитаты: после MAX_QUOTE_DEPTH строки с '>'
+    идут абзацем, и рекурсия не растёт с длиной ввода.
+    """
+    html = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        fence = FENCE_RE.match(line)
+        if not line.strip():
+            i += 1
+        elif fence:
+            end = i + 1
+            while end < len(lines) and not lines[end].startswith(fence[1]):
+                end += 1
+            language = (
+                f' class="language-{fence[2]}"' if fence[2] else ''
+            )
+            code = escape('\n'.join(lines[i + 1:end]))
+            html.append(f'<pre><code{language}>{code}</code></pre>')
+            i = end + 1
+        elif HEADING_RE.match(line):
+            hashes, title = HEADING_RE.match(line).groups()
+            level = len(hashes)
+            html.append(f'<h{level}>{render_inline(title)}</h{level}>')
+            i += 1
+        elif RULE_RE.match(line):
+            html.append('<hr>')
+            i += 1
+        elif QUOTE_RE.match(line) and depth < MAX_QUOTE_DEPTH:
+            quoted = []
+            while i < len(lines) and QUOTE_RE.match(lines[i]):
+                quoted.append(QUOTE_RE.match(lines[i])[1])
+                i += 1
+            inner = render_blocks(quoted, depth + 1)
+            html.append(f'<blockquote>{inner}</blockquote>')
+        elif BULLET_RE.match(line) or NUMBERED_RE.match(line):
+            item_re = BULLET_RE if BULLET_RE.match(line) else NUMBERED_RE
+            tag = 'ul' if item_re is BULLET_RE else 'ol'
+            items = []
+            while i < len(lines) and lines[i].strip():
+                match = item_re.match(lines[i])
+                if match:
+                    items.append([match[1]])
+                elif is_block_start(lines[i], depth):
+                    break
+                else:
+                    items[-1].append(lines[i].strip())
+                i += 1
+            html.append(f'<{tag}>' + ''.join(
+                f'<li>{render_inline(NEWLINE.join(item))}</li>'
+                for item in items
+            ) + f'</{tag}>')
+        else:
+            paragraph = []
+            while (
+                i < len(lines) and lines[i].strip()
+                and not (paragraph and is_block_start(lines[i], depth))
+            ):
+                paragraph.append(lines[i])
+                i += 1
+            html.append(f'<p>{render_inline(NEWLINE.join(paragraph))}</p>')
+    return '\n'.join(html)
+
+
+def render_markdown(text):
+    """HTML из Markdown заметки; сырой HTML пользователя экранируется."""
+    return render_blocks(text.replace('\r\n', '\n').split('\n'))
+
+
+def get_markdown_cache():
+    return caches[settings.NOTES_MARKDOWN_CACHE]
+
+
+def fragment_key(text):
+    """Ключ фрагмента по содержимому: правка текста даёт новый ключ."""
+    digest = blake2b(text.encode(), digest_size=16).hexdigest()
+    return f'notes:md:{RENDERER_VERSION}:{digest}'
+
+
+def text_html(text):
+    """Готовый HTML текста из кэша; рендерит и кладёт при промахе."""
+    key = fragment_key(text)
+    cache = get_markdown_cache()
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(text)
+        cache.set(key, html, None)
+    return mark_safe(html)
+
+
+@note_hook('render_markdown')
+def render_notes(payloads):
+    """Рендерит заметки пачки заранее, чтобы первое чтение не ждало."""
+    cache = get_markdown_cache()
+    by_database = {}
+    for payload in payloads:
+        by_database.setdefault(payload['using'], []).append(
+            payload['note_id']
+        )
+    for using, note_ids in by_database.items():
+        texts = {
+            fragment_key(text): text
+            for text in Note.objects.using(using).filter(id__in=note_ids)
+            .values_list('text', flat=True)
+        }
+        missing = set(texts) - set(cache.get_many(list(texts)))
+        cache.set_many(
+            {key: render_markdown(texts[key]) for key in missing}, None
+        )
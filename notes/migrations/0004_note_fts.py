@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Полнотекстовый индекс хранит свою копию заголовка и текста: буква «ё»
+# в ней заменена на «е», а внешний content-источник не пережил бы
+# пересоздание таблицы notes_note в миграциях SQLite.
+CREATE_FTS_SQL = (
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title, text, tokenize='unicode61'
+    )
+    """,
+    """
+    INSERT INTO notes_note_fts(rowid, title, text)
+    SELECT id,
+           replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+           replace(replace(text, 'ё', 'е'), 'Ё', 'Е')
+    FROM notes_note
+    """,
+)
+
+DROP_FTS_SQL = (
+    'DROP TABLE IF EXISTS notes_note_fts',
+)
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_author_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_sqlite(CREATE_FTS_SQL), run_sqlite(DROP_FTS_SQL)
+        ),
+    ]
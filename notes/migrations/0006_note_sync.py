@@ -0,0 +1,60 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:42
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_change_seq(apps, schema_editor):
+    """Нумерует существующие заметки их id: номера монотонны у автора."""
+    Note = apps.get_model('notes', 'Note')
+    SyncCounter = apps.get_model('notes', 'SyncCounter')
+    Note.objects.update(change_seq=F('id'))
+    SyncCounter.objects.bulk_create(
+        SyncCounter(author_id=author_id, value=last_seq)
+        for author_id, last_seq in Note.objects.values('author').annotate(
+            last_seq=Max('id')
+        ).values_list('author', 'last_seq')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_id', models.IntegerField()),
+                ('note_id', models.BigIntegerField()),
+                ('slug', models.SlugField(max_length=100)),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('author_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'change_seq'], name='note_author_change_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notetombstone',
+            index=models.Index(fields=['author_id', 'change_seq'], name='tombstone_author_seq_idx'),
+        ),
+        migrations.RunPython(
+            backfill_change_seq, migrations.RunPython.noop
+        ),
+    ]
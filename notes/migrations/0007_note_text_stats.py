@@ -0,0 +1,57 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:53
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+BATCH_SIZE = 1000
+PREVIEW_LENGTH = 200
+
+
+def backfill_text_stats(apps, schema_editor):
+    """Считает preview и счётчики существующих заметок пачками по id."""
+    Note = apps.get_model('notes', 'Note')
+    last_id = 0
+    while True:
+        batch = list(
+            Note.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'text')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for note in batch:
+            words = note.text.split()
+            note.preview = Truncator(' '.join(words)).chars(PREVIEW_LENGTH)
+            note.word_count = len(words)
+            note.char_count = len(note.text)
+        Note.objects.bulk_update(
+            batch, ('preview', 'word_count', 'char_count')
+        )
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Символов'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='preview',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Начало текста'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Слов'),
+        ),
+        migrations.RunPython(
+            backfill_text_stats, migrations.RunPython.noop
+        ),
+    ]
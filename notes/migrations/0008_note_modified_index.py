@@ -0,0 +1,17 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_text_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['modified'], name='note_modified_idx'),
+        ),
+    ]
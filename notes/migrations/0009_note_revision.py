@@ -0,0 +1,31 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_note_modified_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер версии')),
+                ('snapshot_number', models.PositiveIntegerField(verbose_name='Номер снимка')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('data', models.BinaryField(verbose_name='Текст или разница')),
+                ('text_hash', models.CharField(max_length=32, verbose_name='Хэш текста')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('note', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='revision_note_number_uniq'),
+        ),
+    ]
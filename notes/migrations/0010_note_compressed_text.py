@@ -0,0 +1,71 @@
+# Generated by Django 3.2.15 on 2026-10-18 21:00
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models.functions import Length
+
+import notes.fields
+
+BATCH_SIZE = 500
+
+
+def compress_bodies(apps, schema_editor):
+    """Пересохраняет длинные тексты пачками по id: поле сожмёт их."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Note = apps.get_model('notes', 'Note')
+    threshold = settings.NOTES_COMPRESS_MIN_BYTES
+    if threshold is None:
+        return
+    # В UTF-8 символ занимает до 4 байт: короче threshold / 4 не сжать.
+    candidates = Note.objects.annotate(length=Length('text')).filter(
+        length__gte=threshold // 4
+    ).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(
+            candidates.filter(id__gt=last_id).only('id', 'text')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        Note.objects.bulk_update(batch, ('text',))
+        last_id = batch[-1].id
+
+
+def decompress_bodies(apps, schema_editor):
+    """Возвращает сжатым текстам вид строки до отмены поля."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, text FROM notes_note WHERE typeof(text) = 'blob'"
+        )
+        rows = cursor.fetchall()
+        cursor.executemany(
+            'UPDATE notes_note SET text = %s WHERE id = %s',
+            [(notes.fields.decompress_text(text), note_id)
+             for note_id, text in rows]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_note_revision'),
+    ]
+
+    operations = [
+        # Колонка та же: меняется только класс поля, без пересоздания
+        # таблицы, которое SQLite сделал бы для AlterField.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='text',
+                    field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+                ),
+            ],
+        ),
+        migrations.RunPython(compress_bodies, decompress_bodies),
+    ]
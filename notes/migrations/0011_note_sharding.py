@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 21:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0010_note_compressed_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorShard',
+            fields=[
+                ('author_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('shard', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteSlug',
+            fields=[
+                ('slug', models.SlugField(max_length=100, primary_key=True, serialize=False)),
+                ('author_id', models.IntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Столбец author делает фильтр по автору частью MATCH: FTS5 пересекает
+# списки документов по токену автора и словам запроса и ранжирует
+# только заметки автора. Виртуальной таблице нельзя добавить столбец,
+# поэтому индекс копируется в новую таблицу: тексты в нём уже
+# нормализованы, а сжатые тексты заметок SQL не прочитал бы.
+ADD_AUTHOR_SQL = (
+    """
+    CREATE VIRTUAL TABLE notes_note_fts_new USING fts5(
+        title, text, author, tokenize='unicode61'
+    )
+    """,
+    # author в ранжировании не участвует.
+    """
+    INSERT INTO notes_note_fts_new(notes_note_fts_new, rank)
+    VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')
+    """,
+    """
+    INSERT INTO notes_note_fts_new(rowid, title, text, author)
+    SELECT fts.rowid, fts.title, fts.text, note.author_id
+    FROM notes_note_fts AS fts
+    JOIN notes_note AS note ON note.id = fts.rowid
+    """,
+    'DROP TABLE notes_note_fts',
+    'ALTER TABLE notes_note_fts_new RENAME TO notes_note_fts',
+)
+
+DROP_AUTHOR_SQL = (
+    """
+    CREATE VIRTUAL TABLE notes_note_fts_old USING fts5(
+        title, text, tokenize='unicode61'
+    )
+    """,
+    """
+    INSERT INTO notes_note_fts_old(rowid, title, text)
+    SELECT rowid, title, text FROM notes_note_fts
+    """,
+    'DROP TABLE notes_note_fts',
+    'ALTER TABLE notes_note_fts_old RENAME TO notes_note_fts',
+)
+
+
+def run_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0014_id_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_sqlite(ADD_AUTHOR_SQL), run_sqlite(DROP_AUTHOR_SQL)
+        ),
+    ]
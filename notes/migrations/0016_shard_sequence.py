@@ -0,0 +1,40 @@
+from django.db import migrations, models, router
+
+
+def create_shard_jobs(apps, schema_editor):
+    """Создаёт очередь заданий на шардах, где 0012_job её не создала.
+
+    Очередь теперь своя на каждом шарде. Новый шард получает таблицу
+    в 0012_job, а шард, на котором её применили раньше, — здесь.
+    """
+    Job = apps.get_model('notes', 'Job')
+    connection = schema_editor.connection
+    if (
+        router.allow_migrate_model(connection.alias, Job)
+        and Job._meta.db_table not in connection.introspection.table_names()
+    ):
+        schema_editor.create_model(Job)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0015_note_fts_author'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardSequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='IdSequence',
+        ),
+        migrations.DeleteModel(
+            name='NoteSlug',
+        ),
+        migrations.RunPython(create_shard_jobs, migrations.RunPython.noop),
+    ]
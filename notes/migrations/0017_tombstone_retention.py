@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 22:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0016_shard_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notetombstone',
+            name='deleted',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='synccounter',
+            name='pruned_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,7 +1,32 @@
+from django.apps import apps
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from django.utils.text import Truncator
 
-from pytils.translit import slugify
+from .fields import CompressedTextField
+from .sharding import (
+    ID_STRIDE, assign_ids, note_shards, shard_for_author, sharding_enabled,
+)
+from .slugs import slugify_title, slugify_titles
+
+PREVIEW_LENGTH = 200
+SLUG_LENGTH = 100
+# Суффиксы -2...-999999: под них укорачивается длинный base slug-а.
+SLUG_SUFFIX_DIGITS = 6
+TEXT_STATS_FIELDS = ('preview', 'word_count', 'char_count')
+
+
+class AuthorQuerySet(models.QuerySet):
+    """Запросы к записям одного автора — на шарде этого автора."""
+
+    def for_author(self, author):
+        author_id = getattr(author, 'pk', author)
+        queryset = self.filter(author_id=author_id)
+        if sharding_enabled():
+            queryset = queryset.using(shard_for_author(author_id))
+        return queryset
 
 
 class Note(models.Model):
@@ -11,13 +36,13 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=SLUG_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
@@ -26,13 +51,459 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Отдельный индекс не нужен: author стоит первым в составных.
+        db_index=False,
+        # Пользователи — в default, а заметки могут быть на шарде.
+        db_constraint=False,
+    )
+    modified = models.DateTimeField('Изменена', auto_now=True)
+    change_seq = models.BigIntegerField(
+        'Номер изменения',
+        default=0,
+        editable=False,
+    )
+    # Считаются из text при сохранении: спискам не нужен сам текст.
+    preview = models.CharField(
+        'Начало текста',
+        max_length=PREVIEW_LENGTH,
+        default='',
+        editable=False,
+    )
+    word_count = models.PositiveIntegerField(
+        'Слов', default=0, editable=False
+    )
+    char_count = models.PositiveIntegerField(
+        'Символов', default=0, editable=False
+    )
+
+    tags = models.ManyToManyField(
+        'Tag',
+        through='NoteTag',
+        related_name='notes',
+        blank=True,
+        verbose_name='Теги',
     )
 
+    objects = AuthorQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+            models.Index(
+                fields=('author', 'slug'), name='note_author_slug_idx'
+            ),
+            models.Index(
+                fields=('author', 'modified'),
+                name='note_author_modified_idx'
+            ),
+            models.Index(
+                fields=('author', 'change_seq'),
+                name='note_author_change_seq_idx'
+            ),
+            # Фильтр по дате изменения в админке, без автора.
+            models.Index(fields=('modified',), name='note_modified_idx'),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        # Отложенный text не менялся: не читаем его ради пересчёта.
+        if 'text' not in self.get_deferred_fields():
+            self.update_text_stats()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'text' in update_fields:
+                kwargs['update_fields'] = {
+                    *update_fields, *TEXT_STATS_FIELDS
+                }
+        if sharding_enabled():
+            # Базу выбирает автор: create() передал бы using queryset-а.
+            kwargs['using'] = shard_for_author(self.author_id)
+        using = kwargs.get('using') or router.db_for_write(
+            Note, instance=self
+        )
+        kwargs['using'] = using
+        # Без savepoint: откат делает транзакция вызывающего кода.
+        with transaction.atomic(using=using, savepoint=False):
+            # Счётчик обновляется первым: транзакция SQLite сразу берёт
+            # блокировку записи, а не падает с «database is locked»
+            # при переходе от чтения slug-ов к записи.
+            self.change_seq = SyncCounter.next_value(self.author_id)
+            if not self.slug:
+                self.slug = self.get_free_slug()
+            if (
+                sharding_enabled() and self._state.adding
+                and self.pk is None
+            ):
+                assign_ids([self], using)
+                kwargs['force_insert'] = True
+            super().save(*args, **kwargs)
+
+    def update_text_stats(self):
+        """Пересчитывает preview, word_count и char_count по text."""
+        words = self.text.split()
+        self.preview = Truncator(' '.join(words)).chars(PREVIEW_LENGTH)
+        self.word_count = len(words)
+        self.char_count = len(self.text)
+
+    def get_free_slug(self):
+        """Свободный slug из заголовка: base, base-2, base-3...
+
+        Занятые варианты выбираются одним запросом по диапазону
+        уникального индекса, без повторных попыток вставки. Свой
+        прежний slug заметки занятым не считается.
+        """
+        base = self.slug_from_title(self.title)
+        taken = slug_owners(self.author_id).filter(slug_family_q([base]))
+        if self.pk is not None:
+            taken = taken.exclude(pk=self.pk)
+        return pick_free_slug(base, set(taken.values_list('slug', flat=True)))
+
+    def slug_is_taken(self):
+        """Занят ли slug другой заметкой.
+
+        Отличает после отката ошибку уникальности slug от прочих
+        IntegrityError записи заметки.
+        """
+        taken = slug_owners(self.author_id).filter(slug=self.slug)
+        if self.pk is not None:
+            taken = taken.exclude(pk=self.pk)
+        return taken.exists()
+
+    def set_tags(self, names, created=False):
+        """Заменяет теги заметки и поправляет счётчики облака тегов.
+
+        Теги с одинаковым slug — один тег. Счётчик меняется на ±1 только
+        у добавленных и снятых тегов, поэтому облаку не нужен подсчёт
+        по NoteTag. created — заметка новая, читать её теги незачем.
+        """
+        using = self._state.db
+        wanted = {}
+        for name in names:
+            name = ' '.join(name.split())[:Tag.NAME_LENGTH]
+            slug = Tag.slug_from_name(name)
+            if slug:
+                wanted.setdefault(slug, name)
+        current = {}
+        if not created:
+            current = dict(
+                NoteTag.objects.using(using).filter(note=self)
+                .values_list('tag__slug', 'tag_id')
+            )
+        removed = [current[slug] for slug in current if slug not in wanted]
+        added = [slug for slug in wanted if slug not in current]
+        tags = Tag.objects.using(using)
+        if removed:
+            NoteTag.objects.using(using).filter(
+                note=self, tag_id__in=removed
+            ).delete()
+            tags.filter(id__in=removed).update(
+                note_count=F('note_count') - 1
+            )
+        if added:
+            new_tags = [
+                Tag(author_id=self.author_id, slug=slug, name=wanted[slug])
+                for slug in added
+            ]
+            assign_ids(new_tags, using)
+            tags.bulk_create(new_tags, ignore_conflicts=True)
+            added_ids = list(
+                tags.filter(author_id=self.author_id, slug__in=added)
+                .values_list('id', flat=True)
+            )
+            NoteTag.objects.using(using).bulk_create(
+                NoteTag(note=self, tag_id=tag_id) for tag_id in added_ids
+            )
+            tags.filter(id__in=added_ids).update(
+                note_count=F('note_count') + 1
+            )
+
+    @classmethod
+    def slug_from_title(cls, title):
+        """slug по умолчанию: транслитерация заголовка pytils."""
+        return slugify_title(title, cls._meta.get_field('slug').max_length)
+
+    @classmethod
+    def slugs_from_titles(cls, titles):
+        """slug-и по умолчанию для пачки заголовков."""
+        return slugify_titles(titles, cls._meta.get_field('slug').max_length)
+
+
+class NoteRevision(models.Model):
+    """Версия заметки после одного сохранения.
+
+    Текст сжат zlib: у снимка хранится целиком, у остальных версий —
+    разницей с предыдущей (см. notes.revisions). snapshot_number —
+    номер снимка, от которого восстанавливается версия.
+    """
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        # Индекс даёт уникальность (note, number).
+        db_index=False,
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    snapshot_number = models.PositiveIntegerField('Номер снимка')
+    title = models.CharField('Заголовок', max_length=100)
+    data = models.BinaryField('Текст или разница')
+    text_hash = models.CharField('Хэш текста', max_length=32)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='revision_note_number_uniq'
+            ),
+        )
+
+    @property
+    def is_snapshot(self):
+        return self.number == self.snapshot_number
+
+
+class Tag(models.Model):
+    """Тег автора вместе с числом его заметок для облака тегов.
+
+    note_count меняет Note.set_tags и удаление заметки, поэтому облако
+    читает готовые числа. Тег без заметок остаётся с нулём.
+    """
+    NAME_LENGTH = 50
+
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # Индекс даёт уникальность (author, slug).
+        db_index=False,
+        db_constraint=False,
+    )
+    name = models.CharField('Название', max_length=NAME_LENGTH)
+    slug = models.SlugField('Адрес', max_length=NAME_LENGTH, db_index=False)
+    note_count = models.PositiveIntegerField('Заметок', default=0)
+
+    objects = AuthorQuerySet.as_manager()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'slug'), name='tag_author_slug_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def slug_from_name(cls, name):
+        return slugify_title(name, cls.NAME_LENGTH).strip('-_')
+
+
+class NoteTag(models.Model):
+    """Связь заметки с тегом.
+
+    Уникальный индекс (note, tag) читает теги заметок списка, индекс
+    (tag, note) — заметки тега по порядку id.
+    """
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'tag'), name='notetag_note_tag_uniq'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('tag', 'note'), name='notetag_tag_note_idx'),
+        )
+
+
+class SyncCounter(models.Model):
+    """Последний номер изменения заметок автора.
+
+    Номера изменений монотонны в пределах автора. Строка счётчика
+    блокируется до конца транзакции записи, поэтому номера выдаются
+    в порядке коммитов. Внешнего ключа нет: счётчик и записи об
+    удалениях не должны мешать каскадному удалению пользователя.
+    pruned_seq — самый большой номер записи об удалении, которую
+    удалила sync.prune_tombstones: клиенту с токеном меньше него
+    нужна полная загрузка.
+    """
+    author_id = models.IntegerField(primary_key=True)
+    value = models.BigIntegerField(default=0)
+    pruned_seq = models.BigIntegerField(default=0)
+
+    objects = AuthorQuerySet.as_manager()
+
+    @classmethod
+    def next_value(cls, author_id, count=1):
+        """Резервирует count номеров и возвращает последний из них."""
+        using = shard_for_author(author_id)
+        with transaction.atomic(using=using, savepoint=False):
+            counters = cls.objects.using(using)
+            updated = counters.filter(author_id=author_id).update(
+                value=F('value') + count
+            )
+            if not updated:
+                counters.create(author_id=author_id, value=count)
+                return count
+            return counters.values_list('value', flat=True).get(
+                author_id=author_id
+            )
+
+
+class NoteTombstone(models.Model):
+    """Запись об удалённой заметке для инкрементальной синхронизации.
+
+    Хранится NOTES_TOMBSTONE_DAYS дней после удаления заметки.
+    """
+    author_id = models.IntegerField()
+    note_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=100)
+    change_seq = models.BigIntegerField()
+    # Не auto_now_add: при переносе автора на другой шард время
+    # удаления копируется как есть.
+    deleted = models.DateTimeField(default=timezone.now)
+
+    objects = AuthorQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author_id', 'change_seq'),
+                name='tombstone_author_seq_idx'
+            ),
+        )
+
+
+class ShardSequence(models.Model):
+    """Последовательность id строк, которые живут на шардах.
+
+    Своя на каждом шарде; name — метка модели, например notes.note.
+    id выдаёт sharding.allocate_ids. Первое значение продолжает самый
+    большой id модели на всех шардах, поэтому включение шардирования
+    поверх прежних данных не выдаёт занятых id.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def next_value(cls, name, using, count=1):
+        """Резервирует count значений на шарде using, возвращает последнее."""
+        with transaction.atomic(using=using, savepoint=False):
+            sequences = cls.objects.using(using)
+            updated = sequences.filter(name=name).update(
+                value=F('value') + count
+            )
+            if not updated:
+                model = apps.get_model(name)
+                top = max(
+                    model.objects.using(shard).aggregate(id=Max('id'))['id']
+                    or 0
+                    for shard in note_shards()
+                )
+                last = top // ID_STRIDE + count
+                try:
+                    with transaction.atomic(using=using):
+                        sequences.create(name=name, value=last)
+                    return last
+                except IntegrityError:
+                    # Строку успел создать другой процесс.
+                    sequences.filter(name=name).update(
+                        value=F('value') + count
+                    )
+            return sequences.values_list('value', flat=True).get(name=name)
+
+
+class AuthorShard(models.Model):
+    """Шард автора, назначенный rebalance_shards; хранится в default."""
+    author_id = models.IntegerField(primary_key=True)
+    shard = models.CharField(max_length=100)
+
+
+class Job(models.Model):
+    """Задание фоновой очереди: работа после записи заметки.
+
+    Пока задание ждёт, второе с тем же (kind, key) не ставится. Взятое
+    воркером задание помечено locked_until, и новое с тем же ключом
+    уже ставится: запись, сделанная во время обработки, не потеряется.
+    Задания заметки лежат на её шарде, прочие — в default.
+    """
+    kind = models.CharField(max_length=50)
+    key = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=32, blank=True)
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'key'),
+                condition=Q(locked_until__isnull=True, failed=False),
+                name='job_pending_key_uniq'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('run_after',), condition=Q(failed=False),
+                name='job_due_idx'
+            ),
+            models.Index(fields=('worker',), name='job_worker_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.kind}:{self.key}'
+
+
+def slug_owners(author_id):
+    """Заметки, среди которых slug автора должен быть уникален.
+
+    Уникальный индекс slug у каждого шарда свой: slug уникален среди
+    заметок шарда автора, а ссылки на заметку всегда ведут к автору.
+    """
+    return Note.objects.using(shard_for_author(author_id))
+
+
+def slug_bases(base):
+    """base и его начала, к которым pick_free_slug добавит суффикс."""
+    bases = [base]
+    for digits in range(1, SLUG_SUFFIX_DIGITS + 1):
+        short = base[:SLUG_LENGTH - 1 - digits]
+        if short != bases[-1]:
+            bases.append(short)
+    return bases
+
+
+def slug_family_q(bases):
+    """Условие на slug-и вида base и base-* для всех base из списка.
+
+    Длинный base укорачивается под суффикс, поэтому в условие входят
+    и его начала из slug_bases.
+    """
+    condition = Q()
+    for base in dict.fromkeys(
+        short for base in bases for short in slug_bases(base)
+    ):
+        # Символ '.' идёт в ASCII сразу за '-': диапазон ловит base-*.
+        condition |= (
+            Q(slug=base) | Q(slug__gt=f'{base}-', slug__lt=f'{base}.')
+        )
+    return condition
+
+
+def pick_free_slug(base, taken):
+    """Первый из base, base-2, base-3..., которого нет в taken.
+
+    base укорачивается так, чтобы slug с суффиксом влез в SLUG_LENGTH.
+    """
+    slug = base
+    suffix = 1
+    while slug in taken:
+        suffix += 1
+        tail = f'-{suffix}'
+        slug = base[:SLUG_LENGTH - len(tail)] + tail
+    return slug
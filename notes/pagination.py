@@ -0,0 +1,79 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class KeysetPaginationMixin:
+    """Постраничный вывод по курсору (keyset) вместо OFFSET.
+
+    Страница выбирается условием ``id > курсор`` по индексу, поэтому
+    N-я страница стоит столько же, сколько первая.
+    """
+    paginate_by = 50
+    cursor_kwarg = 'after'
+    cursor_field = 'id'
+
+    def get_cursor(self):
+        """Возвращает курсор из GET-параметра или None."""
+        cursor = self.request.GET.get(self.cursor_kwarg)  # type: ignore
+        if not cursor:
+            return None
+        try:
+            return int(cursor)
+        except ValueError:
+            raise Http404('Неверный курсор страницы.')
+
+    def get_page_queryset(self, queryset, page_size):
+        """Запрос страницы: условие по курсору и LIMIT без OFFSET."""
+        cursor = self.get_cursor()
+        queryset = queryset.order_by(self.cursor_field)
+        if cursor is not None:
+            queryset = queryset.filter(
+                **{f'{self.cursor_field}__gt': cursor}
+            )
+        # Лишняя запись нужна только чтобы узнать, есть ли продолжение.
+        return queryset[:page_size + 1]
+
+    def paginate_queryset(self, queryset, page_size):
+        """Отдаёт одну страницу и признак наличия следующей."""
+        objects = list(self.get_page_queryset(queryset, page_size))
+        has_next = len(objects) > page_size
+        objects = objects[:page_size]
+        self.next_cursor = (
+            getattr(objects[-1], self.cursor_field) if has_next else None
+        )
+        return None, None, objects, has_next
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)  # type: ignore
+        context['cursor_kwarg'] = self.cursor_kwarg
+        context['next_cursor'] = getattr(self, 'next_cursor', None)
+        return context
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт COUNT(*) из кэша.
+
+    На большой таблице счёт строк дороже самой страницы, а точное
+    число в админке не нужно: оно может отставать на count_timeout
+    секунд.
+    """
+    count_timeout = 300
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return super().count
+        sql, params = query.sql_with_params()
+        key = 'notes:count:' + md5(
+            f'{sql}{params!r}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.count_timeout)
+        return count
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger('notes.profiling')
+
+# Статистика текущего запроса; None — запрос не попал в выборку.
+current_stats = ContextVar('notes_profiling_stats', default=None)
+
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    """Гистограмма с фиксированными верхними границами корзин."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.bounds] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': sum(self.counts),
+            'sum': round(self.total, 3),
+        }
+
+
+class RequestStats:
+    """Замеры одного запроса, попавшего в выборку."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = Counter()
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+
+    def add_query(self, using, sql, params, elapsed):
+        # Один SQL на разных шардах — разные запросы, а не повтор.
+        self.queries[using, sql, repr(params)] += 1
+        self.sql_ms += elapsed * 1000
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_count(self):
+        """Повторы одного и того же запроса с теми же параметрами."""
+        return sum(count - 1 for count in self.queries.values())
+
+    @property
+    def similar_count(self):
+        """Повторы одного SQL с разными параметрами — признак N+1."""
+        statements = Counter(
+            (using, sql) for using, sql, _ in self.queries.elements()
+        )
+        return sum(count - 1 for count in statements.values())
+
+
+class ViewMetrics:
+    """Агрегированные замеры одного имени URL."""
+
+    def __init__(self):
+        self.wall_ms = Histogram(MS_BUCKETS)
+        self.sql_ms = Histogram(MS_BUCKETS)
+        self.template_ms = Histogram(MS_BUCKETS)
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.duplicate_queries = 0
+        self.similar_queries = 0
+
+    def add(self, stats, wall_ms):
+        self.wall_ms.add(wall_ms)
+        self.sql_ms.add(stats.sql_ms)
+        self.template_ms.add(stats.template_ms)
+        self.queries.add(stats.query_count)
+        self.duplicate_queries += stats.duplicate_count
+        self.similar_queries += stats.similar_count
+
+    def as_dict(self):
+        return {
+            'wall_ms': self.wall_ms.as_dict(),
+            'sql_ms': self.sql_ms.as_dict(),
+            'template_ms': self.template_ms.as_dict(),
+            'queries': self.queries.as_dict(),
+            'duplicate_queries': self.duplicate_queries,
+            'similar_queries': self.similar_queries,
+        }
+
+
+_metrics = {}
+_lock = threading.Lock()
+_last_dump = time.monotonic()
+
+
+def record(view_name, stats):
+    global _last_dump
+    wall_ms = (time.perf_counter() - stats.started) * 1000
+    with _lock:
+        _metrics.setdefault(view_name, ViewMetrics()).add(stats, wall_ms)
+        interval = settings.NOTES_PROFILING_LOG_INTERVAL
+        dump = interval and time.monotonic() - _last_dump >= interval
+        if dump:
+            _last_dump = time.monotonic()
+    if dump:
+        logger.info(json.dumps(snapshot(), ensure_ascii=False))
+
+
+def snapshot():
+    """Текущие гистограммы по именам URL."""
+    with _lock:
+        return {name: metrics.as_dict() for name, metrics in _metrics.items()}
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper соединения: замеряет запрос, если идёт выборка."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(
+            context['connection'].alias, sql, params,
+            time.perf_counter() - started
+        )
+
+
+def render_response(response):
+    """Рендерит TemplateResponse, засчитывая время в текущий запрос."""
+    stats = current_stats.get()
+    started = time.perf_counter()
+    response.render()
+    if stats is not None:
+        stats.template_ms += (time.perf_counter() - started) * 1000
+    return response
+
+
+class ProfilingMiddleware:
+    """Замеры времени, SQL и шаблонов по именам URL для доли запросов.
+
+    Доля задаётся NOTES_PROFILING_SAMPLE_RATE; при нуле middleware
+    только сравнивает число и передаёт запрос дальше.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 узнаёт асинхронный экземпляр middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def sampled(self):
+        rate = settings.NOTES_PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        stats = current_stats.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.template_ms += (time.perf_counter() - started) * 1000
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, stats):
+        match = request.resolver_match
+        record(match.view_name if match else '<unresolved>', stats)
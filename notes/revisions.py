@@ -0,0 +1,125 @@
+import json
+import zlib
+from difflib import SequenceMatcher
+from hashlib import blake2b
+
+from django.db import router
+from django.db.models import OuterRef, Subquery
+
+from .models import NoteRevision
+from .sharding import assign_ids
+
+# Не больше стольких разниц подряд: восстановление версии читает
+# снимок и до SNAPSHOT_INTERVAL - 1 разниц после него.
+SNAPSHOT_INTERVAL = 20
+
+
+def text_hash(text):
+    return blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def pack(data):
+    return zlib.compress(
+        json.dumps(data, ensure_ascii=False).encode()
+    )
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def make_delta(old, new):
+    """Разница new с old по строкам.
+
+    Список операций: пара [начало, конец) — скопировать эти строки
+    old, строка — вставить её как есть.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    delta = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(
+        None, old_lines, new_lines
+    ).get_opcodes():
+        if tag == 'equal':
+            delta.append((i1, i2))
+        elif j1 < j2:
+            delta.append(''.join(new_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(
+        operation if isinstance(operation, str)
+        else ''.join(old_lines[operation[0]:operation[1]])
+        for operation in delta
+    )
+
+
+def snapshot_revision(note, number, title, text):
+    return NoteRevision(
+        note=note, number=number, snapshot_number=number, title=title,
+        data=pack(text), text_hash=text_hash(text)
+    )
+
+
+def record_revision(note, previous_title, previous_text):
+    """Записывает в историю сохранение заметки.
+
+    previous_title и previous_text — заметка до сохранения. Если
+    истории ещё нет или заметку меняли в обход истории, прежняя
+    версия сначала записывается снимком: разница всегда строится
+    от последней версии в истории.
+    """
+    last = note.revisions.order_by('-number').values(
+        'number', 'snapshot_number', 'text_hash'
+    ).first()
+    revisions = []
+    if last is None or last['text_hash'] != text_hash(previous_text):
+        number = last['number'] + 1 if last else 1
+        revisions.append(
+            snapshot_revision(note, number, previous_title, previous_text)
+        )
+        last = {'number': number, 'snapshot_number': number}
+    number = last['number'] + 1
+    if number - last['snapshot_number'] >= SNAPSHOT_INTERVAL:
+        revisions.append(
+            snapshot_revision(note, number, note.title, note.text)
+        )
+    else:
+        revisions.append(NoteRevision(
+            note=note, number=number,
+            snapshot_number=last['snapshot_number'], title=note.title,
+            data=pack(make_delta(previous_text, note.text)),
+            text_hash=text_hash(note.text)
+        ))
+    using = router.db_for_write(NoteRevision, instance=note)
+    assign_ids(revisions, using)
+    NoteRevision.objects.using(using).bulk_create(revisions)
+
+
+def revision_content(note, number):
+    """Заголовок и текст версии number одним запросом.
+
+    Выбирается снимок версии и разницы от него до неё. Если версии
+    нет, поднимается NoteRevision.DoesNotExist.
+    """
+    snapshot_number = NoteRevision.objects.filter(
+        note=OuterRef('note'), number=number
+    ).values('snapshot_number')
+    chain = list(
+        note.revisions.filter(
+            number__lte=number, number__gte=Subquery(snapshot_number)
+        ).order_by('number').values_list(
+            'number', 'snapshot_number', 'title', 'data'
+        )
+    )
+    if not chain:
+        raise NoteRevision.DoesNotExist(f'Нет версии {number}.')
+    text = None
+    for revision_number, snapshot, title, data in chain:
+        if revision_number == snapshot:
+            text = unpack(data)
+        else:
+            text = apply_delta(text, unpack(data))
+    return title, text
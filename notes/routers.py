@@ -0,0 +1,157 @@
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .sharding import (
+    SHARDED_MODELS, is_sharded, note_shards, shard_for_author,
+)
+
+# Состояние текущего запроса; None — вне запроса (команды, shell).
+current_state = ContextVar('notes_replica_state', default=None)
+
+PIN_COOKIE = 'notes_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaState:
+    """Куда читать в этом запросе и была ли запись заметок."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class ShardRouter:
+    """Заметки, их версии, теги и синхронизация — на шарде автора.
+
+    Шарды перечислены в NOTES_SHARDS; без них роутер ни на что не
+    влияет. На каждом шарде и своя очередь заданий. Справочник
+    шардов AuthorShard и модели других приложений живут в default.
+    Запросы без автора (админка, Note.objects.all()) идут в default:
+    для заметок автора нужен Note.objects.for_author().
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.NOTES_SHARDS or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not settings.NOTES_SHARDS or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        author_id = getattr(instance, 'author_id', None)
+        if author_id is not None:
+            return shard_for_author(author_id)
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label != 'notes' or model_name is None:
+            return None
+        if model_name in SHARDED_MODELS:
+            return db in note_shards()
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Чтение заметок в запросе — с реплик из NOTES_READ_REPLICAS.
+
+    На основную базу идут: запись, чтение внутри транзакции, чтение
+    вне запроса и все запросы «закреплённого» пользователя — того,
+    кто пишет сейчас или писал меньше NOTES_REPLICA_PIN_SECONDS назад.
+    Так пользователь сразу видит свои изменения, даже если реплика
+    отстаёт. Модели других приложений (сессии, пользователи) читаются
+    с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if (
+            not settings.NOTES_READ_REPLICAS
+            or model._meta.app_label != 'notes'
+            or state is None
+            or state.pinned
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.NOTES_READ_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None and model._meta.app_label == 'notes':
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему копированием основной базы.
+        return db not in settings.NOTES_READ_REPLICAS
+
+
+class ReplicaPinningMiddleware:
+    """Закрепляет за основной базой пишущие запросы и их авторов.
+
+    Небезопасные методы целиком идут на основную базу. После записи
+    заметок ставится кука на NOTES_REPLICA_PIN_SECONDS: следующие
+    запросы этого клиента тоже читают с основной базы.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django 3.2 узнаёт асинхронный экземпляр middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def start(self, request):
+        return ReplicaState(
+            pinned=(
+                request.method not in SAFE_METHODS
+                or PIN_COOKIE in request.COOKIES
+            )
+        )
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.NOTES_REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.NOTES_READ_REPLICAS:
+            return self.get_response(request)
+        state = self.start(request)
+        token = current_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        if not settings.NOTES_READ_REPLICAS:
+            return await self.get_response(request)
+        state = self.start(request)
+        token = current_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        return self.finish(state, response)
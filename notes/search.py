@@ -0,0 +1,206 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .jobs import note_hook
+from .models import Note
+from .sharding import shard_for_author, sharding_enabled
+
+FTS_TABLE = 'notes_note_fts'
+SNIPPET_TOKENS = 16
+# Служебные символы вокруг совпадений: их заменяют на <mark> после
+# экранирования, чтобы текст заметки не попал в HTML как есть.
+MARK_START = '\x02'
+MARK_END = '\x03'
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_enabled(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def normalize(text):
+    """Приводит «ё» к «е»: так хранится текст в индексе."""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def index_notes(notes, created=False, using=DEFAULT_DB_ALIAS):
+    """Добавляет или обновляет заметки в полнотекстовом индексе.
+
+    Для только что созданных заметок старых строк в индексе нет.
+    Индекс лежит в той же базе (шарде) using, что и заметки.
+    """
+    if not fts_enabled(using):
+        return
+    notes = list(notes)
+    with connections[using].cursor() as cursor:
+        if not created:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(note.id,) for note in notes]
+            )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE}(rowid, title, text, author) '
+            'VALUES (%s, %s, %s, %s)',
+            [(note.id, normalize(note.title), normalize(note.text),
+              note.author_id)
+             for note in notes]
+        )
+
+
+def index_queryset(queryset):
+    """Индексирует заметки запроса целиком внутри БД.
+
+    Нужен после bulk_create и update, которые не шлют сигналов.
+    Сжатые тексты (BLOB) SQL не прочитает: их индексирует Python.
+    """
+    using = queryset.db
+    if not fts_enabled(using):
+        return
+    ids_sql, params = queryset.values('id').query.sql_with_params()
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids_sql})', params
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {FTS_TABLE}(rowid, title, text, author)
+            SELECT id,
+                   replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+                   replace(replace(text, 'ё', 'е'), 'Ё', 'Е'),
+                   author_id
+            FROM notes_note
+            WHERE id IN ({ids_sql}) AND typeof(text) != 'blob'
+            """,
+            params
+        )
+        cursor.execute(
+            f"""
+            SELECT id FROM notes_note
+            WHERE id IN ({ids_sql}) AND typeof(text) = 'blob'
+            """,
+            params
+        )
+        compressed_ids = [row[0] for row in cursor.fetchall()]
+    if compressed_ids:
+        index_notes(
+            Note.objects.using(using).filter(id__in=compressed_ids)
+            .only('id', 'title', 'text', 'author'),
+            created=True, using=using
+        )
+
+
+def unindex_notes(note_ids, using=DEFAULT_DB_ALIAS):
+    """Убирает заметки из полнотекстового индекса."""
+    if not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(note_id,) for note_id in note_ids]
+        )
+
+
+@note_hook('reindex_notes')
+def reindex_notes(payloads):
+    """Приводит индекс к текущему состоянию заметок пачки.
+
+    Удалённые к этому моменту заметки убираются из индекса, поэтому
+    одно задание годится и после записи, и после удаления.
+    """
+    by_database = {}
+    for payload in payloads:
+        by_database.setdefault(payload['using'], set()).add(
+            payload['note_id']
+        )
+    for using, note_ids in by_database.items():
+        with transaction.atomic(using=using):
+            notes = list(
+                Note.objects.using(using).filter(id__in=note_ids)
+                .only('id', 'title', 'text', 'author')
+            )
+            unindex_notes(note_ids - {note.id for note in notes}, using)
+            index_notes(notes, using=using)
+
+
+def build_match_query(query, author_id=None):
+    """Строит запрос FTS5 из слов пользователя.
+
+    Каждое слово ищется как префикс: морфологии русского в FTS5 нет,
+    а префикс покрывает большинство окончаний. Слова ищутся только
+    в заголовке и тексте; с author_id запрос ограничен токеном автора
+    в столбце author, и FTS5 ранжирует только его заметки.
+    """
+    words = WORD_RE.findall(normalize(query))
+    if not words:
+        return ''
+    match_query = '{title text}: (%s)' % ' '.join(
+        f'"{word}"*' for word in words
+    )
+    if author_id is not None:
+        match_query = f'author: "{author_id}" AND {match_query}'
+    return match_query
+
+
+def match_q(query):
+    """Условие на заметки всех авторов, подходящие под запрос.
+
+    Для фильтрации queryset-ов, например в админке: id выбираются
+    подзапросом к индексу FTS5, без сканирования текстов.
+    """
+    if not fts_enabled():
+        return Q(title__icontains=query) | Q(text__icontains=query)
+    match_query = build_match_query(query)
+    if not match_query:
+        return Q(pk__in=[])
+    return Q(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match_query,)
+    ))
+
+
+def highlight(snippet):
+    return (
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search_notes(author, query, limit=50):
+    """Заметки автора, подходящие под запрос, по убыванию релевантности.
+
+    У каждой заметки есть атрибут snippet — экранированный фрагмент
+    текста с подсветкой совпадений.
+    """
+    match_query = build_match_query(query, author.pk)
+    if not match_query:
+        return []
+    using = shard_for_author(author.pk)
+    if not fts_enabled(using):
+        notes = list(Note.objects.for_author(author).filter(
+            Q(title__icontains=query) | Q(text__icontains=query),
+        ).only('id', 'slug', 'title')[:limit])
+        for note in notes:
+            note.snippet = ''
+        return notes
+    notes = list(Note.objects.raw(
+        f'''
+        SELECT note.id, note.slug, note.title,
+               snippet({FTS_TABLE}, -1, %s, %s, '…', %s) AS snippet
+        FROM {FTS_TABLE}
+        JOIN notes_note AS note ON note.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY {FTS_TABLE}.rank
+        LIMIT %s
+        ''',
+        (MARK_START, MARK_END, SNIPPET_TOKENS, match_query, limit),
+        # Без шардов базу для чтения выбирают роутеры (реплики).
+        using=using if sharding_enabled() else None
+    ))
+    for note in notes:
+        note.snippet = highlight(note.snippet)
+    return notes
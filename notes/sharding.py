@@ -0,0 +1,101 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Модели, которые живут на шарде автора заметок. Очередь заданий —
+# на каждом шарде: задание заметки пишется в её транзакцию.
+SHARDED_MODELS = (
+    'note', 'noterevision', 'notetombstone', 'synccounter', 'tag', 'notetag',
+    'shardsequence', 'job',
+)
+# Остаток id от деления на ID_STRIDE — номер шарда в NOTES_SHARDS,
+# который id выдал. Поэтому шардов не больше ID_STRIDE, а новые
+# дописываются в конец списка.
+ID_STRIDE = 64
+
+_shard_map = {}
+_shard_map_lock = threading.Lock()
+
+
+def sharding_enabled():
+    return bool(settings.NOTES_SHARDS)
+
+
+def is_sharded(model):
+    return (
+        model._meta.app_label == 'notes'
+        and model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def default_shard(author_id):
+    """Шард автора, для которого нет записи AuthorShard."""
+    return settings.NOTES_SHARDS[author_id % len(settings.NOTES_SHARDS)]
+
+
+def shard_for_author(author_id):
+    """Алиас базы с заметками автора.
+
+    Без шардирования — default. Иначе — запись AuthorShard, которую
+    пишет rebalance_shards, или шард по остатку от деления id.
+    Ответ помнится в процессе NOTES_SHARD_MAP_TTL секунд.
+    """
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    now = time.monotonic()
+    with _shard_map_lock:
+        cached = _shard_map.get(author_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    from .models import AuthorShard
+    shard = AuthorShard.objects.filter(author_id=author_id).values_list(
+        'shard', flat=True
+    ).first() or default_shard(author_id)
+    with _shard_map_lock:
+        _shard_map[author_id] = (now + settings.NOTES_SHARD_MAP_TTL, shard)
+    return shard
+
+
+def forget_author_shard(author_id=None):
+    """Сбрасывает запомненный шард автора или всех авторов."""
+    with _shard_map_lock:
+        if author_id is None:
+            _shard_map.clear()
+        else:
+            _shard_map.pop(author_id, None)
+
+
+def note_shards():
+    """Все базы, где могут быть заметки."""
+    return settings.NOTES_SHARDS or [DEFAULT_DB_ALIAS]
+
+
+def allocate_ids(model, using, count=1):
+    """Выдаёт count новых id строк model на шарде using.
+
+    Заметки, версии и теги переезжают между шардами с прежними id,
+    поэтому AUTOINCREMENT шарда не годится: после переноса он
+    продолжил бы счёт от чужих id. id — value * ID_STRIDE + номер
+    шарда, а value считает ShardSequence самого шарда: шарды выдают
+    непересекающиеся id, и запись заметки не трогает default.
+    """
+    from .models import ShardSequence
+    last = ShardSequence.next_value(model._meta.label_lower, using, count)
+    index = settings.NOTES_SHARDS.index(using)
+    return [
+        value * ID_STRIDE + index
+        for value in range(last - count + 1, last + 1)
+    ]
+
+
+def assign_ids(objs, using):
+    """Проставляет id новым строкам до вставки в шард using."""
+    if not sharding_enabled():
+        return
+    new = [obj for obj in objs if obj.pk is None]
+    if new:
+        ids = allocate_ids(type(new[0]), using, len(new))
+        for obj, pk in zip(new, ids):
+            obj.pk = pk
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from .auth import invalidate_user
+from .cache import invalidate_user_pages
+from .models import Note, Tag
+from .jobs import enqueue_note_hooks
+from .profiling import record_query
+from .sharding import sharding_enabled
+from .sync import record_deletion
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_note_pages(sender, instance, **kwargs):
+    """Запись или удаление заметки сбрасывает кэш страниц автора."""
+    invalidate_user_pages(instance.author_id)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def enqueue_note_jobs(sender, instance, using, **kwargs):
+    """Производные данные заметки считает очередь, а не запрос."""
+    enqueue_note_hooks(instance, using)
+
+
+@receiver(post_delete, sender=Note)
+def record_note_deletion(sender, instance, using, **kwargs):
+    record_deletion(instance, using)
+
+
+@receiver(pre_delete, sender=Note)
+def uncount_note_tags(sender, instance, using, **kwargs):
+    """Снимает заметку со счётчиков тегов, пока её связи ещё есть."""
+    Tag.objects.using(using).filter(notes=instance).update(
+        note_count=F('note_count') - 1
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def delete_sharded_notes(sender, instance, **kwargs):
+    """Каскад Django не видит заметок пользователя на других шардах."""
+    if not sharding_enabled():
+        return
+    Note.objects.for_author(instance.pk).delete()
+    Tag.objects.for_author(instance.pk).delete()
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Смена пароля и любая запись пользователя сбрасывают его кэш."""
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if connection.is_in_memory_db():
+            # Тестовая база в памяти общая для потоков (shared cache):
+            # без этого соединения асинхронных страниц из пула потоков
+            # ловят «database table is locked» на чтении и не видят
+            # незакоммиченных данных TestCase.
+            cursor.execute('PRAGMA read_uncommitted = true')
+
+
+@receiver(connection_created)
+def install_query_profiler(sender, connection, **kwargs):
+    """Без выборки профилировщик только читает ContextVar на запрос."""
+    connection.execute_wrappers.append(record_query)
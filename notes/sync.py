@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
+
+from .models import Note, NoteTombstone, SyncCounter
+
+SYNC_FIELDS = ('id', 'title', 'text', 'slug', 'modified', 'change_seq')
+
+
+class SyncTokenExpired(Exception):
+    """Записи об удалениях после токена уже удалены: нужна полная загрузка."""
+
+
+def record_deletion(note, using):
+    """Оставляет запись об удалении на шарде using заметки."""
+    NoteTombstone.objects.using(using).create(
+        author_id=note.author_id,
+        note_id=note.id,
+        slug=note.slug,
+        change_seq=SyncCounter.next_value(note.author_id),
+    )
+
+
+def prune_tombstones(before, using):
+    """Удаляет на шарде using записи об удалениях старше before.
+
+    Номер последней удалённой записи автора запоминается в его
+    счётчике как pruned_seq. Возвращает число удалённых записей.
+    """
+    tombstones = NoteTombstone.objects.using(using).filter(deleted__lt=before)
+    pruned_seq = tombstones.filter(
+        author_id=OuterRef('author_id')
+    ).values('author_id').annotate(seq=Max('change_seq')).values('seq')
+    with transaction.atomic(using=using):
+        SyncCounter.objects.using(using).filter(
+            author_id__in=tombstones.values('author_id')
+        ).update(pruned_seq=Greatest('pruned_seq', Subquery(pruned_seq)))
+        return tombstones.delete()[0]
+
+
+def changes_since(author_id, token, limit=500):
+    """Изменения заметок автора с номером больше token.
+
+    Возвращает новый token, изменённые заметки, удалённые заметки
+    и признак того, что за token есть ещё изменения. Если изменений
+    нет, выполняется один запрос по первичному ключу счётчика.
+    Если часть удалений после token уже забыта, поднимается
+    SyncTokenExpired; token 0 — полная загрузка — годен всегда.
+    """
+    counter = SyncCounter.objects.for_author(author_id).values_list(
+        'value', 'pruned_seq'
+    ).first()
+    if counter is None:
+        return token, [], [], False
+    last_seq, pruned_seq = counter
+    if 0 < token < pruned_seq:
+        raise SyncTokenExpired(
+            f'Токен {token} старше забытых удалений до {pruned_seq}.'
+        )
+    if last_seq <= token:
+        return token, [], [], False
+    changed = list(
+        Note.objects.for_author(author_id).filter(change_seq__gt=token)
+        .order_by('change_seq').values(*SYNC_FIELDS)[:limit]
+    )
+    deleted = list(
+        NoteTombstone.objects.for_author(author_id)
+        .filter(change_seq__gt=token).order_by('change_seq')
+        .values('note_id', 'slug', 'change_seq')[:limit]
+    )
+    # Обе выборки ограничены limit: отдаём только общий префикс по номеру.
+    events = sorted(
+        [(note['change_seq'], 'changed', note) for note in changed]
+        + [(note['change_seq'], 'deleted', note) for note in deleted],
+        key=lambda event: event[0]
+    )[:limit]
+    if not events:
+        return last_seq, [], [], False
+    new_token = events[-1][0]
+    return (
+        new_token,
+        [note for _, kind, note in events if kind == 'changed'],
+        [note for _, kind, note in events if kind == 'deleted'],
+        new_token < last_seq,
+    )
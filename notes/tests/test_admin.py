@@ -0,0 +1,77 @@
+from http import HTTPStatus
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import Note
+
+
+User = get_user_model()
+ADMIN_USERNAME = 'Админ'
+AUTHOR_USERNAME = 'Лев Толстой'
+
+
+# Поиск админки читает индекс: индексируем без очереди.
+@override_settings(NOTES_JOBS_SYNC=True)
+@skipIf(settings.NOTES_SHARDS, 'Админка показывает только заметки default')
+class TestNoteAdmin(TestCase):
+    '''
+    Класс для тестирования админки заметок:
+    - поиск по slug, автору и словам текста,
+    - COUNT(*) списка берётся из кэша,
+    - автор выбирается по id, а не из списка всех пользователей.'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            ADMIN_USERNAME, 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.note = Note.objects.create(
+            title='Война и мир', text='Том первый.', slug='voina',
+            author=cls.author
+        )
+        Note.objects.create(
+            title='Анна Каренина', text='Все счастливые семьи.',
+            slug='anna', author=cls.admin
+        )
+        cls.changelist_url = reverse('admin:notes_note_changelist')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def search(self, term):
+        response = self.client.get(self.changelist_url, {'q': term})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['cl'].result_list)
+
+    def test_search(self):
+        '''Проверка поиска по точному slug, автору и словам.'''
+        for term in ('voina', AUTHOR_USERNAME, 'ТОМ', 'войн'):
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [self.note])
+
+    def test_count_is_cached(self):
+        '''Проверка, что повторный показ списка не считает строки.'''
+        self.client.get(self.changelist_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+
+    def test_author_widget_is_raw_id(self):
+        '''Проверка, что форма не выводит всех пользователей.'''
+        response = self.client.get(
+            reverse('admin:notes_note_change', args=(self.note.id,))
+        )
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
+        self.assertNotContains(response, f'>{ADMIN_USERNAME}</option>')
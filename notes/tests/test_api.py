@@ -0,0 +1,182 @@
+import json
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from notes.models import Note, NoteTombstone
+from notes.revisions import revision_content
+from notes.sharding import shard_for_author
+from notes.sync import changes_since
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+READER_USERNAME = 'Читатель простой'
+
+
+class TestNotesApi(TestCase):
+    '''
+    Класс для тестирования JSON API:
+    - список отдаётся потоком и только свои заметки,
+    - повторный запрос с ETag или датой получает 304,
+    - заметку можно создать, а чужую — не увидеть,
+    - правка через API пишет версию в историю,
+    - токен старше забытых удалений получает 410,
+    - POST по сессии без CSRF-токена отклоняется.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create(username=READER_USERNAME)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            title='Заголовок', text='Текст', author=cls.author
+        )
+        Note.objects.create(title='Чужая', text='Текст', author=cls.reader)
+        cls.list_url = reverse('notes:api_list')
+        cls.detail_url = reverse('notes:api_detail', args=(cls.note.slug,))
+
+    def test_list_is_streamed_and_conditional(self):
+        '''
+        Проверяет потоковый список и 304 по If-None-Match.'''
+        response = self.author_client.get(self.list_url)
+        self.assertTrue(response.streaming)
+        notes = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([note['slug'] for note in notes], [self.note.slug])
+        response = self.author_client.get(
+            self.list_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_detail_is_conditional(self):
+        '''
+        Проверяет 304 по If-Modified-Since для заметки.'''
+        response = self.author_client.get(self.detail_url)
+        self.assertEqual(json.loads(response.content)['text'], 'Текст')
+        response = self.author_client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_create_and_scoping(self):
+        '''
+        Проверяет создание заметки и недоступность чужой.'''
+        response = self.author_client.post(
+            reverse('notes:api_add'),
+            data={'title': 'Новая', 'text': 'Текст', 'slug': 'new'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(
+            Note.objects.for_author(self.author).filter(slug='new').exists()
+        )
+        self.client.force_login(self.reader)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_sync_returns_only_changes(self):
+        '''
+        Проверяет, что синхронизация отдаёт только изменения после
+        токена, а без изменений обходится одним запросом.'''
+        url = reverse('notes:api_sync')
+        token = json.loads(self.author_client.get(url).content)['token']
+        self.assertEqual(
+            json.loads(self.author_client.get(url, {'since': token}).content),
+            {'token': token, 'changed': [], 'deleted': [], 'more': False}
+        )
+        with self.assertNumQueries(
+            1, using=shard_for_author(self.author.pk)
+        ):
+            changes_since(self.author.pk, token)
+        self.note.text = 'Новый текст'
+        self.note.save()
+        deleted = Note.objects.create(
+            title='Удалить', text='Текст', author=self.author
+        )
+        deleted_id = deleted.id
+        deleted.delete()
+        response = self.author_client.get(url, {'since': token})
+        data = json.loads(response.content)
+        self.assertEqual(
+            [note['text'] for note in data['changed']], ['Новый текст']
+        )
+        self.assertEqual(
+            [note['note_id'] for note in data['deleted']], [deleted_id]
+        )
+        self.assertGreater(data['token'], token)
+
+    def test_sync_after_pruned_tombstones(self):
+        '''
+        Проверяет, что после удаления старых записей об удалениях
+        токен до них получает 410, а полная загрузка и свежий токен
+        работают.'''
+        url = reverse('notes:api_sync')
+        old_token = json.loads(self.author_client.get(url).content)['token']
+        deleted = Note.objects.create(
+            title='Удалить', text='Текст', author=self.author
+        )
+        deleted.delete()
+        token = json.loads(
+            self.author_client.get(url, {'since': old_token}).content
+        )['token']
+        NoteTombstone.objects.for_author(self.author).update(
+            deleted=timezone.now() - timedelta(
+                days=settings.NOTES_TOMBSTONE_DAYS + 1
+            )
+        )
+        call_command('prune_tombstones', stderr=StringIO())
+        self.assertFalse(
+            NoteTombstone.objects.for_author(self.author).exists()
+        )
+        response = self.author_client.get(url, {'since': old_token})
+        self.assertEqual(response.status_code, HTTPStatus.GONE)
+        for since in (0, token):
+            response = self.author_client.get(url, {'since': since})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [note['slug'] for note in json.loads(
+                self.author_client.get(url, {'since': 0}).content
+            )['changed']],
+            [self.note.slug]
+        )
+
+    def test_edit_records_revision(self):
+        '''
+        Проверяет, что правка через API сохраняет прежнюю версию.'''
+        response = self.author_client.post(
+            reverse('notes:api_edit', args=(self.note.slug,)),
+            data={'title': 'Заголовок', 'text': 'Новый текст',
+                  'slug': self.note.slug},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [revision_content(self.note, number)[1] for number in (1, 2)],
+            ['Текст', 'Новый текст']
+        )
+
+    def test_post_requires_csrf_token(self):
+        '''
+        Проверяет, что POST по сессии без CSRF-токена получает 403.'''
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        url = reverse('notes:api_add')
+        data = {'title': 'Новая', 'text': 'Текст', 'slug': 'new'}
+        response = client.post(url, data, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        # CSRF-cookie ставит любая страница с формой.
+        client.get(reverse('notes:add'))
+        response = client.post(
+            url, data, content_type='application/json',
+            HTTP_X_CSRFTOKEN=client.cookies[settings.CSRF_COOKIE_NAME].value
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
@@ -0,0 +1,97 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from notes.auth import get_user_cache, user_cache
+from notes.checks import check_shared_caches
+
+
+User = get_user_model()
+
+
+class TestCachedAuth(TestCase):
+    '''
+    Класс для тестирования кэша сессий и пользователей:
+    - повторный запрос не читает из базы ни сессию, ни пользователя,
+    - выход через users:logout сразу разлогинивает,
+    - смена пароля разлогинивает другие сессии, несмотря на кэш,
+    - кэш отдаёт каждому запросу свою копию пользователя.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Лев Толстой')
+
+    def setUp(self):
+        get_user_cache().clear()
+        self.client.force_login(self.user)
+        self.home_url = reverse('notes:home')
+        self.add_url = reverse('notes:add')
+
+    def test_repeated_request_skips_auth_queries(self):
+        '''Проверка, что второй запрос берёт сессию и пользователя из кэша.'''
+        self.client.get(self.add_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.add_url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_logout_invalidates_cached_user(self):
+        '''Проверка, что после выхода страница требует входа.'''
+        self.client.get(self.add_url)
+        self.client.get(reverse('users:logout'))
+        response = self.client.get(self.add_url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_password_change_logs_out_other_sessions(self):
+        '''Проверка, что сессия со старым паролем больше не действует.'''
+        self.client.get(self.add_url)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password-123')
+        user.save()
+        response = self.client.get(self.add_url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_cache_returns_copies(self):
+        '''Проверка, что запросы не делят объект пользователя.'''
+        self.client.get(self.add_url)
+        session = self.client.session
+        entry = (
+            str(self.user.pk), session[BACKEND_SESSION_KEY],
+            session[HASH_SESSION_KEY]
+        )
+        first, second = user_cache.get(*entry), user_cache.get(*entry)
+        self.assertEqual(first, self.user)
+        self.assertIsNot(first, second)
+
+
+class TestSharedCachesCheck(SimpleTestCase):
+    '''
+    Класс для тестирования проверки notes.E001:
+    - при нескольких воркерах кэши в памяти процесса — ошибка,
+    - один воркер или общий кэш ошибок не дают.'''
+
+    def test_local_caches_with_workers(self):
+        '''Проверка, что LocMemCache при четырёх воркерах — ошибка.'''
+        self.assertEqual(check_shared_caches(None), [])
+        with override_settings(NOTES_WORKERS=4):
+            self.assertEqual(
+                [error.id for error in check_shared_caches(None)],
+                ['notes.E001'] * 3
+            )
+
+    def test_shared_caches_pass(self):
+        '''Проверка, что общий кэш при многих воркерах подходит.'''
+        shared = {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': '127.0.0.1:11211',
+        }
+        with override_settings(
+            NOTES_WORKERS=4,
+            CACHES={'default': shared, 'sessions': shared},
+        ):
+            self.assertEqual(check_shared_caches(None), [])
@@ -0,0 +1,76 @@
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from pytils.translit import slugify
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from notes.models import Note
+from notes.sharding import note_shards, shard_for_author
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+READER_USERNAME = 'Читатель простой'
+
+
+class TestExportImport(TestCase):
+    '''
+    Класс для тестирования выгрузки и загрузки заметок:
+    - выгруженные заметки загружаются другому пользователю,
+    - занятые slug-и получают свободный суффикс.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create(username=READER_USERNAME)
+        Note.objects.create(
+            title='Заголовок', text='Текст', author=cls.author
+        )
+
+    def test_export_then_import(self):
+        with NamedTemporaryFile(suffix='.jsonl') as dump:
+            call_command(
+                'export_notes', user=AUTHOR_USERNAME, output=dump.name,
+                stderr=StringIO()
+            )
+            call_command(
+                'import_notes', dump.name, user=READER_USERNAME,
+                stderr=StringIO()
+            )
+        imported = Note.objects.for_author(self.reader).get()
+        self.assertEqual(imported.title, 'Заголовок')
+        # slug уникален на шарде: суффикс нужен, только если шард общий.
+        same_shard = (
+            shard_for_author(self.author.pk)
+            == shard_for_author(self.reader.pk)
+        )
+        self.assertEqual(
+            imported.slug, 'zagolovok-2' if same_shard else 'zagolovok'
+        )
+
+
+class TestSeedNotes(TestCase):
+    '''
+    Проверяет, что генератор данных для нагрузки создаёт
+    пользователей и заметки с русскими заголовками и свободными slug-ами.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    def test_seed_notes(self):
+        call_command(
+            'seed_notes', users=2, notes_per_user=50, stderr=StringIO()
+        )
+        self.assertEqual(User.objects.filter(
+            username__startswith='bench-'
+        ).count(), 2)
+        notes = [
+            note
+            for using in note_shards()
+            for note in Note.objects.using(using).values_list('title', 'slug')
+        ]
+        self.assertEqual(len(notes), 100)
+        for title, slug in notes:
+            self.assertTrue(slug.startswith(slugify(title)))
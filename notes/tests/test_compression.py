@@ -0,0 +1,88 @@
+import json
+from io import StringIO
+from tempfile import NamedTemporaryFile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from notes.cache import get_page_cache
+from notes.models import Note
+from notes.search import search_notes
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+LONG_TEXT = 'Всё смешалось в доме Облонских. ' * 20
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Сжатие работает только в SQLite')
+@override_settings(NOTES_COMPRESS_MIN_BYTES=100, NOTES_JOBS_SYNC=True)
+class TestCompressedText(TestCase):
+    '''
+    Класс для тестирования сжатия длинных текстов:
+    - длинный текст хранится BLOB-ом, короткий — строкой,
+    - модель, страница заметки и поиск видят исходный текст,
+    - загрузка пачкой индексирует сжатые тексты.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+
+    def setUp(self):
+        get_page_cache().clear()
+
+    def storage_type(self, note):
+        with connections[note._state.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT typeof(text) FROM notes_note WHERE id = %s',
+                (note.id,)
+            )
+            return cursor.fetchone()[0]
+
+    def test_long_text_is_stored_compressed(self):
+        '''Проверка хранения и чтения длинного и короткого текста.'''
+        long_note = Note.objects.create(
+            title='Длинная', text=LONG_TEXT, author=self.author
+        )
+        short_note = Note.objects.create(
+            title='Короткая', text='Коротко.', author=self.author
+        )
+        self.assertEqual(self.storage_type(long_note), 'blob')
+        self.assertEqual(self.storage_type(short_note), 'text')
+        self.assertEqual(
+            Note.objects.for_author(self.author).get(pk=long_note.pk).text,
+            LONG_TEXT
+        )
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('notes:detail', args=(long_note.slug,))
+        )
+        self.assertContains(response, LONG_TEXT.strip())
+        self.assertEqual(
+            [note.id for note in search_notes(self.author, 'облонских')],
+            [long_note.id]
+        )
+
+    def test_import_indexes_compressed_text(self):
+        '''Проверка, что import_notes индексирует сжатые тексты.'''
+        with NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(json.dumps({
+                'author': AUTHOR_USERNAME, 'title': 'Анна',
+                'text': LONG_TEXT,
+            }) + '\n')
+            source.flush()
+            call_command(
+                'import_notes', source.name, stderr=StringIO()
+            )
+        note = Note.objects.for_author(self.author).get(title='Анна')
+        self.assertEqual(self.storage_type(note), 'blob')
+        self.assertEqual(
+            [found.id for found in search_notes(self.author, 'облонских')],
+            [note.id]
+        )
@@ -1,10 +1,21 @@
 from http import HTTPStatus
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
 from django.urls import reverse
 
-from notes.models import Note
+from notes import async_views
+from notes.cache import get_page_cache
+from notes.models import PREVIEW_LENGTH, Note
+from notes.search import build_match_query
+from notes.sharding import assign_ids, shard_for_author
+from notes.views import NotesList
 
 
 User = get_user_model()
@@ -13,6 +24,7 @@ READER_USERNAME = 'Читатель простой'
 
 
 class TestDetailNote(TestCase):
+    databases = {'default', *settings.NOTES_SHARDS}
 
     @classmethod
     def setUpTestData(cls):
@@ -28,6 +40,10 @@ class TestDetailNote(TestCase):
             args=(cls.note.slug,)
         )
 
+    def setUp(self):
+        # Откат транзакции теста не чистит кэш страниц.
+        get_page_cache().clear()
+
     def test_anonymous_client_has_no_editform(self):
         '''Проверяет, что анонимусу НЕ видна
         страница редактирования заметки.
@@ -75,3 +91,117 @@ class TestDetailNote(TestCase):
                 url = reverse(name, args=args)
                 response = self.client.get(url)
                 self.assertIn('form', response.context)
+
+    def test_notes_list_is_paginated_by_cursor(self):
+        '''
+        Проверяет, что список заметок:
+        - выводится страницами по paginate_by штук,
+        - следующая страница открывается по курсору.'''
+        page_size = NotesList.paginate_by
+        using = shard_for_author(self.author.pk)
+        notes = [
+            Note(title=f'Заметка {i}', text='Текст.',
+                 slug=f'note-{i}', author=self.author)
+            for i in range(page_size)
+        ]
+        assign_ids(notes, using)
+        Note.objects.using(using).bulk_create(notes)
+        url_to = reverse('notes:list')
+        self.client.force_login(self.author)
+        response = self.client.get(url_to)
+        first_page = response.context['object_list']
+        next_cursor = response.context['next_cursor']
+        self.assertEqual(len(first_page), page_size)
+        self.assertEqual(next_cursor, first_page[-1].id)
+        response = self.client.get(url_to, {'after': next_cursor})
+        second_page = response.context['object_list']
+        self.assertEqual(len(second_page), 1)
+        self.assertIsNone(response.context['next_cursor'])
+
+    @override_settings(NOTES_JOBS_SYNC=True)
+    def test_search_finds_only_own_notes(self):
+        '''
+        Проверяет, что поиск:
+        - находит заметку по началу слова без учёта регистра и «ё»,
+        - подсвечивает совпадение в экранированном фрагменте,
+        - не показывает чужие заметки.'''
+        Note.objects.create(
+            title='Ёлка <b>', text='Нарядить ёлку.', author=self.author
+        )
+        Note.objects.create(
+            title='Ёлка', text='Чужая ёлка.', author=self.reader
+        )
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:search'), {'q': 'ЕЛК'})
+        object_list = response.context['object_list']
+        self.assertEqual([note.author_id for note in object_list],
+                         [self.author.id])
+        self.assertIn('<mark>Елка</mark> &lt;b&gt;', object_list[0].snippet)
+
+    @override_settings(NOTES_JOBS_SYNC=True)
+    def test_search_filters_author_inside_match(self):
+        '''
+        Проверяет, что автор задаётся в самом запросе FTS5,
+        а слова пользователя не ищутся в столбце автора.'''
+        self.assertEqual(
+            build_match_query('Ёлка!', self.author.id),
+            f'author: "{self.author.id}" AND {{title text}}: ("Елка"*)'
+        )
+        Note.objects.create(title='Ёлка', text='Текст.', author=self.author)
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('notes:search'), {'q': str(self.author.id)}
+        )
+        self.assertEqual(list(response.context['object_list']), [])
+
+    def test_list_shows_preview_without_text(self):
+        '''
+        Проверяет, что сохранение считает превью и число слов,
+        а список заметок показывает превью, не читая text.'''
+        note = Note.objects.create(
+            title='Длинная', text='слово  ' * 100, author=self.author
+        )
+        self.assertEqual(note.word_count, 100)
+        self.assertEqual(note.char_count, 700)
+        self.assertEqual(len(note.preview), PREVIEW_LENGTH)
+        self.assertTrue(note.preview.endswith('…'))
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:list'))
+        listed = response.context['object_list'][-1]
+        self.assertIn('text', listed.get_deferred_fields())
+        self.assertContains(response, note.preview)
+
+
+class TestAsyncViews(TransactionTestCase):
+    '''
+    Проверяет, что асинхронные версии страниц для ASGI
+    отдают то же, что синхронные, и только автору.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    def setUp(self):
+        self.author = User.objects.create(username=AUTHOR_USERNAME)
+        self.reader = User.objects.create(username=READER_USERNAME)
+        self.note = Note.objects.create(
+            title='Тестовая_заметка',
+            text='Просто текст.',
+            author=self.author
+        )
+
+    def get(self, view_class, user, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user
+        return async_to_sync(view_class.as_view())(request, **kwargs)
+
+    def test_async_pages(self):
+        '''
+        Проверяет главную, список и заметку в асинхронном варианте.'''
+        response = self.get(async_views.Home, AnonymousUser())
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = self.get(async_views.NotesList, self.author)
+        self.assertContains(response, self.note.title)
+        response = self.get(
+            async_views.NoteDetail, self.author, slug=self.note.slug
+        )
+        self.assertContains(response, self.note.text)
+        with self.assertRaises(Http404):
+            self.get(async_views.NoteDetail, self.reader, slug=self.note.slug)
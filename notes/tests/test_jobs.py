@@ -0,0 +1,114 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notes import jobs
+from notes.models import Job, Note
+from notes.search import search_notes
+
+User = get_user_model()
+
+
+class TestJobs(TestCase):
+    '''
+    Класс для тестирования фоновой очереди заданий:
+    - запись заметки ставит задание, индекс обновляет воркер,
+    - ждущее задание не дублируется, а взятое не мешает новому,
+    - ошибка откладывает пачку, а после лимита попыток — бросает,
+    - воркер с истёкшей блокировкой не трогает задание другого,
+    - в синхронном режиме задания выполняются сразу.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Лев Толстой')
+
+    def test_note_is_indexed_by_worker(self):
+        '''Проверка, что поиск видит заметку после run_jobs,
+        а повторные записи дают одно задание на шарде заметки.'''
+        note = Note.objects.create(
+            title='Война', text='Князь Андрей.', author=self.author
+        )
+        note.text = 'Князь Андрей и Наташа.'
+        note.save()
+        # Задания заметки — в очереди её шарда.
+        queue = Job.objects.using(note._state.db)
+        self.assertEqual(queue.filter(kind='reindex_notes').count(), 1)
+        self.assertEqual(search_notes(self.author, 'наташа'), [])
+        call_command('run_jobs', once=True, stderr=StringIO())
+        self.assertFalse(queue.exists())
+        self.assertEqual(
+            [found.id for found in search_notes(self.author, 'наташа')],
+            [note.id]
+        )
+
+    def test_claimed_job_does_not_block_new_one(self):
+        '''Проверка, что задание ставится снова, пока прежнее
+        выполняется воркером.'''
+        jobs.enqueue('test', 'key', {})
+        jobs.enqueue('test', 'key', {})
+        self.assertEqual(len(jobs.claim(10)), 1)
+        jobs.enqueue('test', 'key', {})
+        self.assertEqual(Job.objects.filter(key='key').count(), 2)
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        '''Проверка, что упавшее задание откладывается с ошибкой,
+        а после NOTES_JOB_MAX_ATTEMPTS помечается failed.'''
+        failing = mock.Mock(side_effect=ValueError('сбой'))
+        with mock.patch.dict(jobs.handlers, {'test': failing}), \
+                self.assertLogs('notes.jobs', 'ERROR'):
+            jobs.enqueue('test', 'key', {'n': 1})
+            self.assertEqual(jobs.run_pending(), 1)
+            job = Job.objects.get()
+            self.assertEqual(job.attempts, 1)
+            self.assertFalse(job.failed)
+            self.assertIn('сбой', job.last_error)
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertEqual(jobs.run_pending(), 0)
+            Job.objects.update(run_after=timezone.now())
+            with override_settings(NOTES_JOB_MAX_ATTEMPTS=2):
+                jobs.run_pending()
+        self.assertTrue(Job.objects.get().failed)
+        failing.assert_called_with([{'n': 1}])
+
+    def test_expired_lease_keeps_reclaimed_job(self):
+        '''Проверка, что медленный воркер, у которого задание забрали
+        после истечения блокировки, не удаляет и не откладывает его.'''
+        reclaimed = []
+
+        def reclaim(payloads):
+            # Пока обработчик работает, блокировка истекает и задание
+            # берёт другой воркер.
+            Job.objects.update(locked_until=timezone.now())
+            reclaimed.extend(jobs.claim(10))
+
+        def reclaim_and_fail(payloads):
+            reclaim(payloads)
+            raise ValueError('сбой')
+
+        jobs.enqueue('test', 'key', {})
+        with mock.patch.dict(jobs.handlers, {'test': reclaim}):
+            self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.worker, reclaimed.pop().worker)
+        Job.objects.update(locked_until=None)
+        with mock.patch.dict(jobs.handlers, {'test': reclaim_and_fail}), \
+                self.assertLogs('notes.jobs', 'ERROR'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.worker, reclaimed.pop().worker)
+        self.assertEqual(job.last_error, '')
+
+    @override_settings(NOTES_JOBS_SYNC=True)
+    def test_sync_mode_runs_at_once(self):
+        '''Проверка, что в синхронном режиме очередь не пишется.'''
+        done = mock.Mock()
+        with mock.patch.dict(jobs.handlers, {'test': done}):
+            jobs.enqueue('test', 'key', {'n': 1})
+        done.assert_called_once_with([{'n': 1}])
+        self.assertFalse(Job.objects.exists())
@@ -1,10 +1,13 @@
 from http import HTTPStatus
 from pytils.translit import slugify
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from notes import profiling
+from notes.cache import get_page_cache, page_cache_stats, page_key
 from notes.forms import WARNING
 from notes.models import Note
 
@@ -26,6 +29,7 @@ class TestNoteCreation(TestCase):
     - слаг при создании заметки:
         - нельзя повторять,
         - можно не указывать.'''
+    databases = {'default', *settings.NOTES_SHARDS}
 
     @classmethod
     def setUpTestData(cls):
@@ -44,24 +48,23 @@ class TestNoteCreation(TestCase):
         '''
         Проверяет, что анонимус
         не может создать заметку.'''
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.user).count()
         self.client.post(self.url, data=self.form_data)
-        notes_count_after = Note.objects.count()
+        notes_count_after = Note.objects.for_author(self.user).count()
         self.assertEqual(notes_count_before, notes_count_after)  # Ноль штук.
 
     def test_user_can_create_note(self):
         '''
         Проверяет, что залогиненный
         может создать заметку.'''
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.user).count()
         response = self.auth_client.post(self.url, data=self.form_data)
         self.assertRedirects(response, reverse('notes:success'))
-        notes_count_after = Note.objects.count()
+        notes_count_after = Note.objects.for_author(self.user).count()
         self.assertEqual(notes_count_after - notes_count_before, 1)
-        note = Note.objects.filter(
+        note = Note.objects.for_author(self.user).filter(
             title=NOTE_TITLE,
             text=NOTE_TEXT,
-            author=self.user
         ).get()
         self.assertFalse(note is None)
 
@@ -70,7 +73,7 @@ class TestNoteCreation(TestCase):
         Проверяет, что нельзя использовать повторяющийся
         слаг при создании заметки.
         '''
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.user).count()
         response = self.auth_client.post(self.url, data=self.form_data)
         response = self.auth_client.post(self.url, data=self.form_data)
         self.assertFormError(
@@ -79,7 +82,7 @@ class TestNoteCreation(TestCase):
             field='slug',
             errors=NOTE_SLUG + WARNING
         )  # Ошибка формы при НЕпервом запросе с одинаковыми слагами.
-        notes_count_after = Note.objects.count()
+        notes_count_after = Note.objects.for_author(self.user).count()
         self.assertEqual(notes_count_after - notes_count_before, 1)
 
     def test_empty_slug(self):
@@ -88,15 +91,47 @@ class TestNoteCreation(TestCase):
         при создании заметки,
         то он сам собой транслитерируется из ее названия.'''
         self.form_data.pop('slug')
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.user).count()
         response = self.auth_client.post(self.url, data=self.form_data)
-        notes_count_after = Note.objects.count()
-        new_note = Note.objects.get()
+        notes_count_after = Note.objects.for_author(self.user).count()
+        new_note = Note.objects.for_author(self.user).get()
         expected_slug = slugify(self.form_data['title'])
         self.assertRedirects(response, reverse('notes:success'))
         self.assertEqual(notes_count_after - notes_count_before, 1)
         self.assertEqual(new_note.slug, expected_slug)
 
+    def test_empty_slug_gets_free_suffix(self):
+        '''
+        Проверяет, что автоматический слаг занятого заголовка
+        получает первый свободный суффикс.'''
+        self.form_data.pop('slug')
+        for _ in range(3):
+            self.auth_client.post(self.url, data=self.form_data)
+        expected_slug = slugify(self.form_data['title'])
+        self.assertEqual(
+            set(
+                Note.objects.for_author(self.user)
+                .values_list('slug', flat=True)
+            ),
+            {expected_slug, f'{expected_slug}-2', f'{expected_slug}-3'}
+        )
+
+    def test_long_title_suffix_fits_slug(self):
+        '''
+        Проверяет, что суффикс slug-а из заголовка в 100 символов
+        не выходит за длину поля: base укорачивается.'''
+        self.form_data.pop('slug')
+        self.form_data['title'] = 'a' * 100
+        for _ in range(3):
+            self.auth_client.post(self.url, data=self.form_data)
+        self.assertEqual(
+            set(
+                Note.objects.for_author(self.user)
+                .values_list('slug', flat=True)
+            ),
+            {'a' * 100, 'a' * 98 + '-2', 'a' * 98 + '-3'}
+        )
+
 
 class TestNoteEditDelete(TestCase):
     '''
@@ -107,6 +142,7 @@ class TestNoteEditDelete(TestCase):
     - для чужой записи:
         - невозможности редактировать,
         - невозможности удалить.'''
+    databases = {'default', *settings.NOTES_SHARDS}
 
     @classmethod
     def setUpTestData(cls):
@@ -136,18 +172,18 @@ class TestNoteEditDelete(TestCase):
     def test_author_can_delete_note(self):
         '''
         Проверяет, что автор может удалить свою заметку.'''
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.author).count()
         response = self.author_client.delete(self.delete_url)
-        notes_count_after = Note.objects.count()
+        notes_count_after = Note.objects.for_author(self.author).count()
         self.assertRedirects(response, reverse('notes:success', args=None))
         self.assertEqual(notes_count_before - notes_count_after, 1)
 
     def test_user_cant_delete_note_of_another_user(self):
         '''
         Проверяет, что читатель не может удалить чужую заметку.'''
-        notes_count_before = Note.objects.count()
+        notes_count_before = Note.objects.for_author(self.author).count()
         response = self.reader_client.delete(self.delete_url)
-        notes_count_after = Note.objects.count()
+        notes_count_after = Note.objects.for_author(self.author).count()
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertEqual(notes_count_before, notes_count_after)
 
@@ -166,3 +202,91 @@ class TestNoteEditDelete(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.Note_author.refresh_from_db()
         self.assertEqual(self.Note_author.text, NOTE_TEXT)
+
+
+class TestPageCache(TestCase):
+    '''
+    Класс для тестирования кэша страниц:
+    - повторный просмотр заметки берётся из кэша,
+    - после редактирования заметки кэш не отдаёт старый текст,
+    - вытесненное поколение не повторяет прежнее.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.note = Note.objects.create(
+            title=NOTE_TITLE,
+            text=NOTE_TEXT,
+            slug=NOTE_SLUG,
+            author=cls.author,
+        )
+        cls.detail_url = reverse('notes:detail', args=(cls.note.slug,))
+        cls.edit_url = reverse('notes:edit', args=(cls.note.slug,))
+
+    def setUp(self):
+        # Откат транзакции теста не сбрасывает кэш, чистим его сами.
+        get_page_cache().clear()
+
+    def test_second_view_is_cache_hit(self):
+        '''
+        Проверяет, что повторный просмотр не рендерит страницу заново.'''
+        self.author_client.get(self.detail_url)
+        hits_before = page_cache_stats['hits']
+        response = self.author_client.get(self.detail_url)
+        self.assertEqual(page_cache_stats['hits'] - hits_before, 1)
+        self.assertContains(response, NOTE_TEXT)
+
+    def test_edit_invalidates_cache(self):
+        '''
+        Проверяет, что после редактирования виден новый текст.'''
+        new_text = 'Обновлённый текст записи'
+        self.author_client.get(self.detail_url)
+        self.author_client.post(self.edit_url, data={
+            'title': NOTE_TITLE,
+            'text': new_text,
+            'slug': NOTE_SLUG,
+        })
+        response = self.author_client.get(self.detail_url)
+        self.assertContains(response, new_text)
+
+    def test_evicted_generation_does_not_repeat(self):
+        '''
+        Проверяет, что после вытеснения поколения ключи страниц новые.'''
+        cache = get_page_cache()
+        old_key = page_key(self.author.pk, self.note.slug)
+        cache.delete(f'notes:pages:{self.author.pk}:generation')
+        self.assertNotEqual(page_key(self.author.pk, self.note.slug), old_key)
+
+
+@override_settings(NOTES_PROFILING_SAMPLE_RATE=1)
+class TestProfiling(TestCase):
+    '''
+    Класс для тестирования профилировщика:
+    - создание заметки замеряется под именем notes:add,
+    - при создании нет повторяющихся запросов.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username=AUTHOR_USERNAME)
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.user)
+
+    def setUp(self):
+        profiling.reset()
+
+    def test_create_has_no_duplicate_queries(self):
+        '''
+        Проверяет, что NoteCreate не делает повторных запросов.'''
+        self.auth_client.post(reverse('notes:add'), data={
+            'title': NOTE_TITLE,
+            'text': NOTE_TEXT,
+        })
+        metrics = profiling.snapshot()['notes:add']
+        self.assertEqual(metrics['queries']['count'], 1)
+        self.assertGreater(metrics['queries']['sum'], 0)
+        self.assertEqual(metrics['duplicate_queries'], 0)
+        self.assertEqual(metrics['similar_queries'], 0)
@@ -0,0 +1,152 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from notes import markup
+from notes.cache import get_page_cache, invalidate_user_pages
+from notes.jobs import run_pending
+from notes.markup import fragment_key, get_markdown_cache, render_markdown
+from notes.models import Note
+
+User = get_user_model()
+
+
+class TestRenderMarkdown(SimpleTestCase):
+    '''
+    Класс для тестирования рендера Markdown:
+    - заголовки, выделение, списки, цитаты, код и ссылки,
+    - HTML пользователя и опасные ссылки выводятся текстом,
+    - незакрытое выделение, код и ссылки и глубокие цитаты рендерятся
+      за линейное время и без переполнения стека.'''
+
+    def test_blocks_and_inline(self):
+        '''Проверка основной разметки.'''
+        html = render_markdown(
+            '# План\n'
+            'Купить **хлеб** и *молоко*, `код`.\n'
+            '\n'
+            '- раз\n'
+            '- [два](https://ya.ru/?a=1&b=2)\n'
+            '\n'
+            '> цитата\n'
+            '\n'
+            '```python\n'
+            'print(1 < 2)\n'
+            '```'
+        )
+        self.assertHTMLEqual(html, (
+            '<h1>План</h1>'
+            '<p>Купить <strong>хлеб</strong> и <em>молоко</em>, '
+            '<code>код</code>.</p>'
+            '<ul><li>раз</li><li><a href="https://ya.ru/?a=1&amp;b=2" '
+            'rel="nofollow noopener">два</a></li></ul>'
+            '<blockquote><p>цитата</p></blockquote>'
+            '<pre><code class="language-python">print(1 &lt; 2)'
+            '</code></pre>'
+        ))
+
+    def test_user_html_is_escaped(self):
+        '''Проверка, что теги и javascript: не попадают в HTML.'''
+        html = render_markdown(
+            '<script>alert(1)</script> [ссылка](javascript:alert) '
+            '[*x*](data:text/html,1) snake_case_name'
+        )
+        self.assertNotIn('<script', html)
+        self.assertNotIn('href', html)
+        self.assertIn('&lt;script&gt;', html)
+        self.assertIn('snake_case_name', html)
+
+    def test_unclosed_emphasis_is_linear(self):
+        '''Проверка, что тысячи незакрытых разделителей остаются
+        текстом (нежадные регулярки рендерили такое десятки секунд).'''
+        for marker in ('*', '_', '**', '~~'):
+            with self.subTest(marker=marker):
+                text = f'{marker}a ' * 20000
+                html = render_markdown(text + f'{marker}b{marker}')
+                self.assertTrue(html.startswith(f'<p>{text}'))
+                tag = markup.EMPHASIS_TAGS[marker]
+                self.assertTrue(html.endswith(f'<{tag}>b</{tag}></p>'))
+
+    def test_long_backtick_runs_are_linear(self):
+        '''Проверка, что длинные серии `-ов разбираются линейно
+        (регулярка с обратной ссылкой тратила на 20 000 `-ов минуты).'''
+        self.assertEqual(
+            render_markdown('`' * 20000), f'<p>{"`" * 20000}</p>'
+        )
+        # Серии разной длины без пары, за ними — код.
+        runs = ' '.join('`' * length for length in range(2, 200))
+        html = render_markdown(runs + ' `код`')
+        self.assertTrue(html.endswith(' <code>код</code></p>'))
+        self.assertEqual(html.count('<code>'), 1)
+
+    def test_unclosed_links_are_linear(self):
+        '''Проверка, что тысячи незакрытых '[' и '[x](' остаются
+        текстом, а ссылка после них разбирается.'''
+        link = '[ок](/note/)'
+        for prefix in ('[' * 20000, '[x](' * 20000):
+            with self.subTest(prefix=prefix[:4]):
+                html = render_markdown(prefix + link)
+                self.assertEqual(html.count('<a '), 1)
+                self.assertTrue(html.endswith(
+                    '<a href="/note/" rel="nofollow noopener">ок</a></p>'
+                ))
+
+    def test_deep_quote_is_capped(self):
+        '''Проверка, что вложенность цитат ограничена, а не растёт
+        рекурсией до RecursionError.'''
+        html = render_markdown('>' * 3000)
+        self.assertEqual(
+            html.count('<blockquote>'), markup.MAX_QUOTE_DEPTH
+        )
+        self.assertIn('&gt;' * (3000 - markup.MAX_QUOTE_DEPTH), html)
+
+
+class TestMarkdownFragments(TestCase):
+    '''
+    Класс для тестирования кэша HTML-фрагментов:
+    - страница заметки показывает HTML из Markdown,
+    - фрагмент рендерится один раз на текст,
+    - задание после записи заметки кладёт фрагмент заранее.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Лев Толстой')
+        cls.note = Note.objects.create(
+            title='Список', text='**Важно**: <b>не тег</b>', author=cls.author
+        )
+
+    def setUp(self):
+        get_page_cache().clear()
+        get_markdown_cache().clear()
+        self.client.force_login(self.author)
+
+    def test_detail_renders_once_per_text(self):
+        '''Проверка, что повторный показ берёт фрагмент из кэша.'''
+        url = reverse('notes:detail', args=(self.note.slug,))
+        with mock.patch.object(
+            markup, 'render_markdown', wraps=markup.render_markdown
+        ) as render:
+            response = self.client.get(url)
+            # Сбрасываем страницы автора, но не кэш целиком.
+            invalidate_user_pages(self.author.pk)
+            self.client.get(url)
+        self.assertContains(
+            response, '<strong>Важно</strong>: &lt;b&gt;не тег&lt;/b&gt;',
+            html=True
+        )
+        render.assert_called_once_with(self.note.text)
+
+    def test_job_prerenders_saved_note(self):
+        '''Проверка, что воркер рендерит новый текст заранее.'''
+        self.note.text = '# Новый текст'
+        self.note.save()
+        key = fragment_key(self.note.text)
+        self.assertIsNone(get_markdown_cache().get(key))
+        run_pending()
+        self.assertEqual(
+            get_markdown_cache().get(key), '<h1>Новый текст</h1>'
+        )
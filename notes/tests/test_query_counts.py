@@ -0,0 +1,176 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, TestCase
+from django.test.client import MULTIPART_CONTENT
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.cache import get_page_cache
+from notes.models import Note, NoteRevision, NoteTag, SyncCounter, Tag
+from notes.sharding import (
+    allocate_ids, assign_ids, note_shards, shard_for_author,
+)
+
+
+User = get_user_model()
+NOTES_COUNTS = (0, 10, 10000)
+
+NOTE_FORM = {'title': 'Заголовок', 'text': 'Новый текст', 'tags': 'Работа'}
+# Другой текст: правка через API идёт после правки страницей и
+# пишет версию, а теги у заметки уже те же.
+NOTE_JSON = {**NOTE_FORM, 'text': 'Текст из API'}
+
+# Аргументы URL; {} заменяется числом заметок пользователя. Заметку
+# SPARE удаляет API: TARGET к тому времени уже удалена страницей.
+TARGET = ('target-{}',)
+SPARE = ('spare-{}',)
+
+# Бюджеты запросов на страницу: (имя URL, аргументы URL, данные POST
+# или None для GET, бюджет). Обычно это сессия, пользователь и сами
+# данные страницы. Удаление идёт последним: после него заметки нет.
+# Редактирование ещё читает последнюю версию и пишет новую в историю,
+# а запись тегов читает прежние теги, пишет связи и счётчики тегов.
+# Возврат к версии 1 (её записала правка) читает цепочку версий.
+# Удаление снимает заметку со счётчиков тегов и удаляет её связи.
+# У страниц со slug тег называется так же, как заметка. Страницы
+# API получают POST в JSON.
+ROUTE_BUDGETS = (
+    ('notes:home', (), None, 2),
+    ('notes:add', (), None, 2),
+    ('notes:list', (), None, 3),
+    ('notes:tags', (), None, 3),
+    ('notes:tag', TARGET, None, 4),
+    ('notes:search', (), None, 2),
+    ('notes:success', (), None, 2),
+    ('notes:metrics', (), None, 2),
+    ('notes:detail', TARGET, None, 3),
+    ('notes:edit', TARGET, None, 3),
+    ('notes:history', TARGET, None, 3),
+    ('notes:delete', TARGET, None, 3),
+    ('notes:api_list', (), None, 4),
+    ('notes:api_detail', TARGET, None, 4),
+    ('notes:api_sync', (), None, 5),
+    ('users:login', (), None, 2),
+    ('users:signup', (), None, 2),
+    ('users:logout', (), None, 4),
+    ('notes:add', (), NOTE_FORM, 12),
+    ('notes:api_add', (), NOTE_JSON, 12),
+    ('notes:edit', TARGET, NOTE_FORM, 17),
+    ('notes:api_edit', TARGET, NOTE_JSON, 11),
+    ('notes:restore', (*TARGET, 1), None, 4),
+    ('notes:restore', (*TARGET, 1), {}, 11),
+    ('notes:delete', TARGET, {}, 10),
+    ('notes:api_delete', SPARE, {}, 10),
+)
+# При шардировании id новых строк выдаёт ShardSequence шарда: UPDATE и
+# SELECT на модель. Создание берёт id заметке и тегу, правка страницей —
+# тегу и версии, правка через API и возврат к версии — только версии.
+SHARDED_ID_QUERIES = {
+    'notes:add': 4, 'notes:api_add': 4,
+    'notes:edit': 4, 'notes:api_edit': 2,
+    'notes:restore': 2,
+}
+
+
+class TestQueryCounts(TestCase):
+    '''
+    Проверяет для каждой страницы, что число SQL-запросов:
+    - не превышает бюджета,
+    - не растёт с числом заметок пользователя (0, 10 и 10 000).'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        if settings.NOTES_SHARDS:
+            # Первый id модели на шарде ищет максимум по всем шардам:
+            # заводим последовательности заранее, чтобы этот разовый
+            # поиск не попал в замер одного из пользователей.
+            for using in note_shards():
+                for model in (Note, NoteRevision, Tag):
+                    allocate_ids(model, using)
+        cls.users = {}
+        for count in NOTES_COUNTS:
+            # Сотрудник: страница метрик открыта только им.
+            user = User.objects.create(
+                username=f'Пишущий {count}', is_staff=True
+            )
+            # Заметка для страниц со slug; её номер изменения — первый.
+            target = Note.objects.create(
+                title='Заголовок', text='Текст', slug=f'target-{count}',
+                author=user
+            )
+            target.set_tags([f'target-{count}', 'Общий'], created=True)
+            using = shard_for_author(user.pk)
+            notes = [
+                Note(title=f'Заметка {i}', text='Текст.',
+                     slug=f'note-{count}-{i}', author=user,
+                     change_seq=i + 2)
+                for i in range(count)
+            ]
+            assign_ids(notes, using)
+            Note.objects.using(using).bulk_create(notes)
+            # У каждой заметки по два тега: их читает один запрос.
+            tags = list(target.tags.all())
+            NoteTag.objects.using(using).bulk_create(
+                NoteTag(note_id=note_id, tag=tag)
+                for note_id in Note.objects.for_author(user).exclude(
+                    pk=target.pk
+                ).values_list('id', flat=True)
+                for tag in tags
+            )
+            target.tags.update(note_count=count + 1)
+            SyncCounter.objects.using(using).filter(author_id=user.id).update(
+                value=count + 1
+            )
+            # Без тегов: удаление API не трогает счётчики облака.
+            Note.objects.create(
+                title='Запасная', text='Текст', slug=f'spare-{count}',
+                author=user
+            )
+            cls.users[count] = user
+
+    def count_queries(self, user, name, args, data):
+        client = Client()
+        client.force_login(user)
+        get_page_cache().clear()
+        url = reverse(name, args=args)
+        if args and data:
+            # Прежний slug: иначе он сменится и заметку не найти.
+            data = {**data, 'slug': args[0]}
+        # Тело POST к API — JSON, как у настоящих клиентов.
+        content_type = (
+            'application/json' if name.startswith('notes:api_')
+            else MULTIPART_CONTENT
+        )
+        # Запросы всех баз: при шардировании заметки — не в default.
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[using]))
+                for using in {DEFAULT_DB_ALIAS, *note_shards()}
+            ]
+            if data is None:
+                response = client.get(url)
+            else:
+                response = client.post(url, data, content_type)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return sum(len(queries) for queries in captured)
+
+    def test_query_budgets(self):
+        for name, args, data, budget in ROUTE_BUDGETS:
+            counts = {
+                notes_count: self.count_queries(
+                    user, name,
+                    [str(arg).format(notes_count) for arg in args], data
+                )
+                for notes_count, user in self.users.items()
+            }
+            method = 'get' if data is None else 'post'
+            if settings.NOTES_SHARDS and data is not None:
+                budget += SHARDED_ID_QUERIES.get(name, 0)
+            with self.subTest(name=name, method=method, counts=counts):
+                self.assertEqual(len(set(counts.values())), 1)
+                self.assertLessEqual(max(counts.values()), budget)
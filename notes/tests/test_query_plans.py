@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from unittest import skipUnless
+
+from notes import views
+from notes.models import Note, Tag
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class TestQueryPlans(TestCase):
+    '''
+    Проверяет по EXPLAIN QUERY PLAN, что запросы
+    всех наследников NoteBase идут по индексам:
+    - без полного просмотра таблицы,
+    - без сортировки во временном B-дереве.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.note = Note.objects.create(
+            title='Заголовок',
+            text='Текст',
+            slug='zagolovok',
+            author=cls.author
+        )
+        cls.note.set_tags(['Работа'], created=True)
+
+    def get_view(self, view_class, query=None):
+        request = RequestFactory().get('/', query or {})
+        request.user = self.author
+        view = view_class()
+        view.setup(request, slug=self.note.slug, tag='rabota')
+        return view
+
+    def get_querysets(self):
+        '''Собирает запросы к заметкам так же, как их строят CBV.'''
+        querysets = {}
+        for view_class in (views.NoteDetail, views.NoteUpdate,
+                           views.NoteDelete):
+            view = self.get_view(view_class)
+            querysets[view_class.__name__] = view.get_queryset().filter(
+                slug=self.note.slug
+            )
+        for view_class in (views.NotesList, views.NotesByTag):
+            for query in ({}, {'after': self.note.id}):
+                view = self.get_view(view_class, query)
+                queryset = view.get_queryset()
+                page_size = view.get_paginate_by(queryset)
+                querysets[f'{view_class.__name__} {query}'] = (
+                    view.get_page_queryset(queryset, page_size)
+                )
+        querysets['TagCloud'] = self.get_view(views.TagCloud).get_queryset()
+        # Теги заметок страницы, как их читает prefetch_related.
+        querysets['NotesList tags'] = Tag.objects.filter(
+            notes__in=[self.note.id]
+        )
+        return querysets
+
+    def test_querysets_use_indexes(self):
+        for name, queryset in self.get_querysets().items():
+            plan = queryset.explain()
+            with self.subTest(view=name, plan=plan):
+                for line in plan.splitlines():
+                    detail = line.split(maxsplit=3)[-1]
+                    self.assertFalse(
+                        detail.startswith('SCAN') and 'INDEX' not in detail
+                    )
+                    self.assertNotIn('TEMP B-TREE', detail)
@@ -0,0 +1,64 @@
+import gzip
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from notes.cache import rendered_pages
+from notes.models import Note
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+READER_USERNAME = 'Читатель простой'
+
+
+class TestResponses(TestCase):
+    '''
+    Класс для тестирования оптимизации ответов:
+    - главная и страница успеха рендерятся один раз на пользователя,
+    - HTML сжимается gzip, если клиент его принимает.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create(username=READER_USERNAME)
+        for number in range(20):
+            Note.objects.create(
+                title=f'Заметка {number}', text='Текст заметки.',
+                author=cls.author
+            )
+
+    def setUp(self):
+        rendered_pages.clear()
+
+    def test_static_pages_render_once_per_user(self):
+        '''Проверка, что повтор берётся из памяти, а не из шаблона.'''
+        for name in ('notes:home', 'notes:success'):
+            for user in (self.author, self.reader):
+                self.client.force_login(user)
+                with self.subTest(name=name, user=user):
+                    first = self.client.get(reverse(name))
+                    second = self.client.get(reverse(name))
+                    self.assertIsNotNone(first.context)
+                    self.assertIsNone(second.context)
+                    self.assertEqual(second.content, first.content)
+                    self.assertContains(second, user.username)
+        self.client.logout()
+        response = self.client.get(reverse('notes:home'))
+        self.assertNotContains(response, AUTHOR_USERNAME)
+
+    def test_html_is_gzipped(self):
+        '''Проверка сжатия списка заметок для клиента с gzip.'''
+        self.client.force_login(self.author)
+        plain = self.client.get(reverse('notes:list'))
+        compressed = self.client.get(
+            reverse('notes:list'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(compressed.status_code, HTTPStatus.OK)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
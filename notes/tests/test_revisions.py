@@ -0,0 +1,124 @@
+from http import HTTPStatus
+from random import Random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+
+from notes.models import Note, NoteRevision
+from notes.revisions import (
+    SNAPSHOT_INTERVAL, record_revision, revision_content
+)
+
+
+User = get_user_model()
+AUTHOR_USERNAME = 'Лев Толстой'
+READER_USERNAME = 'Читатель простой'
+
+
+def edit(note, title, text):
+    '''Сохраняет заметку так же, как NoteUpdate, и пишет версию.'''
+    previous_title, previous_text = note.title, note.text
+    note.title, note.text = title, text
+    note.save()
+    record_revision(note, previous_title, previous_text)
+
+
+class TestRevisions(TestCase):
+    '''
+    Класс для тестирования истории заметок:
+    - любая версия восстанавливается точно, снимки идут с интервалом,
+    - правка в обход истории записывается снимком,
+    - история и возврат версии доступны только автору.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username=AUTHOR_USERNAME)
+        cls.reader = User.objects.create(username=READER_USERNAME)
+        cls.note = Note.objects.create(
+            title='Заголовок', text='Первая строка\nВторая строка\n',
+            slug='zagolovok', author=cls.author
+        )
+
+    def test_every_revision_is_reconstructed(self):
+        '''Проверка восстановления всех версий после многих правок.'''
+        rnd = Random(18)
+        versions = [(self.note.title, self.note.text)]
+        lines = self.note.text.splitlines(keepends=True)
+        for number in range(3 * SNAPSHOT_INTERVAL):
+            position = rnd.randrange(len(lines) + 1)
+            if lines and rnd.random() < 0.3:
+                del lines[min(position, len(lines) - 1)]
+            else:
+                lines.insert(position, f'Правка {number}\n')
+            versions.append((f'Заголовок {number}', ''.join(lines)))
+            edit(self.note, *versions[-1])
+        for number, version in enumerate(versions, start=1):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    revision_content(self.note, number), version
+                )
+        snapshots = self.note.revisions.filter(
+            number=F('snapshot_number')
+        ).count()
+        self.assertEqual(snapshots, 4)
+
+    def test_edit_outside_history_becomes_snapshot(self):
+        '''Проверка, что правка в обход истории не ломает разницы.'''
+        edit(self.note, 'Второй', 'Текст 2')
+        Note.objects.for_author(self.author).filter(
+            pk=self.note.pk
+        ).update(text='Текст 3')
+        self.note.refresh_from_db()
+        edit(self.note, 'Четвёртый', 'Текст 4')
+        self.assertEqual(
+            [revision_content(self.note, number)[1] for number in (3, 4)],
+            ['Текст 3', 'Текст 4']
+        )
+        self.assertTrue(self.note.revisions.get(number=3).is_snapshot)
+
+    def test_update_view_records_and_restore_view_restores(self):
+        '''Проверка записи версии из NoteUpdate и возврата к ней.'''
+        self.client.force_login(self.author)
+        original_text = self.note.text
+        self.client.post(
+            reverse('notes:edit', args=(self.note.slug,)),
+            {'title': 'Новый', 'text': 'Новый текст', 'slug': self.note.slug}
+        )
+        self.assertEqual(self.note.revisions.count(), 2)
+        history = self.client.get(
+            reverse('notes:history', args=(self.note.slug,))
+        )
+        self.assertEqual(
+            [revision.number for revision in history.context['object_list']],
+            [1, 2]
+        )
+        restore_url = reverse('notes:restore', args=(self.note.slug, 1))
+        self.assertContains(self.client.get(restore_url), 'Первая строка')
+        response = self.client.post(restore_url)
+        self.assertRedirects(response, reverse('notes:success'))
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, original_text)
+        self.assertEqual(self.note.revisions.count(), 3)
+
+    def test_history_is_scoped_to_author(self):
+        '''Проверка, что чужая история и чужие версии недоступны.'''
+        edit(self.note, 'Второй', 'Текст 2')
+        self.client.force_login(self.reader)
+        for name, args in (
+            ('notes:history', (self.note.slug,)),
+            ('notes:restore', (self.note.slug, 1)),
+        ):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.post(
+            reverse('notes:restore', args=(self.note.slug, 1))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(
+            NoteRevision.objects.using(self.note._state.db).count(), 2
+        )
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from notes.models import Note
+from notes.routers import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter
+
+User = get_user_model()
+
+
+@override_settings(NOTES_READ_REPLICAS=['replica'])
+class TestReplicaRouter(SimpleTestCase):
+    '''
+    Класс для тестирования маршрутизации чтений на реплику:
+    - чтение заметок в GET-запросе идёт на реплику,
+    - POST, транзакция и закреплённый кукой клиент читают с default,
+    - после записи заметок ставится кука закрепления,
+    - вне запроса и для других моделей — всегда default.
+
+    SimpleTestCase: TestCase держал бы открытую транзакцию.'''
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False, model=Note):
+        '''Прогоняет запрос через middleware и запоминает алиас чтения.'''
+        routed = {}
+
+        def view(request):
+            routed['read'] = self.router.db_for_read(model)
+            if write:
+                self.router.db_for_write(model)
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(request)
+        return routed['read'], response
+
+    def test_get_reads_from_replica(self):
+        '''Проверка, что GET читает заметки с реплики.'''
+        alias, response = self.route(self.factory.get('/'))
+        self.assertEqual(alias, 'replica')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_other_models_read_from_default(self):
+        '''Проверка, что пользователи читаются с default.'''
+        alias, _ = self.route(self.factory.get('/'), model=User)
+        self.assertEqual(alias, 'default')
+
+    def test_write_pins_client_to_default(self):
+        '''Проверка закрепления клиента после записи.'''
+        alias, response = self.route(self.factory.post('/'), write=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        alias, _ = self.route(request)
+        self.assertEqual(alias, 'default')
+
+    def test_reads_inside_transaction_go_to_default(self):
+        '''Проверка чтения в транзакции и вне запроса.'''
+        with transaction.atomic():
+            alias, _ = self.route(self.factory.get('/'))
+        self.assertEqual(alias, 'default')
+        self.assertEqual(self.router.db_for_read(Note), 'default')
@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
@@ -13,6 +14,7 @@ READER_USERNAME = 'Читатель простой'
 
 
 class TestRoutes(TestCase):
+    databases = {'default', *settings.NOTES_SHARDS}
 
     @classmethod
     def setUpTestData(cls):
@@ -26,6 +28,7 @@ class TestRoutes(TestCase):
             slug='zagolovok',
             author=cls.author
         )
+        cls.Note_test.set_tags(['Работа'], created=True)
 
     def test_pages_availability(self):
         '''
@@ -38,11 +41,13 @@ class TestRoutes(TestCase):
         - авторизованному читателю доступно:
             - добавления новой заметки,
             - список заметок,
+            - облако тегов,
             - страница успешного добавления,
         - автору доступно:
             - редактирование,
             - детализированная каждая отдельная,
-            - удаления.'''
+            - удаления,
+            - заметки с его тегом.'''
         users_statuses = (
             (self.author, HTTPStatus.OK),  # автор должен получить ответ OK,
             (self.reader, HTTPStatus.NOT_FOUND),  # а читатель - NOT_FOUND.
@@ -56,12 +61,16 @@ class TestRoutes(TestCase):
         urls_for_authorized = (
             ('notes:add', None),
             ('notes:list', None),
+            ('notes:tags', None),
+            ('notes:search', None),
             ('notes:success', None)
         )
         urls_for_author = (
             ('notes:edit', (self.Note_test.slug,)),
             ('notes:detail', (self.Note_test.slug,)),
+            ('notes:history', (self.Note_test.slug,)),
             ('notes:delete', (self.Note_test.slug,)),
+            ('notes:tag', ('rabota',)),
         )
 
         # Проверки для анонимуса.
@@ -93,9 +102,14 @@ class TestRoutes(TestCase):
         urls_for_redirect = (
             ('notes:add', None),
             ('notes:list', None),
+            ('notes:tags', None),
+            ('notes:tag', ('rabota',)),
+            ('notes:search', None),
             ('notes:success', None),
             ('notes:edit', (self.Note_test.slug,)),
             ('notes:detail', (self.Note_test.slug,)),
+            ('notes:history', (self.Note_test.slug,)),
+            ('notes:restore', (self.Note_test.slug, 1)),
             ('notes:delete', (self.Note_test.slug,)),
         )
         for name, args in urls_for_redirect:
@@ -0,0 +1,277 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import (
+    DEFAULT_DB_ALIAS, IntegrityError, connections, transaction,
+)
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.cache import get_page_cache
+from notes.management.commands.rebalance_shards import plan_moves
+from notes.models import AuthorShard, Job, Note, Tag
+from notes.search import search_notes
+from notes.sharding import (
+    ID_STRIDE, forget_author_shard, shard_for_author,
+)
+from notes.sync import changes_since
+
+User = get_user_model()
+
+
+class TestPlanMoves(SimpleTestCase):
+    '''
+    Класс для тестирования плана переносов rebalance_shards:
+    - крупные авторы переезжают с загруженного шарда на свободный,
+    - ровные шарды не трогаются.'''
+
+    def test_moves_even_out_shards(self):
+        '''Проверка, что крупнейший подходящий автор переезжает.'''
+        moves = plan_moves({
+            'a': {1: 50, 2: 30, 3: 20},
+            'b': {4: 10},
+        })
+        self.assertEqual(moves, [(1, 'a', 'b')])
+
+    def test_balanced_shards_stay(self):
+        '''Проверка, что ровные шарды не дают переносов.'''
+        self.assertEqual(plan_moves({'a': {1: 10}, 'b': {2: 10}}), [])
+
+
+@skipUnless(
+    len(settings.NOTES_SHARDS) > 1,
+    'Нужны шарды: --settings yanote.settings_sharded'
+)
+class TestSharding(TestCase):
+    '''
+    Класс для тестирования шардирования заметок по авторам:
+    - заметки автора лежат на его шарде и видны только ему,
+    - slug уникален на шарде, а запись заметки не пишет в default,
+    - rebalance_shards переносит автора с заметками, версиями,
+      тегами, синхронизацией и поиском.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        # Авторы подряд по id попадают на разные шарды.
+        cls.first = User.objects.create(username='Первый')
+        cls.second = User.objects.create(username='Второй')
+
+    def setUp(self):
+        forget_author_shard()
+        get_page_cache().clear()
+        self.client.force_login(self.first)
+
+    def tearDown(self):
+        # Откат транзакции теста не чистит память процесса.
+        forget_author_shard()
+
+    def test_notes_live_on_author_shard(self):
+        '''Проверка, что заметка пишется на шард автора и видна ему.'''
+        self.assertNotEqual(
+            shard_for_author(self.first.pk), shard_for_author(self.second.pk)
+        )
+        for author in (self.first, self.second):
+            with self.subTest(author=author.username):
+                self.client.force_login(author)
+                self.client.post(reverse('notes:add'), {
+                    'title': f'Заметка {author.pk}', 'text': 'Текст.',
+                })
+                shard = shard_for_author(author.pk)
+                note = Note.objects.using(shard).get(author=author)
+                response = self.client.get(
+                    reverse('notes:detail', args=(note.slug,))
+                )
+                self.assertContains(response, 'Текст.')
+        response = self.client.get(reverse('notes:list'))
+        self.assertEqual(
+            [note.author_id for note in response.context['object_list']],
+            [self.second.pk]
+        )
+
+    def test_slug_is_unique_within_shard(self):
+        '''Проверка, что одинаковые заголовки на разных шардах
+        получают один slug, а повтор slug-а на шарде не сохраняется.'''
+        first = Note.objects.create(
+            title='Общий', text='Текст.', author=self.first
+        )
+        second = Note.objects.create(
+            title='Общий', text='Текст.', author=self.second
+        )
+        self.assertNotEqual(first._state.db, second._state.db)
+        self.assertEqual((first.slug, second.slug), ('obschij', 'obschij'))
+        with self.assertRaises(IntegrityError), transaction.atomic(
+            using=second._state.db
+        ):
+            Note.objects.create(
+                title='Другой', text='Текст.', slug='obschij',
+                author=self.second
+            )
+
+    def test_note_write_skips_default(self):
+        '''Проверка, что запись заметки на шард не пишет в default,
+        а id и задание выдаёт сам шард.'''
+        # id пользователей зависят от прочих тестов: берём того, кто
+        # не на default.
+        author = next(
+            author for author in (self.first, self.second)
+            if shard_for_author(author.pk) != DEFAULT_DB_ALIAS
+        )
+        shard = shard_for_author(author.pk)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            note = Note.objects.create(
+                title='Своя', text='Текст.', author=author
+            )
+        self.assertEqual(
+            [query['sql'] for query in queries
+             if not query['sql'].startswith('SELECT')],
+            []
+        )
+        self.assertEqual(
+            note.id % ID_STRIDE, settings.NOTES_SHARDS.index(shard)
+        )
+        self.assertTrue(Job.objects.using(shard).exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_cleared_slug_keeps_own(self):
+        '''Проверка, что заметка с очищенным slug получает свой
+        прежний slug, а не base-2.'''
+        note = Note.objects.create(
+            title='Общий', text='Текст.', author=self.first
+        )
+        self.client.post(reverse('notes:edit', args=(note.slug,)), {
+            'title': 'Общий', 'text': 'Новый текст.', 'slug': '',
+        })
+        note.refresh_from_db()
+        self.assertEqual(note.slug, 'obschij')
+
+    def test_rebalance_moves_author(self):
+        '''Проверка, что перенос автора сохраняет id, версии, теги,
+        номера синхронизации и полнотекстовый поиск.'''
+        self.client.post(reverse('notes:add'), {
+            'title': 'Переезд', 'text': 'Первая строка',
+        })
+        source = shard_for_author(self.first.pk)
+        note = Note.objects.using(source).get(author=self.first)
+        self.client.post(reverse('notes:edit', args=(note.slug,)), {
+            'title': 'Переезд', 'text': 'Вторая строка', 'slug': note.slug,
+            'tags': 'Работа, идеи',
+        })
+        token = changes_since(self.first.pk, 0)[0]
+        target = shard_for_author(self.second.pk)
+        call_command(
+            'rebalance_shards', author=self.first.pk, to=target, wait=0,
+            stdout=StringIO(), stderr=StringIO()
+        )
+        self.assertEqual(
+            AuthorShard.objects.get(author_id=self.first.pk).shard, target
+        )
+        self.assertFalse(Note.objects.using(source).exists())
+        moved = Note.objects.for_author(self.first).get()
+        self.assertEqual((moved._state.db, moved.id), (target, note.id))
+        self.assertEqual(moved.revisions.count(), 2)
+        self.assertEqual(
+            sorted(moved.tags.values_list('name', 'note_count')),
+            [('Работа', 1), ('идеи', 1)]
+        )
+        self.assertFalse(Tag.objects.using(source).exists())
+        self.assertEqual(changes_since(self.first.pk, token)[0], token)
+        self.assertEqual(
+            [found.id for found in search_notes(self.first, 'вторая')],
+            [note.id]
+        )
+        response = self.client.get(
+            reverse('notes:restore', args=(note.slug, 1))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Первая строка')
+
+    def move(self, author, target):
+        call_command(
+            'rebalance_shards', author=author.pk, to=target, wait=0,
+            stdout=StringIO(), stderr=StringIO()
+        )
+        forget_author_shard()
+
+    def test_moves_keep_ids_unique(self):
+        '''Проверка, что после переноса автора новые id на обоих
+        шардах не совпадают и следующий перенос не теряет заметок.'''
+        home = shard_for_author(self.first.pk)
+        away = shard_for_author(self.second.pk)
+        third = User.objects.create(username='Третий')
+        AuthorShard.objects.create(author_id=third.pk, shard=home)
+        for author in (self.first, self.second):
+            Note.objects.create(title='Старая', text='Текст.', author=author)
+        self.move(self.first, away)
+        # Пишут оба шарда: на away уже лежат id, выданные home.
+        for author in (self.second, third):
+            Note.objects.create(title='Новая', text='Текст.', author=author)
+        self.move(self.second, home)
+        ids = [
+            note_id
+            for using in settings.NOTES_SHARDS
+            for note_id in Note.objects.using(using).values_list(
+                'id', flat=True
+            )
+        ]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(
+            [Note.objects.for_author(author).count()
+             for author in (self.first, self.second, third)],
+            [1, 2, 1]
+        )
+
+    def test_rebalance_renames_taken_slug(self):
+        '''Проверка, что заметка, чей slug на новом шарде занят,
+        переезжает с новым slug-ом и видна синхронизации.'''
+        note = Note.objects.create(
+            title='Общий', text='Текст.', author=self.first
+        )
+        Note.objects.create(title='Общий', text='Текст.', author=self.second)
+        token = changes_since(self.first.pk, 0)[0]
+        stderr = StringIO()
+        call_command(
+            'rebalance_shards', author=self.first.pk,
+            to=shard_for_author(self.second.pk), wait=0,
+            stdout=StringIO(), stderr=stderr
+        )
+        forget_author_shard()
+        moved = Note.objects.for_author(self.first).get()
+        self.assertEqual((moved.id, moved.slug), (note.id, 'obschij-2'))
+        self.assertIn('obschij-2', stderr.getvalue())
+        _, changed, _, _ = changes_since(self.first.pk, token)
+        self.assertEqual(
+            [(found['id'], found['slug']) for found in changed],
+            [(note.id, 'obschij-2')]
+        )
+
+    def test_rebalance_moves_tombstones(self):
+        '''Проверка, что перенос автора с удалёнными заметками
+        завершается и синхронизация по-прежнему видит удаления.'''
+        notes = [
+            Note.objects.create(
+                title=f'Заметка {i}', text='Текст.', author=self.first
+            )
+            for i in range(3)
+        ]
+        deleted_ids = sorted(note.id for note in notes[:2])
+        for note in notes[:2]:
+            note.delete()
+        target = shard_for_author(self.second.pk)
+        # Пачка меньше числа записей: batches идёт дальше первой.
+        call_command(
+            'rebalance_shards', author=self.first.pk, to=target, wait=0,
+            batch_size=1, stdout=StringIO(), stderr=StringIO()
+        )
+        forget_author_shard()
+        _, changed, deleted, _ = changes_since(self.first.pk, 0)
+        self.assertEqual([note['id'] for note in changed], [notes[2].id])
+        self.assertEqual(
+            sorted(tombstone['note_id'] for tombstone in deleted),
+            deleted_ids
+        )
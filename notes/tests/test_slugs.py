@@ -0,0 +1,68 @@
+from random import Random
+from unittest import TestCase
+
+from pytils.translit import slugify
+
+from notes.management.bench import russian_title
+from notes.models import Note
+from notes.slugs import fast_slugify, slugify_title, slugify_titles
+
+MAX_LENGTH = Note._meta.get_field('slug').max_length
+CORPUS_SIZE = 20000
+# Кириллица, латиница, типографские знаки из таблицы pytils и символы,
+# которых в ней нет и которые slugify должен выбросить.
+SYMBOLS = (
+    'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+    'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+    'abcdefghijklmnopqrstuvwxyzABCXYZ0123456789'
+    ' \t\n-_&;.,:!?()«»‘’“”–—‒−…№\'"`#$%@'
+    'İßΩéü漢字😀  '
+)
+SPECIAL_TITLES = (
+    '', ' ', '---', '&', '&amp;', 'Кот &amp; пёс', 'Кот&пёс',
+    'Щука и ЁЖ', '№ 5 — «итоги»…', '  пробелы  по краям  ',
+    'İstanbul', 'Straße', 'Я' * 150,
+)
+
+
+def title_corpus():
+    rnd = Random(14)
+    corpus = list(SPECIAL_TITLES)
+    corpus += [russian_title(rnd) for _ in range(CORPUS_SIZE // 2)]
+    corpus += [
+        ''.join(rnd.choice(SYMBOLS) for _ in range(rnd.randint(1, 120)))
+        for _ in range(CORPUS_SIZE // 2)
+    ]
+    return corpus
+
+
+class TestSlugEquivalence(TestCase):
+    '''
+    Класс для проверки быстрого slug-генератора:
+    - результат побайтно совпадает со slugify(title)[:max_length],
+    - пачка и LRU-кэш дают те же slug-и.'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = title_corpus()
+        cls.expected = [slugify(title)[:MAX_LENGTH] for title in cls.corpus]
+
+    def test_fast_slugify_matches_pytils(self):
+        '''Проверка совпадения с pytils на всём корпусе заголовков.'''
+        for title, expected in zip(self.corpus, self.expected):
+            with self.subTest(title=title):
+                self.assertEqual(fast_slugify(title)[:MAX_LENGTH], expected)
+
+    def test_batch_matches_pytils(self):
+        '''Проверка пачки, в том числе с повторами заголовков.'''
+        self.assertEqual(
+            slugify_titles(self.corpus * 2, MAX_LENGTH), self.expected * 2
+        )
+
+    def test_cached_slug_matches_pytils(self):
+        '''Проверка LRU-кэша: повторный вызов берёт slug из кэша.'''
+        slugify_title.cache_clear()
+        for title, expected in zip(self.corpus[:100], self.expected):
+            self.assertEqual(slugify_title(title, MAX_LENGTH), expected)
+            self.assertEqual(Note.slug_from_title(title), expected)
+        self.assertEqual(slugify_title.cache_info().hits, 100)
@@ -0,0 +1,136 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.cache import get_page_cache
+from notes.models import Note, Tag
+from notes.sharding import shard_for_author
+
+User = get_user_model()
+
+
+class TestTags(TestCase):
+    '''
+    Класс для тестирования тегов заметок:
+    - форма пишет теги, одинаковые по slug склеиваются,
+    - счётчики тегов меняются при записи и удалении заметки,
+    - облако тегов не считает связи на просмотре,
+    - страница тега показывает только свои заметки с этим тегом,
+    - число запросов списка не зависит от числа тегов у заметок,
+    - ошибка уникальности тегов не выдаётся за занятый slug.'''
+    databases = {'default', *settings.NOTES_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Лев Толстой')
+        cls.reader = User.objects.create(username='Читатель простой')
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        # Запросы к заметкам и тегам автора идут на его шард.
+        self.connection = connections[shard_for_author(self.author.pk)]
+
+    def add_note(self, title, tags):
+        self.client.post(reverse('notes:add'), {
+            'title': title, 'text': 'Текст', 'tags': tags
+        })
+        return Note.objects.for_author(self.author).get(title=title)
+
+    def counts(self, author=None):
+        return dict(
+            Tag.objects.for_author(author or self.author)
+            .values_list('name', 'note_count')
+        )
+
+    def test_form_writes_tags_and_counts(self):
+        '''Проверка счётчиков при создании, правке и удалении.'''
+        note = self.add_note('Война', 'Работа, идеи, работа')
+        self.add_note('Мир', 'работа')
+        self.assertEqual(self.counts(), {'Работа': 2, 'идеи': 1})
+        self.client.post(reverse('notes:edit', args=(note.slug,)), {
+            'title': note.title, 'text': note.text, 'slug': note.slug,
+            'tags': 'Идеи, Планы'
+        })
+        self.assertEqual(
+            self.counts(), {'Работа': 1, 'идеи': 1, 'Планы': 1}
+        )
+        self.client.post(reverse('notes:delete', args=(note.slug,)))
+        self.assertEqual(
+            self.counts(), {'Работа': 1, 'идеи': 0, 'Планы': 0}
+        )
+
+    def test_edit_form_shows_tags(self):
+        '''Проверка, что форма правки заполнена прежними тегами.'''
+        note = self.add_note('Война', 'Работа, идеи')
+        response = self.client.get(reverse('notes:edit', args=(note.slug,)))
+        self.assertEqual(
+            response.context['form'].initial['tags'], 'идеи, Работа'
+        )
+
+    def test_api_edit_without_tags_keeps_them(self):
+        '''Проверка, что JSON без поля tags не снимает теги.'''
+        note = self.add_note('Война', 'Работа')
+        self.client.post(
+            reverse('notes:api_edit', args=(note.slug,)),
+            json.dumps({'title': 'Война', 'text': 'Новый текст'}),
+            content_type='application/json'
+        )
+        self.assertEqual(self.counts(), {'Работа': 1})
+
+    def test_cloud_reads_stored_counts(self):
+        '''Проверка, что облако не считает связи и прячет пустые теги.'''
+        note = self.add_note('Война', 'Работа, идеи')
+        self.add_note('Мир', 'Работа')
+        note.set_tags(['Работа'])
+        with CaptureQueriesContext(self.connection) as queries:
+            response = self.client.get(reverse('notes:tags'))
+        self.assertEqual(
+            [(tag.name, tag.note_count, tag.size)
+             for tag in response.context['object_list']],
+            [('Работа', 2, 1)]
+        )
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_tag_page_lists_own_tagged_notes(self):
+        '''Проверка страницы тега и 404 для чужого тега.'''
+        tagged = self.add_note('Война', 'Работа')
+        self.add_note('Мир', 'идеи')
+        response = self.client.get(reverse('notes:tag', args=('rabota',)))
+        self.assertEqual(list(response.context['object_list']), [tagged])
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('notes:tag', args=('rabota',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_queries_do_not_depend_on_tags(self):
+        '''Проверка, что теги всех заметок читает один запрос.'''
+        self.add_note('Война', 'Работа')
+        self.add_note('Мир', 'Работа')
+        url = reverse('notes:list')
+        with CaptureQueriesContext(self.connection) as few:
+            self.client.get(url)
+        for note in Note.objects.for_author(self.author):
+            note.set_tags([f'тег {i}' for i in range(20)])
+        get_page_cache().clear()
+        with CaptureQueriesContext(self.connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, 'тег 19', count=2)
+
+    def test_tag_conflict_is_not_slug_error(self):
+        '''Проверка, что гонка за связь с тегом не выдаётся за
+        занятый slug и откатывает заметку.'''
+        with mock.patch.object(
+            Note, 'set_tags', side_effect=IntegrityError
+        ), self.assertRaises(IntegrityError):
+            self.add_note('Война', 'Работа')
+        self.assertFalse(Note.objects.for_author(self.author).exists())
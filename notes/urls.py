@@ -1,15 +1,48 @@
+from django.conf import settings
 from django.urls import path
 
-from notes import views
+from notes import api, async_views, views
 
 app_name = 'notes'
 
+# Под ASGI-сервером читающие страницы обслуживают асинхронные версии.
+read_views = async_views if settings.NOTES_ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.Home.as_view(), name='home'),
+    path('', read_views.Home.as_view(), name='home'),
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
-    path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path(
+        'note/<slug:slug>/', read_views.NoteDetail.as_view(), name='detail'
+    ),
+    path(
+        'history/<slug:slug>/', views.NoteHistory.as_view(), name='history'
+    ),
+    path(
+        'history/<slug:slug>/<int:number>/', views.NoteRestore.as_view(),
+        name='restore'
+    ),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
-    path('notes/', views.NotesList.as_view(), name='list'),
+    path('notes/', read_views.NotesList.as_view(), name='list'),
+    path('tags/', read_views.TagCloud.as_view(), name='tags'),
+    path(
+        'tags/<slug:tag>/', read_views.NotesByTag.as_view(), name='tag'
+    ),
+    path('search/', views.NoteSearch.as_view(), name='search'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('metrics/', views.Metrics.as_view(), name='metrics'),
+    path('api/add/', api.NoteCreateApi.as_view(), name='api_add'),
+    path(
+        'api/edit/<slug:slug>/', api.NoteUpdateApi.as_view(), name='api_edit'
+    ),
+    path(
+        'api/note/<slug:slug>/', api.NoteDetailApi.as_view(),
+        name='api_detail'
+    ),
+    path(
+        'api/delete/<slug:slug>/', api.NoteDeleteApi.as_view(),
+        name='api_delete'
+    ),
+    path('api/notes/', api.NoteListApi.as_view(), name='api_list'),
+    path('api/sync/', api.NoteSyncApi.as_view(), name='api_sync'),
 ]
@@ -1,17 +1,32 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.db import router, transaction
+from django.db.models import Prefetch
+from django.db.models.functions import Length
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views import generic
 
+from . import profiling
+from .cache import PageCacheMixin, RenderOnceMixin, page_cache_stats
 from .forms import NoteForm
-from .models import Note
+from .markup import text_html
+from .models import Note, NoteRevision, Tag
+from .pagination import KeysetPaginationMixin
+from .revisions import record_revision, revision_content
+from .search import search_notes
 
+# Сколько размеров шрифта у тегов в облаке.
+CLOUD_SIZES = 5
 
-class Home(generic.TemplateView):
+
+class Home(RenderOnceMixin, generic.TemplateView):
     """Домашняя страница."""
     template_name = 'notes/home.html'
 
 
-class NoteSuccess(LoginRequiredMixin, generic.TemplateView):
+class NoteSuccess(LoginRequiredMixin, RenderOnceMixin,
+                  generic.TemplateView):
     """Страница успешного выполнения операции."""
     template_name = 'notes/success.html'
 
@@ -23,39 +38,211 @@ class NoteBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими заметками."""
-        return self.model.objects.filter(
-            author=self.request.user  # type: ignore
+        return self.model.objects.for_author(
+            self.request.user  # type: ignore
         )
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormBase(NoteBase):
+    """Базовый класс для добавления и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Неуникальный slug отсекает индекс БД, а не отдельный запрос."""
+        note = form.save_unique()
+        if note is None:
+            return self.form_invalid(form)  # type: ignore
+        self.object = note
+        return HttpResponseRedirect(self.get_success_url())  # type: ignore
+
+
+class NoteCreate(NoteFormBase, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
-    """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
+class NoteUpdate(NoteFormBase, generic.UpdateView):
+    """Редактирование заметки; версию в истории пишет save_unique."""
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
     """Удаление заметки."""
     template_name = 'notes/delete.html'
 
+    def get_queryset(self):
+        """Странице подтверждения хватает начала текста."""
+        return super().get_queryset().defer('text')
+
 
-class NotesList(NoteBase, generic.ListView):
+class NotesList(NoteBase, PageCacheMixin, KeysetPaginationMixin,
+                generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_page_cache_parts(self):
+        return ('list', self.get_cursor() or '')
+
+    def get_queryset(self):
+        """Шаблону списка нужны id, slug, title, начало текста и теги.
+
+        Теги всех заметок страницы читаются одним запросом по индексу
+        (note, tag), сколько бы тегов ни было у заметок.
+        """
+        return super().get_queryset().only(
+            'id', 'slug', 'title', 'preview', 'word_count'
+        ).prefetch_related(Prefetch(
+            'tags', queryset=Tag.objects.only('id', 'name', 'slug')
+        ))
+
+
+class NotesByTag(NotesList):
+    """Заметки пользователя с одним тегом."""
+
+    def get_page_cache_parts(self):
+        return ('tag', self.kwargs['tag'], self.get_cursor() or '')
+
+    def get_queryset(self):
+        """Тег ищется только среди своих: чужой slug даёт 404."""
+        self.tag = get_object_or_404(
+            Tag.objects.for_author(self.request.user).only(
+                'id', 'name', 'slug'
+            ),
+            slug=self.kwargs['tag']
+        )
+        return super().get_queryset()
+
+    def get_page_queryset(self, queryset, page_size):
+        """Страница идёт по индексу связей (tag, note) в порядке note.
+
+        Так страница редкого тега не перебирает все заметки автора
+        в поисках подходящих, и сортировать ничего не нужно.
+        """
+        # Одно условие filter(): курсор и тег — на одной связи.
+        condition = {'notetag__tag': self.tag}
+        cursor = self.get_cursor()
+        if cursor is not None:
+            condition['notetag__note_id__gt'] = cursor
+        return queryset.filter(**condition).order_by(
+            'notetag__note_id'
+        )[:page_size + 1]
+
+
+class TagCloud(NoteBase, PageCacheMixin, generic.ListView):
+    """Облако тегов пользователя."""
+    model = Tag
+    template_name = 'notes/tags.html'
 
-class NoteDetail(NoteBase, generic.DetailView):
+    def get_page_cache_parts(self):
+        return ('tags',)
+
+    def get_queryset(self):
+        """Числа заметок хранятся в тегах: облако ничего не считает."""
+        return super().get_queryset().filter(note_count__gt=0).order_by(
+            'slug'
+        )
+
+    def get_context_data(self, **kwargs):
+        """Размер тега в облаке — от 1 до CLOUD_SIZES по числу заметок."""
+        context = super().get_context_data(**kwargs)
+        tags = context['object_list']
+        top = max((tag.note_count for tag in tags), default=1)
+        for tag in tags:
+            # Классы Bootstrap fs-1..fs-5: чем меньше, тем крупнее.
+            tag.size = CLOUD_SIZES - (CLOUD_SIZES - 1) * tag.note_count // top
+        return context
+
+
+class NoteDetail(NoteBase, PageCacheMixin, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_page_cache_parts(self):
+        return ('detail', self.kwargs['slug'])
+
+    def get_context_data(self, **kwargs):
+        """Текст в HTML берётся из кэша фрагментов, а не рендерится."""
+        context = super().get_context_data(**kwargs)
+        context['text_html'] = text_html(self.object.text)
+        return context
+
+
+class NoteHistory(NoteBase, KeysetPaginationMixin, generic.ListView):
+    """Версии заметки от первой к последней."""
+    template_name = 'notes/history.html'
+    cursor_field = 'number'
+
+    def get_queryset(self):
+        self.note = get_object_or_404(
+            super().get_queryset().only('id', 'slug', 'title'),
+            slug=self.kwargs['slug']
+        )
+        return self.note.revisions.defer('data').annotate(
+            size=Length('data')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['note'] = self.note
+        return context
+
+
+class NoteRestore(NoteBase, generic.DetailView):
+    """Версия заметки целиком и возврат к ней."""
+    template_name = 'notes/restore.html'
+
+    def get_revision(self):
+        try:
+            return revision_content(self.object, self.kwargs['number'])
+        except NoteRevision.DoesNotExist:
+            raise Http404('Нет такой версии заметки.')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['number'] = self.kwargs['number']
+        context['title'], context['text'] = self.get_revision()
+        return context
+
+    def post(self, request, *args, **kwargs):
+        """Возврат — обычное сохранение и новая версия в истории."""
+        note = self.object = self.get_object()
+        previous_title, previous_text = note.title, note.text
+        note.title, note.text = self.get_revision()
+        using = router.db_for_write(Note, instance=note)
+        with transaction.atomic(using=using):
+            note.save()
+            record_revision(note, previous_title, previous_text)
+        return HttpResponseRedirect(self.success_url)
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+    query_kwarg = 'q'
+
+    def get_queryset(self):
+        return search_notes(
+            self.request.user, self.request.GET.get(self.query_kwarg, '')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get(self.query_kwarg, '')
+        return context
+
+
+class Metrics(UserPassesTestMixin, generic.View):
+    """Метрики профилировщика и кэша страниц для мониторинга."""
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff  # type: ignore
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'views': profiling.snapshot(),
+            'page_cache': dict(page_cache_stats),
+        })
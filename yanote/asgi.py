@@ -3,6 +3,9 @@ ASGI config for yanote project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+By default it uses yanote.settings_asgi, which serves the read-only
+note pages with async views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -11,6 +14,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings_asgi')
 
 application = get_asgi_application()
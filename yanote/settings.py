@@ -22,11 +22,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Выше всех, кто меняет тело ответа, кроме профилировщика.
+    'notes.compression.CompressionMiddleware',
+    'notes.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -37,8 +41,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Шаблоны компилируются один раз на процесс и при DEBUG.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -56,9 +66,124 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Чтение заметок в запросах уходит на реплики из этого списка
+# алиасов DATABASES; пустой список — всё на default. Профиль с
+# репликой-файлом SQLite — yanote.settings_replica.
+DATABASE_ROUTERS = [
+    'notes.routers.ShardRouter',
+    'notes.routers.ReplicaRouter',
+]
+NOTES_READ_REPLICAS = []
+# Сколько секунд после записи клиент читает с основной базы.
+NOTES_REPLICA_PIN_SECONDS = 10
+# Алиасы DATABASES, по которым заметки раскладываются по авторам;
+# пустой список — без шардирования. Профиль с шардами-файлами
+# SQLite — yanote.settings_sharded.
+NOTES_SHARDS = []
+# Сколько секунд процесс помнит шард автора (см. rebalance_shards).
+NOTES_SHARD_MAP_TTL = 60
+
+# PRAGMA, которые выполняются на каждом новом соединении с SQLite.
+# Пустой словарь оставляет настройки SQLite по умолчанию.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # В КиБ, если значение отрицательное.
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Отдельно от страниц, чтобы их вытеснение не выбрасывало сессии.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Сессии читаются из кэша, в базу идут только записи.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Алиас из CACHES и сколько секунд там лежит проверенный пользователь
+# сессии; 0 — читать пользователя из базы на каждый запрос.
+NOTES_USER_CACHE = 'sessions'
+NOTES_USER_CACHE_TTL = 30
+
+# Сколько процессов обслуживают сайт (gunicorn --workers). Если больше
+# одного, кэши сессий, пользователей и страниц должны быть общими
+# (memcached, Redis): выход, смену пароля и правку заметки в одном
+# процессе иначе не увидят остальные. LocMemCache годится только для
+# одного процесса — runserver и тестов; проверка notes.E001 сообщит
+# о нём при NOTES_WORKERS > 1.
+NOTES_WORKERS = 1
+
+# Тексты заметок от стольких байт в UTF-8 хранятся в SQLite сжатыми
+# (zstd, если установлен zstandard, иначе zlib); None — не сжимать.
+NOTES_COMPRESS_MIN_BYTES = 16 * 1024
+
+# Производные данные заметок (полнотекстовый индекс) считает очередь
+# notes.jobs, которую выполняет команда run_jobs. True — выполнять
+# задания сразу при записи, без очереди и воркера.
+NOTES_JOBS_SYNC = False
+NOTES_JOB_BATCH_SIZE = 100
+# После стольких неудачных попыток задание помечается failed.
+NOTES_JOB_MAX_ATTEMPTS = 5
+# Через столько секунд задание упавшего воркера берёт другой.
+NOTES_JOB_LEASE_SECONDS = 300
+
+# Сколько дней хранятся записи об удалённых заметках для синхронизации;
+# старые удаляет команда prune_tombstones. Клиенту, который не
+# синхронизировался дольше, API отвечает 410 и ждёт полной загрузки.
+NOTES_TOMBSTONE_DAYS = 30
+
+# Алиас из CACHES для отрендеренных страниц заметок.
+NOTES_PAGE_CACHE = 'default'
+# Алиас из CACHES для HTML текстов заметок из Markdown, по хэшу текста.
+# Чтобы фрагменты, отрендеренные run_jobs, видели процессы сайта, кэш
+# должен быть общим (memcached, Redis).
+NOTES_MARKDOWN_CACHE = 'default'
+
+# Асинхронные Home, NoteDetail и NotesList; включает yanote.settings_asgi.
+NOTES_ASYNC_VIEWS = False
+
+# Доля запросов, которые замеряет notes.profiling.ProfilingMiddleware.
+NOTES_PROFILING_SAMPLE_RATE = 0.0
+# Раз в сколько секунд писать гистограммы в лог notes.profiling; 0 — никогда.
+NOTES_PROFILING_LOG_INTERVAL = 0
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'notes.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -82,6 +207,19 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Хэш содержимого в именах файлов включается там, где collectstatic
+# входит в выкладку: профиль выкладки задаёт
+#     STATICFILES_STORAGE = (
+#         'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+#     )
+# и файлы можно кэшировать в браузере навсегда. Без манифеста имён тег
+# {% static %} при DEBUG = False отдаёт 500, поэтому по умолчанию
+# хранилище обычное.
+# Раздавать STATIC_ROOT самим Django с Cache-Control на год, если
+# перед ним нет веб-сервера, который делает это сам.
+NOTES_SERVE_STATIC = False
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,9 @@
+"""
+Настройки для запуска под ASGI-сервером, например:
+
+    uvicorn yanote.asgi:application --workers 4
+"""
+
+from .settings import *  # noqa: F401,F403
+
+NOTES_ASYNC_VIEWS = True
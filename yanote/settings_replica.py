@@ -0,0 +1,23 @@
+"""
+Настройки с репликой для чтения: второй файл SQLite вместо реплики.
+
+Реплику обновляет команда sync_replica, например раз в секунду:
+
+    python manage.py sync_replica --settings yanote.settings_replica \\
+        --interval 1
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        # В тестах реплика — то же соединение, что и default.
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+NOTES_READ_REPLICAS = ['replica']
@@ -0,0 +1,27 @@
+"""
+Настройки с шардированием заметок по авторам: два файла SQLite.
+
+Пользователи, сессии и справочник шардов остаются в default, он же
+первый шард. Новая база получает схему командой
+
+    python manage.py migrate --settings yanote.settings_sharded \\
+        --database shard1
+
+Если заметки уже были, выполните rebalance_shards: он разложит
+авторов по шардам. slug уникален в пределах шарда; совпавший при
+переносе slug команда меняет и пишет об этом.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    'shard1': {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db_shard1.sqlite3',
+    },
+}
+
+# Новые шарды — только в конец: номер шарда входит в id его строк.
+NOTES_SHARDS = ['default', 'shard1']
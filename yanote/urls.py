@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.forms import UserCreationForm
-from django.urls import include, path
+from django.contrib.staticfiles.storage import (
+    HashedFilesMixin, staticfiles_storage,
+)
+from django.urls import include, path, re_path
+from django.views.decorators.cache import cache_control
 from django.views.generic import CreateView
+from django.views.static import serve
 
 urlpatterns = [
     path('', include('notes.urls')),
@@ -34,3 +40,16 @@ auth_urls = ([
 ], 'users')
 
 urlpatterns += [path('auth/', include(auth_urls))]
+
+if settings.NOTES_SERVE_STATIC:
+    serve_static = serve
+    if isinstance(staticfiles_storage, HashedFilesMixin):
+        # В именах файлов хэш содержимого: новая версия — новый адрес.
+        serve_static = cache_control(
+            public=True, max_age=settings.STATIC_MAX_AGE, immutable=True
+        )(serve)
+    urlpatterns += [re_path(
+        r'^{}(?P<path>.*)$'.format(settings.STATIC_URL.lstrip('/')),
+        serve_static,
+        {'document_root': settings.STATIC_ROOT},
+    )]